@@ -0,0 +1,93 @@
+# ------------------------------------------------------------------
+# 1_bootstrap_full_history.py (全量历史初始化)
+# 功能: 在新机器上从零下载全部股票的多年日线，按交易日并发、限速下载并逐日写入母版分区。
+#       可随时中断（Ctrl+C），重新运行从断点继续；结束时按交易日历核对每个交易日的数据。
+# 用法: python 1_bootstrap_full_history.py [--start 2015-01-01] [--end 2025-09-30] [--workers 4]
+# ------------------------------------------------------------------
+import os
+import sys
+import signal
+import argparse
+import threading
+from datetime import datetime
+
+import pandas as pd
+import tushare as ts
+
+from config import BOOTSTRAP_START_DATE
+from utils import (partition_store, array_store, indicator_store, bar_tables, trade_calendar, cassette,
+                   coverage_index, data_quality, bootstrap)
+
+shutdown_event = threading.Event()
+
+
+def signal_handler(signum, frame):
+    """处理中断信号"""
+    print("\n收到中断信号，已下载的交易日会保留，重新运行即可继续...", file=sys.stderr)
+    shutdown_event.set()
+
+
+def build_derived_stores():
+    """母版初始化完成后，一次性构建派生的数据存储"""
+    print("--- 正在构建派生数据（数组存储、指标、周线/月线、覆盖索引、质量统计）... ---")
+    array_store.build_array_store()
+    indicator_store.update_indicators()
+    for period in bar_tables.PERIODS:
+        bar_tables.rebuild_bar_table(period)
+    coverage_index.report(*coverage_index.build_coverage())
+    data_quality.report(data_quality.update_stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='下载全量历史日线并初始化母版数据')
+    parser.add_argument('--start', type=str, default=BOOTSTRAP_START_DATE, help='起始日期 (格式: YYYY-MM-DD)')
+    parser.add_argument('--end', type=str, help='结束日期 (格式: YYYY-MM-DD)，默认上一个交易日')
+    parser.add_argument('--workers', type=int, help='并发下载线程数，默认 config.DOWNLOAD_WORKERS')
+    args = parser.parse_args()
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    if cassette.replaying():
+        pro = cassette.OfflineClient('tushare')
+        print("--- 回放模式: 使用录制的数据源响应，不访问网络 ---")
+    else:
+        token = os.getenv('TUSHARE_TOKEN')
+        if not token:
+            print("!!! 未在环境变量中找到Tushare Token，无法下载。")
+            return
+        ts.set_token(token)
+        pro = ts.pro_api()
+        print("--- Tushare接口初始化成功 ---")
+
+    # 当天数据通常收盘后才完整，默认只下载到上一个交易日，当天由脚本2补齐
+    end = pd.Timestamp(args.end) if args.end else \
+        trade_calendar.prev_trading_day(pd.Timestamp(datetime.now().date()))
+    print(f"--- 全量历史初始化: {pd.Timestamp(args.start).date()} ~ {end.date()} ---")
+
+    # 已有旧的单文件母版时先迁移为分区，只下载其中缺少的交易日
+    partition_store.ensure_store()
+    bootstrap.ensure_stock_pool(pro)
+    report = bootstrap.bootstrap_history(pro, args.start, end, shutdown_event=shutdown_event,
+                                         max_workers=args.workers)
+    if shutdown_event.is_set():
+        print("--- 已中断。重新运行本脚本将从断点继续。 ---")
+        return
+
+    missing = report[report['状态'] == '缺失']
+    thin = report[report['状态'] == '行数偏少']
+    print(f"--- 核对完成: {len(report)} 个交易日，缺失 {len(missing)} 个，行数偏少 {len(thin)} 个 ---")
+    if len(thin):
+        print(thin.to_string(index=False))
+    if len(missing):
+        print(f"!!! 以下交易日仍未下载成功，请稍后重新运行本脚本: "
+              f"{', '.join(d.strftime('%Y-%m-%d') for d in missing['日期'][:20])}")
+        return
+
+    build_derived_stores()
+    print(f"--- 母版初始化完成！最新日期为: {partition_store.latest_date().strftime('%Y-%m-%d')} ---")
+    print("PROGRESS: 100", flush=True)
+
+
+if __name__ == "__main__":
+    main()
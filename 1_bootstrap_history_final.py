@@ -4,29 +4,28 @@
 # 特点: 完美兼容 feather 历史数据与 akshare 快照行情
 # ------------------------------------------------------------------
 
-import os
 import pandas as pd
 from tqdm import tqdm
 import akshare as ak
 from datetime import datetime, timedelta
+from utils import security_master, selection_engine
+from utils.data_loader import load_clean_hist_data
 
 # --- 配置 ---
-MASTER_DATA_FILE = 'master_stock_data.feather'
 STOCK_POOL_FILE = 'stock_pool.csv'
 N_CONSECUTIVE_DAYS = 4  # 默认找4连板
 DEBUG_STOCK_CODE = '000514.SZ'  # 设置你要调试的目标股票代码
 
 def load_hist_data():
-    """加载历史数据"""
-    if not os.path.exists(MASTER_DATA_FILE):
-        print(f"!!! 错误: 找不到母版数据文件 '{MASTER_DATA_FILE}'")
+    """加载本周（周一起）的历史数据；连板判断只用到涨跌幅"""
+    today = datetime.now().date()
+    start_of_week = today - timedelta(days=today.weekday())
+    try:
+        return load_clean_hist_data(columns=['代码', '日期', '涨跌幅'], start=start_of_week)
+    except FileNotFoundError as e:
+        print(f"!!! 错误: {e}")
         return None
 
-    df = pd.read_feather(MASTER_DATA_FILE)
-    df['日期'] = pd.to_datetime(df['日期'])
-    df['代码'] = df['代码'].astype(str).str.upper()
-    return df
-
 def get_snapshot_data():
     """获取今日行情快照，并补全市场标识符"""
     try:
@@ -67,17 +66,8 @@ def get_snapshot_data():
         today = datetime.now().date()
         df['日期'] = pd.to_datetime(today)
 
-        # 确保股票代码是字符串并补全 .SZ/.SH 后缀
-        def add_market_suffix(code):
-            code = str(code).upper()
-            if code.startswith("6") or code.startswith("9"):
-                return f"{code}.SH"
-            elif code.startswith(("0", "3")):
-                return f"{code}.SZ"
-            else:
-                return code
-
-        df['代码'] = df['代码'].apply(add_market_suffix)
+        # 股票代码统一规范为 ts_code（补全 .SZ/.SH/.BJ 后缀）
+        df['代码'] = security_master.normalize_codes(df['代码'])
 
         return df
 
@@ -148,8 +138,10 @@ def main():
 
     print(f"\n--- 当前分析周期为: {start_of_week.strftime('%Y-%m-%d')} 至 {today.strftime('%Y-%m-%d')} ---\n")
 
-    stock_pool = pd.read_csv(STOCK_POOL_FILE)
-    code_name_map = {str(row['ts_code']).upper(): row['name'] for _, row in stock_pool.iterrows()}
+    code_name_map = security_master.name_map(security_master.load_master(STOCK_POOL_FILE))
+
+    # 快照按代码建立索引，逐只查找不再扫描整张快照
+    snapshot_by_code = selection_engine.index_snapshot(aligned_snapshot)
 
     grouped = aligned_hist.groupby('代码')
 
@@ -168,7 +160,9 @@ def main():
                 print(this_week_hist[['日期', '涨跌幅']])
 
             # 获取今天的快照数据
-            today_snapshot = aligned_snapshot[aligned_snapshot['代码'] == str(stock_code).upper()]
+            code_key = str(stock_code).upper()
+            today_snapshot = snapshot_by_code.loc[[code_key]].reset_index() \
+                if code_key in snapshot_by_code.index else aligned_snapshot.iloc[0:0]
 
             if stock_code == DEBUG_STOCK_CODE:
                 print(f"🔢 快照数据中的示例代码: {aligned_snapshot['代码'].iloc[0]}")
@@ -209,16 +203,8 @@ def main():
 
             check_data = this_week_combined.tail(N_CONSECUTIVE_DAYS).copy()
 
-            def is_limit_up(code, pct_change):
-                if pct_change is None or pd.isna(pct_change):
-                    return False
-                if str(code).startswith(('30', '68')): return pct_change >= 19.8
-                else: return pct_change >= 9.9
-
-            check_data['is_zt'] = check_data.apply(
-                lambda row: is_limit_up(stock_code, row['涨跌幅']),
-                axis=1
-            )
+            threshold = security_master.limit_up_threshold([stock_code])[0]
+            check_data['is_zt'] = pd.to_numeric(check_data['涨跌幅'], errors='coerce') >= threshold
 
             if stock_code == DEBUG_STOCK_CODE:
                 print(f"🎯 {stock_code} 是否涨停判断结果：")
@@ -2,12 +2,11 @@
 # 2_update_daily_data_fully_auto.py (全自动智能更新终极版)
 # 功能: 自动检测并补齐所有缺失的交易日数据，无需任何手动输入。
 # ------------------------------------------------------------------
-import tushare as ts
-import akshare as ak
 import pandas as pd
 from datetime import datetime
-from tqdm import tqdm
 import os
+from utils import partition_store, array_store, indicator_store, bar_tables, trade_calendar, update_journal, cassette, coverage_index, data_quality
+from utils.schema import tushare_daily_to_master
 
 # --- 配置 ---
 MASTER_DATA_FILE = 'master_stock_data.feather'
@@ -16,41 +15,35 @@ def update_data_fully_auto():
     """
     全自动、智能化地检测并补齐所有缺失的交易日数据。
     """
-    if not os.path.exists(MASTER_DATA_FILE):
+    if not partition_store.ensure_store():
         print(f"!!! 错误: 找不到母版文件'{MASTER_DATA_FILE}'。")
-        print("!!! 请先运行脚本1进行初始化。")
+        print("!!! 请先运行 1_bootstrap_full_history.py 下载全量历史数据进行初始化。")
         return
 
     print("--- 任务2 (全自动版): 开始智能增量更新... ---")
     
     # --- 1. 初始化Tushare (因为我们需要用它来下载数据) ---
     token = os.getenv('TUSHARE_TOKEN')
-    if not token:
-        print("!!! 未在环境变量中找到Tushare Token，无法更新。")
-        return
-    ts.set_token(token)
-    pro = ts.pro_api()
-    print("--- Tushare接口初始化成功 ---")
+    if cassette.replaying():
+        # 回放模式：所有请求都由录制数据应答，不需要 Token
+        pro = cassette.OfflineClient('tushare')
+        print("--- 回放模式: 使用录制的数据源响应，不访问网络 ---")
+    else:
+        if not token:
+            print("!!! 未在环境变量中找到Tushare Token，无法更新。")
+            return
+        # 回放模式不需要安装 tushare
+        import tushare as ts
+        ts.set_token(token)
+        pro = ts.pro_api()
+        print("--- Tushare接口初始化成功 ---")
 
-    # --- 2. 加载本地数据，找到本地的最新日期 ---
-    master_df = pd.read_feather(MASTER_DATA_FILE)
-    master_df['日期'] = pd.to_datetime(master_df['日期'])
-    latest_local_date = master_df['日期'].max()
+    # --- 2. 读取分区清单，找到本地的最新日期 ---
+    latest_local_date = partition_store.latest_date()
     
-    # --- 3. 使用Akshare获取交易日历，识别缺失日期 ---
-    print("--- 正在使用Akshare获取交易日历以检测缺失日期...")
-    try:
-        # 这个函数免费且稳定
-        trade_dates_df = ak.tool_trade_date_hist_sina()
-        trade_dates_df['trade_date'] = pd.to_datetime(trade_dates_df['trade_date'])
-    except Exception as e:
-        print(f"!!! 获取交易日历失败: {e}"); return
-
+    # --- 3. 使用本地交易日历识别缺失日期 ---
     today = pd.to_datetime(datetime.now().date())
-    dates_to_download = trade_dates_df[
-        (trade_dates_df['trade_date'] > latest_local_date) & 
-        (trade_dates_df['trade_date'] <= today)
-    ]['trade_date']
+    dates_to_download = pd.Series(trade_calendar.trading_days_between(latest_local_date, today, inclusive='right'))
 
     if dates_to_download.empty:
         print(f"--- 数据已是最新，无需更新。最新日期: {latest_local_date.strftime('%Y-%m-%d')} ---")
@@ -60,17 +53,10 @@ def update_data_fully_auto():
     print(f"--- 检测到 {len(dates_to_download_str)} 个缺失的交易日，将使用Tushare进行补齐... ---")
     print(f"--- 缺失日期列表: {', '.join(dates_to_download_str)} ---")
 
-    new_data_list = []
-    # --- 4. 使用Tushare遍历下载每一个缺失日期的数据 ---
-    for date_str in tqdm(dates_to_download_str, desc="Tushare补齐数据"):
-        try:
-            # 使用我们验证过有权限的Tushare daily接口
-            daily_data = pro.daily(trade_date=date_str)
-            if not daily_data.empty:
-                new_data_list.append(daily_data)
-        except Exception as e:
-            tqdm.write(f"下载 {date_str} 数据时失败: {e}，将跳过。")
-            continue
+    # --- 4. 并发下载缺失日期的数据，每个交易日到达即暂存，中断后重新运行可续传 ---
+    new_data_list = update_journal.fetch_with_journal(pro, dates_to_download_str)
+    if new_data_list is None:
+        return
     
     if not new_data_list:
         print("!!! 未能下载任何缺失的数据。程序退出。"); return
@@ -80,21 +66,16 @@ def update_data_fully_auto():
     new_data_df = pd.concat(new_data_list, ignore_index=True)
     
     # 统一列名和单位 (与脚本1保持一致)
-    rename_map = {'ts_code': '代码', 'trade_date': '日期', 'open': '开盘', 'close': '收盘', 'high': '最高', 'low': '最低', 'vol': '成交量', 'amount': '成交额', 'pct_chg': '涨跌幅'}
-    new_data_df.rename(columns=rename_map, inplace=True)
-    new_data_df['成交量'] *= 100
-    new_data_df['成交额'] *= 1000
-    final_columns = ['代码', '日期', '开盘', '收盘', '最高', '最低', '成交量', '成交额', '涨跌幅']
-    new_data_df = new_data_df[final_columns]
-    
-    updated_df = pd.concat([master_df, new_data_df], ignore_index=True)
-    
-    updated_df['日期'] = pd.to_datetime(updated_df['日期'])
-    updated_df.drop_duplicates(subset=['代码', '日期'], keep='last', inplace=True)
-    updated_df.sort_values(by=['代码', '日期'], inplace=True)
+    new_data_df = tushare_daily_to_master(new_data_df)
     
-    updated_df.reset_index(drop=True).to_feather(MASTER_DATA_FILE)
-    print(f"--- 母版文件更新成功！最新日期为: {updated_df['日期'].max().strftime('%Y-%m-%d')} ---")
+    written_dates = partition_store.append_partitions(new_data_df)
+    update_journal.UpdateJournal().complete()
+    print(f"--- 母版文件更新成功！最新日期为: {partition_store.latest_date().strftime('%Y-%m-%d')} ---")
+    data_quality.check_after_update(written_dates)
+    array_store.update_array_store(written_dates)
+    indicator_store.update_indicators(written_dates)
+    bar_tables.update_bar_tables(written_dates)
+    coverage_index.report(*coverage_index.build_coverage())
 
 if __name__ == "__main__":
     update_data_fully_auto()
\ No newline at end of file
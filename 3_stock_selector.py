@@ -2,17 +2,23 @@
 import os
 import pandas as pd
 from tqdm import tqdm
-import akshare as ak
 from datetime import datetime, timedelta
 import sys
+import argparse
 import traceback
 from utils.data_loader import load_clean_hist_data, get_clean_snapshot_data
+from utils import (indicator_store, bar_tables, trade_calendar, security_master, data_sources, selection_engine,
+                   parallel_selection, snapshot_recorder)
 
 # --- (假设策略和配置部分不变) ---
 try:
-    from strategies import STRATEGIES
-    from config import SELECTED_STRATEGY
+    from strategies import STRATEGIES, STRATEGY_LOOKBACK_BARS, STRATEGY_INDICATORS, VECTORIZED_STRATEGIES
+    from strategies import week_ma_arrangement
+    from config import SELECTED_STRATEGY, SELECTION_ENGINE, SELECTION_WORKERS
 except ImportError:
+    STRATEGY_LOOKBACK_BARS, STRATEGY_INDICATORS, VECTORIZED_STRATEGIES = {}, {}, {}
+    SELECTION_ENGINE, SELECTION_WORKERS = 'loop', 1
+    week_ma_arrangement = None
     def mock_strategy(stock_code, df):
         if not df.empty and '涨跌幅' in df.columns:
             latest_change = df.iloc[-1]['涨跌幅']
@@ -27,58 +33,170 @@ except ImportError:
         print("警告: 未找到 'strategies.py' 或 'config.py'，使用内置的模拟策略。", file=sys.stderr)
 
 
+# 策略计算用到的历史列
+HIST_COLUMNS = ['代码', '日期', '涨跌幅', '收盘', '成交量']
+
+
+def load_code_name_map():
+    code_name_map = security_master.name_map()
+    if not code_name_map:
+        print("!!! 警告: 'stock_pool.csv' 未找到，股票名称可能无法显示。", file=sys.stderr)
+    return code_name_map
+
+
+def select_by_weekly_table(hist_df, snapshot_df, today):
+    """用周线表一次性完成周K线多头排列选股，结果格式与逐只计算一致"""
+    weekly_bars = bar_tables.load_bars('weekly', last_n=80, columns=['代码', '日期', '收盘', 'MA5', 'MA10', 'MA20', 'MA30'])
+    snapshot = snapshot_df.assign(日期=pd.to_datetime(today))
+    # 日线根数由全部周期的 交易日数 汇总（只读取三列），与逐只计算的"至少300天数据"口径一致
+    daily_bars = bar_tables.count_daily_bars(
+        bar_tables.load_bars('weekly', columns=['代码', '交易日数', '最后交易日']), today)
+    hits = week_ma_arrangement.select_universe(weekly_bars, snapshot, daily_bars)
+    if hits.empty:
+        return []
+
+    snapshot = selection_engine.index_snapshot(snapshot)
+    hist_df = hist_df.assign(代码=hist_df['代码'].astype(str))
+    hist_df = hist_df[pd.to_datetime(hist_df['日期']) < pd.to_datetime(today)]
+    yesterday_volume = hist_df.sort_values('日期').groupby('代码')['成交量'].last()
+    code_name_map = load_code_name_map()
+
+    selected_stocks = []
+    for code, trigger_date in zip(hits['代码'], hits['触发日期']):
+        row = snapshot.loc[code]
+        prev_volume = yesterday_volume.get(code)
+        selected_stocks.append({
+            'ts_code': code,
+            '名称': code_name_map.get(code, ''),
+            '最后触发日期': trigger_date.strftime('%Y-%m-%d'),
+            '当前股价': round(row['收盘'], 2),
+            '涨跌幅%': round(row['涨跌幅'], 2) if pd.notna(row.get('涨跌幅')) else None,
+            '当天成交量': int(row['成交量']) if pd.notna(row.get('成交量')) else None,
+            '上一交易日成交量': int(prev_volume) if pd.notna(prev_volume) else None,
+        })
+    return selected_stocks
+
+
+def select_vectorized(select_all, combined, latest_close, today):
+    """用策略的向量化版本对全市场一次选股，结果格式与逐只计算一致"""
+    result = select_all(selection_engine.build_panel(combined))
+    return selection_engine.to_selected_stocks(result, latest_close, load_code_name_map(), today)
+
+
 def main():
     """主程序入口"""
+    parser = argparse.ArgumentParser(description='选股')
+    parser.add_argument('--workers', type=int, default=SELECTION_WORKERS,
+                        help='逐只选股时使用的进程数（没有向量化版本的策略），默认 config.SELECTION_WORKERS')
+    workers = parser.parse_args().workers
     # 重定向stderr到stdout，确保GUI能捕获所有输出
     sys.stderr = sys.stdout
-    print("--- 正在从本地加载历史数据... ---", file=sys.stderr)
-    hist_data_full = load_clean_hist_data()
+    # 回放录制的快照时以模拟时钟为准，只使用回放交易日之前的历史，复现当时选股程序看到的数据
+    replayer = snapshot_recorder.active_replayer()
+    now = replayer.now() if replayer is not None else datetime.now()
+    is_market_closed = now.hour >= 15
+    today = now.date()
+    hist_end = today - timedelta(days=1) if replayer is not None else None
+    # 只加载策略用到的列和K线范围，过滤在读取阶段完成
+    lookback_bars = STRATEGY_LOOKBACK_BARS.get(SELECTED_STRATEGY)
+    # 周K线多头排列可直接使用周线表，日线只需最近一根（取上一交易日成交量）
+    # 周线表和预计算指标对应母版的最新状态，回放过去的交易日时不能使用
+    use_weekly_table = (replayer is None and SELECTED_STRATEGY == "week_ma_arrangement"
+                        and week_ma_arrangement is not None and bar_tables.table_exists('weekly'))
+    if use_weekly_table:
+        lookback_bars = 2
+    # 回看区间按交易日计算，例如周K线多头排列需要 300 个交易日来计算周线MA30
+    lookback_start = trade_calendar.lookback_start(today, lookback_bars) if lookback_bars else None
+    if lookback_start is not None:
+        start_date = lookback_start.to_pydatetime()
+    else:
+        monday_of_week = today - timedelta(days=today.weekday())
+        start_date = datetime.combine(monday_of_week, datetime.min.time())
+
+    # 本地历史读取与行情快照获取互不依赖，同时进行
+    print("--- 正在从本地加载历史数据，同时获取今日行情快照... ---", file=sys.stderr)
+    hist_data_full, snapshot_df = data_sources.gather(
+        lambda: load_clean_hist_data(columns=HIST_COLUMNS, start=start_date, end=hist_end), get_clean_snapshot_data)
     if hist_data_full is None:
         print("!!! 加载历史数据失败", file=sys.stderr)
         return
 
     print(f"--- 数据加载成功！共 {len(hist_data_full['代码'].unique())} 只股票的历史数据。", file=sys.stderr)
 
-    print("--- 正在获取今日行情快照... ---", file=sys.stderr)
-    snapshot_df = get_clean_snapshot_data()
     if snapshot_df is None:
         print("!!! 获取快照失败，退出", file=sys.stderr)
         return
 
-    print("\n[OK] 开始统一字段定义...", file=sys.stderr)
-    aligned_hist, aligned_snapshot = align_fields(hist_data_full, snapshot_df)
-    print("[OK] 字段已统一，开始执行选股策略", file=sys.stderr)
+    if use_weekly_table:
+        print("--- 使用周线表进行向量化选股 ---", file=sys.stderr)
+        selected_stocks = select_by_weekly_table(hist_data_full, snapshot_df, today)
+        print("PROGRESS: 100", flush=True)
+        report_results(selected_stocks, snapshot_df, is_market_closed)
+        return
 
-    selected_stocks = []
-    now = datetime.now()
-    is_market_closed = now.hour >= 15
-    today = now.date()
-    # For the MA strategy, we need at least 60 days of historical data
-    # For other strategies, we can use a weekly range
-    if SELECTED_STRATEGY == "ma_condition_strategy":
-        start_date = datetime.combine(today - timedelta(days=60), datetime.min.time())
-    elif SELECTED_STRATEGY == "week_ma_arrangement":
-        # 对于周K线多头排列策略，需要至少300天的数据来计算周线MA30
-        start_date = datetime.combine(today - timedelta(days=300), datetime.min.time())
+    # 拼接预计算指标（历史部分按键读取，今日部分在滚动状态上推进一天）
+    indicator_columns = STRATEGY_INDICATORS.get(SELECTED_STRATEGY, [])
+    if indicator_columns and indicator_store.store_exists() and replayer is None:
+        print(f"--- 使用预计算指标: {', '.join(indicator_columns)} ---", file=sys.stderr)
+        hist_data_full = indicator_store.attach_indicators(hist_data_full, indicator_columns)
+        snapshot_df = indicator_store.snapshot_indicators(snapshot_df, indicator_columns)
     else:
-        monday_of_week = today - timedelta(days=today.weekday())
-        start_date = datetime.combine(monday_of_week, datetime.min.time())
+        indicator_columns = []
+
+    print("\n[OK] 开始拼接今日行情...", file=sys.stderr)
+    # 今日快照按代码一次性对齐并拼接到全部股票的历史上（截取与去重规则见 utils/selection_engine.py）
+    combined, latest_closes = selection_engine.prepare_universe(
+        hist_data_full, snapshot_df, today, HIST_COLUMNS + indicator_columns,
+        tail_bars=STRATEGY_LOOKBACK_BARS.get(SELECTED_STRATEGY), start_date=start_date)
+    print("[OK] 拼接完成，开始执行选股策略", file=sys.stderr)
+
+    # 有向量化版本的策略对全市场一次计算；出错时退回逐只计算
+    select_all = VECTORIZED_STRATEGIES.get(SELECTED_STRATEGY) if SELECTION_ENGINE == 'vectorized' else None
+    if select_all is not None:
+        print("--- 使用向量化引擎对全市场一次选股 ---", file=sys.stderr)
+        try:
+            selected_stocks = select_vectorized(select_all, combined, latest_closes, today)
+        except Exception as e:
+            print(f"!!! 向量化选股失败（{e}），改为逐只计算", file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+        else:
+            print("PROGRESS: 100", flush=True)
+            report_results(selected_stocks, snapshot_df, is_market_closed)
+            return
+
+    selected_stocks = []
 
     print(f"\n--- 当前分析周期为: {start_date.strftime('%Y-%m-%d')} 至 {today.strftime('%Y-%m-%d')} ---\n", file=sys.stderr)
 
-    try:
-        stock_pool = pd.read_csv('stock_pool.csv')
-        code_name_map = {str(row['ts_code']).upper(): row['name'] for _, row in stock_pool.iterrows()}
-    except FileNotFoundError:
-        print("!!! 警告: 'stock_pool.csv' 未找到，股票名称可能无法显示。", file=sys.stderr)
-        code_name_map = {}
+    code_name_map = load_code_name_map()
 
     strategy_func = STRATEGIES.get(SELECTED_STRATEGY)
     if not strategy_func:
         print(f"!!! 错误: 在 STRATEGIES 中未找到名为 '{SELECTED_STRATEGY}' 的策略。", file=sys.stderr)
         return
 
-    grouped = aligned_hist.groupby('代码')
+    UPDATE_INTERVAL = 50 
+
+    if workers > 1:
+        # 多进程：面板以内存映射共享给工作进程，按股票分片执行，结果按原顺序合并
+        print(f"--- 使用 {workers} 个进程逐只选股 ---", file=sys.stderr)
+        universe = selection_engine.build_panel(combined)
+
+        def report_progress(done, total):
+            print(f"PROGRESS: {int(done * 100 / total)}", flush=True)
+
+        hits = parallel_selection.run_parallel(universe, SELECTED_STRATEGY, workers, chunk_size=UPDATE_INTERVAL,
+                                               on_chunk=report_progress)
+        for stock_code, parsed in hits:
+            try:
+                selected_stocks.append(parallel_selection.result_dict(stock_code, parsed, latest_closes[stock_code],
+                                                                      code_name_map, today))
+            except Exception as e:
+                print(f"Error processing {stock_code}: {e}", file=sys.stderr)
+        report_results(selected_stocks, snapshot_df, is_market_closed)
+        return
+
+    grouped = combined.drop(columns='代码').groupby(combined['代码'], sort=False)
     total_stocks = len(grouped)
     
     # ===== 关键修正：配置 tqdm 在非终端环境下安全运行 =====
@@ -91,81 +209,13 @@ def main():
         disable=not sys.stderr.isatty() # 如果 stderr 不是一个终端，则完全禁用 tqdm 的视觉输出
     )
 
-    UPDATE_INTERVAL = 50 
-
-    for i, (stock_code, hist_data) in enumerate(progress_bar):
+    for i, (stock_code, stock_data) in enumerate(progress_bar):
         try:
-            # For the MA strategy, we need to ensure we have at least 60 data points
-            if SELECTED_STRATEGY == "ma_condition_strategy":
-                # Sort by date and take the last 60 data points
-                this_week_hist = hist_data.sort_values('日期').tail(60).copy()
-            # For the high volume strategy, we need at least 30 data points to calculate 20-day MA
-            elif SELECTED_STRATEGY == "high_volume_strategy":
-                # Sort by date and take the last 30 data points
-                this_week_hist = hist_data.sort_values('日期').tail(30).copy()
-            # For the week MA arrangement strategy, we need at least 300 data points
-            elif SELECTED_STRATEGY == "week_ma_arrangement":
-                # Sort by date and take the last 300 data points
-                this_week_hist = hist_data.sort_values('日期').tail(300).copy()
-            else:
-                this_week_hist = hist_data[(hist_data['日期'] >= start_date) & (hist_data['日期'] < datetime.combine(today, datetime.min.time()))].copy()
-            
-            today_snapshot = snapshot_df[snapshot_df['代码'] == str(stock_code).upper()]
-            if today_snapshot.empty: 
-                continue
-            today_snapshot = today_snapshot.assign(日期=pd.to_datetime(today))
-            # 确保合并时包含成交量数据
-            hist_columns = ['日期', '涨跌幅', '收盘']
-            if '成交量' in this_week_hist.columns and '成交量' in today_snapshot.columns:
-                hist_columns.append('成交量')
-            this_week_combined = pd.concat([this_week_hist[hist_columns], today_snapshot[hist_columns]], ignore_index=True)
-            # 仅对历史数据去重，保留今日快照数据
-            # 修改去重逻辑：优先保留有成交量数据的记录
-            if '成交量' in this_week_combined.columns:
-                # 创建一个标记列，标识哪些行有成交量数据
-                this_week_combined['has_volume'] = this_week_combined['成交量'].notna()
-                # 按日期分组，优先保留有成交量的记录
-                this_week_combined = this_week_combined.sort_values(['日期', 'has_volume'], ascending=[True, False]).drop_duplicates(subset=['日期'], keep='first')
-                # 删除辅助列
-                this_week_combined.drop(columns=['has_volume'], inplace=True)
-            else:
-                this_week_combined.drop_duplicates(subset=['日期'], keep='last', inplace=True)
-            this_week_combined.sort_values(by='日期', inplace=True)
-            latest_close = today_snapshot.iloc[-1].get('收盘')
-            if pd.isna(latest_close): continue
-            result = strategy_func(stock_code, this_week_combined)
             # 处理策略返回的不同格式
-            if isinstance(result, tuple):
-                # 确保至少有3个元素
-                if len(result) >= 3:
-                    # 新格式 (is_selected_flag, today_volume, yesterday_volume, ...)
-                    is_selected_flag = result[0]
-                    today_volume = result[1] if len(result) > 1 else None
-                    yesterday_volume = result[2] if len(result) > 2 else None
-                    # 如果有额外的参数，假设第4个是trigger_date，第5个是change_percent
-                    trigger_date = result[3] if len(result) > 3 else None
-                    change_percent = result[4] if len(result) > 4 else None
-                else:
-                    is_selected_flag = result[0] if result else False
-                    today_volume = yesterday_volume = trigger_date = change_percent = None
-            elif isinstance(result, bool):
-                is_selected_flag, trigger_date, change_percent = result, None, None
-                today_volume = yesterday_volume = None
-            else:
-                is_selected_flag = False
-                today_volume = yesterday_volume = trigger_date = change_percent = None
-            
-            if is_selected_flag:
-                result_dict = {
-                    'ts_code': stock_code, 
-                    '名称': code_name_map.get(stock_code, ''), 
-                    '最后触发日期': trigger_date.strftime('%Y-%m-%d') if isinstance(trigger_date, (datetime, pd.Timestamp)) else today.strftime('%Y-%m-%d'), 
-                    '当前股价': round(latest_close, 2), 
-                    '涨跌幅%': round(change_percent, 2) if pd.notna(change_percent) else None,
-                    '当天成交量': int(today_volume) if today_volume is not None else None,
-                    '上一交易日成交量': int(yesterday_volume) if yesterday_volume is not None else None
-                }
-                selected_stocks.append(result_dict)
+            parsed = parallel_selection.parse_result(strategy_func(stock_code, stock_data.reset_index(drop=True)))
+            if parsed[0]:
+                selected_stocks.append(parallel_selection.result_dict(stock_code, parsed, latest_closes[stock_code],
+                                                                      code_name_map, today))
         except Exception as e:
             progress_bar.write(f"Error processing {stock_code}: {e}")
             traceback.print_exc(file=sys.stderr)
@@ -175,6 +225,10 @@ def main():
                 progress_percentage = int(((i + 1) / total_stocks) * 100)
                 print(f"PROGRESS: {progress_percentage}", flush=True)
 
+    report_results(selected_stocks, snapshot_df, is_market_closed)
+
+def report_results(selected_stocks, snapshot_df, is_market_closed):
+    """输出并保存选股结果"""
     print(f"\n\n==============================================", file=sys.stderr)
     print(f"         {'Post-market' if is_market_closed else 'Intraday'} Selection Results         ", file=sys.stderr)
     print("==============================================", file=sys.stderr)
@@ -223,16 +277,6 @@ def main():
         print(result_df.to_string(index=False), file=sys.stderr)
         print(f"\nTask complete. Found {len(result_df)} matching stocks.", file=sys.stderr)
     print("==============================================", file=sys.stderr)
-    
-def align_fields(hist_df, snapshot_df):
-    all_columns = set(hist_df.columns).union(set(snapshot_df.columns))
-    aligned_hist, aligned_snapshot = hist_df.copy(), snapshot_df.copy()
-    for col in all_columns:
-        if col not in aligned_hist.columns: aligned_hist[col] = None
-        if col not in aligned_snapshot.columns: aligned_snapshot[col] = None
-    aligned_hist = aligned_hist[sorted(list(all_columns))]
-    aligned_snapshot = aligned_snapshot[sorted(list(all_columns))]
-    return aligned_hist, aligned_snapshot
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -6,13 +6,39 @@
 # SELECTED_STRATEGY = "ma_condition_strategy"
 # SELECTED_STRATEGY = "high_volume_strategy"
 SELECTED_STRATEGY = "week_ma_arrangement"
+SELECTION_ENGINE = 'vectorized'  # 'vectorized' 有向量化版本的策略对全市场一次计算；'loop' 逐只调用 STRATEGIES
+SELECTION_WORKERS = 1             # 逐只选股的进程数（没有向量化版本的策略；命令行 --workers 优先）
 MAX_RETRIES = 3                   # 接口最大重试次数
 MIN_INTERVAL = 2                  # 初始请求间隔（秒）
 MAX_INTERVAL = 60                 # 最大请求间隔（秒）
+DOWNLOAD_WORKERS = 4              # 并发下载线程数
+TUSHARE_CALLS_PER_MINUTE = 200    # Tushare 每分钟调用配额（按账号积分调整）
+BOOTSTRAP_START_DATE = '2015-01-01'  # 全量历史初始化的起始日期
+DATA_SOURCE_THREADS = 8           # 数据源共享线程池大小
+DATA_SOURCE_CONCURRENCY = {'akshare': 2, 'tushare': 4}  # 各数据源同时进行的请求数上限
+DATA_SOURCE_TIMEOUT = 30          # 单次数据源请求超时（秒）
+SOURCE_STATS_FILE = 'source_stats.json'  # 各数据源最近请求耗时与成败的统计
+SOURCE_STATS_WINDOW = 20          # 每个数据源保留的最近请求数
+SOURCE_HEDGE_DELAY = 5            # 首选数据源超过该时间（秒）未返回时同时请求下一个
 
 MASTER_DATA_FILE = 'master_stock_data.feather'
+MASTER_STORE_DIR = 'master_store'  # 按交易日分区的母版数据目录
+ARRAY_STORE_DIR = 'array_store'    # 按股票连续存放的内存映射数组目录
+INDICATOR_STORE_DIR = 'indicator_store'  # 增量维护的均线/涨停指标目录
+BAR_TABLE_DIR = 'bar_tables'  # 周线/月线表目录（含周期均线）
+UPDATE_STAGING_DIR = 'update_staging'  # 补数运行的暂存目录与运行日志（断点续传）
+COVERAGE_DIR = 'coverage_index'  # 逐只股票的覆盖索引（首末日期、缺口、已确认停牌）
+DATA_QUALITY_FILE = 'data_quality.feather'  # 每个交易日的截面质量统计
+DATA_QUALITY_AUTO_REPAIR = True  # 更新后自动修复检测到的单位错误（只改写出错交易日的分区）
 SNAPSHOT_FILE = 'snapshot_data.feather'
+SNAPSHOT_TTL_SECONDS = 120        # 盘中快照缓存有效期（秒）
+TRADE_CALENDAR_FILE = 'trade_calendar.feather'
+RECORD_SNAPSHOTS = False          # 是否录制每次获取的盘中快照（用于离线回放）
+SNAPSHOT_RECORD_DIR = 'snapshot_records'
+CASSETTE_MODE = None              # 数据源录制/回放：None、'record'、'replay'、'once'（环境变量 DATA_CASSETTE_MODE 优先）
+CASSETTE_DIR = 'cassettes'        # 录制的数据源响应目录（环境变量 DATA_CASSETTE_DIR 优先）
 STOCK_POOL_FILE = 'stock_pool.csv'
+COMPACT_SCHEMA = False            # 紧凑类型：代码字典编码、价格float32（大幅降低内存占用）
 
 N_CONSECUTIVE_DAYS = 1           # 默认连板天数
 DEBUG_STOCK_CODE = None           # 设置调试股票代码（如 '000514.SZ'）
\ No newline at end of file
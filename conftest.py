@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _make_day(date, codes, close=10.0):
+    return pd.DataFrame({
+        '代码': codes,
+        '日期': pd.to_datetime(date),
+        '开盘': close, '收盘': close, '最高': close, '最低': close,
+        '成交量': 1000.0, '成交额': close * 1000, '涨跌幅': 0.0,
+    })
+
+
+def _make_master(days, codes, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        '代码': np.repeat(codes, len(days)),
+        '日期': np.tile(days, len(codes)),
+    })
+    df['收盘'] = rng.uniform(5, 20, len(df))
+    df['成交量'] = rng.uniform(1e5, 1e6, len(df))
+    df['涨跌幅'] = rng.choice([0.0, 10.0, 20.0], len(df))
+    df['开盘'] = df['收盘'] * 0.99
+    df['最高'] = df['收盘'] * 1.02
+    df['最低'] = df['收盘'] * 0.98
+    df['成交额'] = df['成交量'] * df['收盘']
+    return df
+
+
+@pytest.fixture
+def make_day():
+    """单个交易日的母版数据：每只股票一行，OHLC 均为 close"""
+    return _make_day
+
+
+@pytest.fixture
+def make_master():
+    """多只股票、多个交易日的随机母版数据（涨跌幅取 0/10/20，用于涨停统计）"""
+    return _make_master
+
+
+# 脚本式的调试文件：模块导入时就联网/弹窗，直接用 python 运行，不参与 pytest 收集
+collect_ignore = ['test_specific_stock.py', 'test_volume_conversion.py', 'test_qtwebengine.py']
+
+
+def pytest_addoption(parser):
+    parser.addoption('--run-network', action='store_true', default=False,
+                     help='运行需要联网（访问 Akshare/Tushare）的测试')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'network: 需要联网访问真实数据源，默认跳过（--run-network 开启）')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--run-network'):
+        return
+    skip_network = pytest.mark.skip(reason='需要联网，使用 --run-network 运行')
+    for item in items:
+        if 'network' in item.keywords:
+            item.add_marker(skip_network)
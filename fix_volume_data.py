@@ -1,50 +1,48 @@
 # fix_volume_data.py
+# 母版数据质量检查与单位修复（命令行入口，逻辑见 utils/data_quality.py）：
+#   python fix_volume_data.py                      # 检查全部交易日
+#   python fix_volume_data.py --fix                # 检查并修复检测到的单位错误
+#   python fix_volume_data.py --date 2025-07-24 --column 成交量 --factor 100   # 手动修复某天
+import argparse
 import pandas as pd
-import datetime
-
-# --- 配置 ---
-MASTER_DATA_FILE = 'master_stock_data.feather'
-# 将这里的日期改为实际出错的日期
-ERROR_DATE = pd.to_datetime('2025-07-24').normalize() 
-
-def fix_volume_data():
-    """
-    一次性修复母版数据文件中，指定日期所有股票被错误处理的成交量数据。
-    """
-    try:
-        df = pd.read_feather(MASTER_DATA_FILE)
-        df['日期'] = pd.to_datetime(df['日期'])
-        print(f"母版数据文件 '{MASTER_DATA_FILE}' 加载成功。")
-    except Exception as e:
-        print(f"读取文件时发生错误: {e}")
+from utils import partition_store, array_store, indicator_store, bar_tables, data_quality
+
+
+def refresh_derived_stores(repaired_dates):
+    """修复后刷新由母版派生的存储"""
+    if not repaired_dates:
         return
+    array_store.update_array_store(repaired_dates)
+    indicator_store.update_indicators(repaired_dates)
+    bar_tables.update_bar_tables(repaired_dates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='母版数据质量检查与单位修复')
+    parser.add_argument('--fix', action='store_true', help='修复检测到的单位错误（只改写出错交易日的分区）')
+    parser.add_argument('--date', type=str, help='手动修复的交易日 (格式: YYYY-MM-DD)')
+    parser.add_argument('--column', choices=['成交量', '成交额'], default='成交量', help='手动修复的列')
+    parser.add_argument('--factor', type=float, default=100, help='成交量乘以 / 成交额除以的倍数')
+    args = parser.parse_args()
+
+    if not partition_store.ensure_store():
+        print("!!! 找不到母版数据，请先运行 1_bootstrap_full_history.py 进行初始化。")
+        return
+
+    if args.date:
+        data_quality.repair_units(args.date, args.column, args.factor)
+        refresh_derived_stores([pd.Timestamp(args.date)])
+        return
+
+    flagged = data_quality.update_stats()
+    data_quality.report(flagged)
+    if args.fix:
+        repaired = []
+        for row in flagged[flagged['单位因子'] != 1.0].itertuples(index=False):
+            data_quality.repair_units(row.日期, row.出错列, row.单位因子)
+            repaired.append(pd.Timestamp(row.日期))
+        refresh_derived_stores(repaired)
 
-    # 定位到需要修复的所有行 (只根据日期)
-    target_rows_mask = (df['日期'] == ERROR_DATE)
-    
-    if target_rows_mask.any():
-        num_rows = target_rows_mask.sum()
-        print(f"找到了 {num_rows} 条在 {ERROR_DATE.date()} 的数据，准备修正成交量...")
-        
-        print("\n修正前数据示例:")
-        print(df.loc[target_rows_mask, ['代码', '日期', '成交量']].head())
-        
-        # 将这些行的成交量乘以 100 来恢复
-        df.loc[target_rows_mask, '成交量'] = df.loc[target_rows_mask, '成交量'] * 100
-        
-        print("\n数据已在内存中修正。")
-        
-        print("\n修正后数据示例:")
-        print(df.loc[target_rows_mask, ['代码', '日期', '成交量']].head())
-        
-        try:
-            df.reset_index(drop=True).to_feather(MASTER_DATA_FILE)
-            print(f"\n数据修正并保存成功！'{MASTER_DATA_FILE}' 已被覆盖。")
-        except Exception as e:
-            print(f"\n保存文件时发生错误: {e}")
-            
-    else:
-        print(f"未在文件中找到 {ERROR_DATE.date()} 的数据行，无需修正。")
 
 if __name__ == "__main__":
-    fix_volume_data()
\ No newline at end of file
+    main()
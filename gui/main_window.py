@@ -70,37 +70,52 @@ class ExternalScriptWorker:
 try:
     from utils.data_loader import load_clean_hist_data, get_clean_snapshot_data
 except ImportError:
-    def load_clean_hist_data(): return pd.DataFrame()
+    def load_clean_hist_data(**kwargs): return pd.DataFrame()
     def get_clean_snapshot_data(): return pd.DataFrame()
+try:
+    from utils import array_store, snapshot_cache, security_master, data_sources
+except ImportError:
+    array_store = snapshot_cache = security_master = data_sources = None
+
+
+def to_tushare_format(codes):
+    """批量把代码规范为 ts_code（000001 -> 000001.SZ，430047 -> 430047.BJ）"""
+    if security_master is None: return codes.astype(str).str.strip()
+    return security_master.normalize_codes(codes)
 
 def load_combined_data(stock_code):
     debug_print(f"加载股票 {stock_code} 的数据")
     try:
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        cache_path = os.path.join(project_root, 'snapshot_cache.csv')
-        
-        if os.path.exists(cache_path): df_snap = pd.read_csv(cache_path, parse_dates=['日期'])
-        else: df_snap = get_clean_snapshot_data()
-        df_hist = load_clean_hist_data()
-
-        def to_tushare_format(code):
-            if pd.isna(code) or '.' in str(code): return code
-            try: code_str = str(int(float(code))).zfill(6)
-            except (ValueError, TypeError): return code
-            if code_str.startswith(('0', '3')): return f"{code_str}.SZ"
-            if code_str.startswith(('6', '8', '9')): return f"{code_str}.SH"
-            return code_str
+        def load_snapshot():
+            # 点击列表时优先使用已缓存的快照（即使已过期），避免每次点击都联网
+            df_snap = None
+            if snapshot_cache is not None:
+                df_snap, _ = snapshot_cache.read_snapshot(allow_stale=True)
+            if df_snap is None: df_snap = get_clean_snapshot_data()
+            return df_snap if df_snap is not None else pd.DataFrame()
+
+        def load_history():
+            # 优先从内存映射数组存储中按偏移读取单只股票，避免加载全市场历史
+            if array_store is not None and array_store.store_exists():
+                return array_store.load_stock_frame(stock_code)
+            return load_clean_hist_data(codes=[stock_code])
+
+        # 快照与历史互不依赖，同时获取
+        if data_sources is not None:
+            df_snap, df_hist = data_sources.gather(load_snapshot, load_history)
+        else:
+            df_snap, df_hist = load_snapshot(), load_history()
 
         all_dfs = []
         if not df_hist.empty:
-            df_hist['代码'] = df_hist['代码'].apply(to_tushare_format)
+            df_hist['代码'] = to_tushare_format(df_hist['代码'])
             df_hist_stock = df_hist[df_hist['代码'] == stock_code].copy()
             if not df_hist_stock.empty: all_dfs.append(df_hist_stock)
         
         if not df_snap.empty:
             rename_map = {'最新价':'收盘','今开':'开盘','最高':'最高','最低':'最低','成交量':'成交量'}
             df_snap.rename(columns=rename_map, inplace=True, errors='ignore')
-            df_snap['代码'] = df_snap['代码'].apply(to_tushare_format)
+            df_snap['代码'] = to_tushare_format(df_snap['代码'])
             df_snap_stock = df_snap[df_snap['代码'] == stock_code].copy()
             if not df_snap_stock.empty: all_dfs.append(df_snap_stock)
             
@@ -147,10 +162,7 @@ class StockKLineViewer(QMainWindow):
         try:
             df = pd.read_csv(file_path)
             if '名称' in df.columns: df.rename(columns={'名称': 'name'}, inplace=True)
-            df['ts_code'] = df['ts_code'].astype(str).apply(
-                lambda x: x.strip() if isinstance(x, str) else x).apply(
-                lambda x: x if '.' in str(x) else (
-                    f"{str(x).zfill(6)}.SZ" if str(x).startswith(('0', '3')) else f"{str(x).zfill(6)}.SH"))
+            df['ts_code'] = to_tushare_format(df['ts_code'])
             return df
         except FileNotFoundError: return pd.DataFrame(columns=['ts_code', 'name'])
 
@@ -174,7 +186,7 @@ class StockKLineViewer(QMainWindow):
         select_count_layout = QHBoxLayout(); select_count_layout.addWidget(QLabel("已选股票数:")); self.select_count_label = QLabel("0"); select_count_layout.addWidget(self.select_count_label); select_count_layout.addStretch(); left_panel_layout.addLayout(select_count_layout)
         self.stock_list = QListWidget(); self.stock_list.setMinimumWidth(300)
         if self.stock_pool.empty: self.stock_list.addItem("无可用股票数据")
-        else: self.stock_list.addItems([f"{row['ts_code']} - {row['name']}" for _, row in self.stock_pool.iterrows()])
+        else: self.stock_list.addItems((self.stock_pool['ts_code'] + ' - ' + self.stock_pool['name'].astype(str)).tolist())
         self.stock_list.currentItemChanged.connect(self.on_stock_selected); left_panel_layout.addWidget(self.stock_list)
         self.log_window = QTextEdit(); self.log_window.setReadOnly(True); self.log_window.setFixedHeight(150); left_panel_layout.addWidget(self.log_window)
         left_panel = QWidget(); left_panel.setLayout(left_panel_layout); left_panel.setMaximumWidth(300)
@@ -221,7 +233,7 @@ class StockKLineViewer(QMainWindow):
             self.select_count_label.setText(str(len(self.stock_pool)))
             self.stock_list.clear()
             if self.stock_pool.empty: self.stock_list.addItem("无选股结果")
-            else: self.stock_list.addItems([f"{r['ts_code']} - {r['name']}" for _, r in self.stock_pool.iterrows()])
+            else: self.stock_list.addItems((self.stock_pool['ts_code'] + ' - ' + self.stock_pool['name'].astype(str)).tolist())
             if not self.stock_pool.empty: self.stock_list.setCurrentRow(0)
     def closeEvent(self, event):
         debug_print("窗口关闭事件触发")
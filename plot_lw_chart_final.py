@@ -1,27 +1,37 @@
 import pandas as pd
-import os
 from lightweight_charts import Chart
 import asyncio
+from utils import array_store, bar_tables
+from utils.data_loader import load_clean_hist_data
 
-MASTER_DATA_FILE = 'master_stock_data.feather'
 STOCK_POOL_FILE = 'stock_pool.csv'
 
 async def plot_final_humble_chart(stock_code, days_to_plot=250):
-    if not os.path.exists(MASTER_DATA_FILE): print("错误: 缺少数据文件。"); return
-
-    hist_data_full = pd.read_feather(MASTER_DATA_FILE)
     stock_pool = pd.read_csv(STOCK_POOL_FILE)
-    stock_data = hist_data_full[hist_data_full['代码'] == stock_code].copy()
-    if stock_data.empty: print(f"错误: 找不到股票 {stock_code}。"); return
 
-    stock_data = stock_data.tail(days_to_plot + 30).reset_index(drop=True)
+    if bar_tables.table_exists('weekly'):
+        # 周线表已含 OHLCV 与 MA5/10/20/30，直接读取
+        df_chart = bar_tables.load_bars('weekly', codes=[stock_code])
+        if df_chart.empty: print(f"错误: 找不到股票 {stock_code}。"); return
+        df_chart = df_chart.tail((days_to_plot + 30) // 5).reset_index(drop=True)
+    else:
+        if array_store.store_exists():
+            stock_data = array_store.load_stock_frame(stock_code)
+        else:
+            try:
+                stock_data = load_clean_hist_data(codes=[stock_code], last_n_days=days_to_plot + 30)
+            except FileNotFoundError:
+                print("错误: 缺少数据文件。"); return
+        if stock_data.empty: print(f"错误: 找不到股票 {stock_code}。"); return
+        stock_data = stock_data.tail(days_to_plot + 30).reset_index(drop=True)
+        stock_data['日期'] = pd.to_datetime(stock_data['日期'])
+        df_chart = bar_tables.add_moving_averages(bar_tables.aggregate_bars(stock_data, 'weekly'))
+
     stock_name = stock_pool[stock_pool['ts_code'] == stock_code]['name'].iloc[0]
-    
-    df_chart = stock_data.copy()
-    df_chart.rename(columns={'日期':'time', '开盘':'open', '最高':'high', '最低':'low', '收盘':'close', '成交量':'volume'}, inplace=True)
-    df_chart['time'] = pd.to_datetime(df_chart['time'])
-    df_chart = df_chart.resample('W', on='time').last().reset_index()
-    df_chart['time'] = df_chart['time'].dt.strftime('%Y-%m-%d')
+
+    df_chart = df_chart.rename(columns={'日期':'time', '开盘':'open', '最高':'high', '最低':'low', '收盘':'close', '成交量':'volume'})
+    df_chart = df_chart[['time', 'open', 'high', 'low', 'close', 'volume'] + [f'MA{n}' for n in bar_tables.MA_WINDOWS]]
+    df_chart['time'] = pd.to_datetime(df_chart['time']).dt.strftime('%Y-%m-%d')
     
     chart = Chart(width=1400, height=800)
     chart.set(df_chart)
@@ -35,8 +45,8 @@ async def plot_final_humble_chart(stock_code, days_to_plot=250):
         # 【最终核心修正】
         line_name = f'MA {period}'
         
-        # 1. 计算均线
-        df_chart[line_name] = df_chart['close'].rolling(window=period).mean()
+        # 1. 均线取自周线表
+        df_chart[line_name] = df_chart[f'MA{period}']
         
         # 2. 准备专门用于这条线的数据DataFrame
         #    它的列名必须是 'time' 和 这条线的名字 (line_name)
@@ -6,6 +6,12 @@ from .high_price_filter import is_selected as high_price_filter_strategy
 from .ma_condition_strategy import is_selected as ma_condition_strategy
 from .high_volume_strategy import is_selected as high_volume_strategy
 from .week_ma_arrangement import is_selected as week_ma_arrangement_strategy
+from .n_limit_up import select_all as n_limit_up_select_all
+from .ma_crossover import select_all as ma_crossover_select_all
+from .high_price_filter import select_all as high_price_filter_select_all
+from .ma_condition_strategy import select_all as ma_condition_select_all
+from .high_volume_strategy import select_all as high_volume_select_all
+from .week_ma_arrangement import select_all as week_ma_arrangement_select_all
 
 STRATEGIES = {
     "n_limit_up": n_limit_up_strategy,
@@ -14,4 +20,32 @@ STRATEGIES = {
     "ma_condition_strategy": ma_condition_strategy,
     "high_volume_strategy": high_volume_strategy,
     "week_ma_arrangement": week_ma_arrangement_strategy,
-}
\ No newline at end of file
+}
+
+# 各策略需要回看的交易日数量（None 表示使用本周数据），用于加载历史数据时的下推过滤
+STRATEGY_LOOKBACK_BARS = {
+    "n_limit_up": None,
+    "ma_crossover": None,
+    "high_price_filter": None,
+    "ma_condition_strategy": 60,
+    "high_volume_strategy": 30,
+    "week_ma_arrangement": 300,
+}
+
+# 各策略可直接使用的预计算指标列（由 utils/indicator_store 增量维护，缺失时策略自行计算）
+STRATEGY_INDICATORS = {
+    "ma_crossover": ['MA5', 'MA10'],
+    "ma_condition_strategy": ['MA5', 'MA30', 'MA60'],
+    "high_volume_strategy": ['VMA20'],
+}
+
+# 向量化版本：select_all(panel) 在全市场的 日期 × 股票 面板上一次计算（见 utils/selection_engine.py），
+# 不在此表中的策略逐只调用 STRATEGIES
+VECTORIZED_STRATEGIES = {
+    "n_limit_up": n_limit_up_select_all,
+    "ma_crossover": ma_crossover_select_all,
+    "high_price_filter": high_price_filter_select_all,
+    "ma_condition_strategy": ma_condition_select_all,
+    "high_volume_strategy": high_volume_select_all,
+    "week_ma_arrangement": week_ma_arrangement_select_all,
+}
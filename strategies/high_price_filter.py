@@ -1,5 +1,6 @@
 # strategies/high_price_filter.py
 
+import numpy as np
 import pandas as pd
 
 def is_selected(stock_code, combined_data):
@@ -42,4 +43,16 @@ def is_selected(stock_code, combined_data):
         print(f"🎯 {stock_code} 当前股价为 {close_price:.2f} 元，✅ 符合条件")
         return True
 
-    return False
\ No newline at end of file
+    return False
+
+def select_all(panel):
+    """
+    向量化版本：最新收盘价大于 100 元的股票
+    :param panel: 全市场 历史 + 快照 的 日期 × 股票 面板
+    """
+    from utils import selection_engine
+
+    bars = panel.bars()
+    with np.errstate(invalid='ignore'):
+        selected = bars.last('收盘') > 100
+    return selection_engine.result_frame(bars, selected, details=False)
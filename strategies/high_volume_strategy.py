@@ -1,8 +1,14 @@
+import numpy as np
+
+from utils import kernels
+from utils.security_master import limit_up_threshold
+
+
 def is_selected(stock_code, combined_data):
     """
     判断股票是否满足高成交量策略条件：
     1. 最近10个交易日内有一个交易日的成交量是20日成交量均线值的4倍以上
-    2. 最近10个交易日内涨停次数不能大于2（涨跌幅>=9.9%）
+    2. 最近10个交易日内涨停次数不能大于2（按所属板块的涨停阈值判断，主板为涨跌幅>=9.9%）
     3. 最近10个交易日内，有4个交易日连续缩量下跌（成交量比前一天少，且收盘价比前一天低）
     
     :param stock_code: 股票代码
@@ -20,8 +26,11 @@ def is_selected(stock_code, combined_data):
     if '成交量' not in df.columns:
         return False
     
-    # 计算20日成交量均线
-    df['MA20_Volume'] = df['成交量'].rolling(window=20).mean()
+    # 计算20日成交量均线（优先使用指标存储中预计算的 VMA20）
+    if 'VMA20' in df.columns:
+        df['MA20_Volume'] = df['VMA20']
+    else:
+        df['MA20_Volume'] = kernels.rolling_mean(df['成交量'].to_numpy(dtype=float), 20)
     
     # 检查最近10个交易日（从现在往回溯1到10个交易日）
     recent_days = df.tail(10)
@@ -37,8 +46,8 @@ def is_selected(stock_code, combined_data):
         return False
     
     # 新增条件：最近10个交易日内涨停次数不能大于2
-    # 假设涨停为涨跌幅大于等于9.9%
-    limit_up_condition = recent_days['涨跌幅'] >= 9.9
+    # 涨停阈值取自证券主表（主板 9.9%、创业板/科创板 19.8%、北交所 29.7%、主板 ST 4.95%）
+    limit_up_condition = recent_days['涨跌幅'] >= limit_up_threshold([stock_code])[0]
     limit_up_count = limit_up_condition.sum()
     
     if limit_up_count > 2:
@@ -56,17 +65,7 @@ def is_selected(stock_code, combined_data):
     shrink_decline = volume_decrease & price_decrease  # 成交量减少且价格下跌
     
     # 检查是否存在连续4天的缩量下跌
-    consecutive_count = 0
-    max_consecutive = 0
-    
-    for is_shrink_decline in shrink_decline:
-        if is_shrink_decline:
-            consecutive_count += 1
-            max_consecutive = max(max_consecutive, consecutive_count)
-        else:
-            consecutive_count = 0
-    
-    if max_consecutive < 4:
+    if kernels.longest_run(shrink_decline.to_numpy()) < 4:
         return False
     
     # 获取满足条件的日期
@@ -85,4 +84,36 @@ def is_selected(stock_code, combined_data):
     # 获取涨跌幅
     change_percent = df['涨跌幅'].iloc[-1] if '涨跌幅' in df.columns else None
     
-    return True, today_volume, yesterday_volume, trigger_date, change_percent
\ No newline at end of file
+    return True, today_volume, yesterday_volume, trigger_date, change_percent
+
+def select_all(panel):
+    """
+    向量化版本：对全市场一次判断上述 3 个条件，结果与逐只计算一致
+    :param panel: 全市场 历史 + 快照 的 日期 × 股票 面板
+    """
+    from utils import selection_engine
+
+    bars = panel.bars()
+    volume, close = bars['成交量'], bars['收盘']
+    vma20 = bars['VMA20'] if 'VMA20' in bars else kernels.rolling_mean(volume, 20)
+    if len(volume) < 30:
+        return selection_engine.result_frame(bars, np.zeros(len(bars.codes), dtype=bool))
+
+    with np.errstate(invalid='ignore'):
+        # 最近 10 个交易日
+        recent_volume, recent_vma = volume[-10:], vma20[-10:]
+        high_volume = recent_volume >= 4 * recent_vma
+        limit_ups = (bars['涨跌幅'][-10:] >= limit_up_threshold(bars.codes)).sum(axis=0)
+        # 缩量下跌在最近 10 个交易日内逐日比较
+        shrink_decline = (np.diff(recent_volume, axis=0) < 0) & (np.diff(close[-10:], axis=0) < 0)
+
+    selected = ((bars.counts() >= 30)
+                & ~np.isnan(recent_vma).any(axis=0)
+                & high_volume.any(axis=0)
+                & (limit_ups <= 2)
+                & (kernels.longest_run(shrink_decline) >= 4))
+    # 触发日期：最近 10 个交易日中最后一个放量日
+    last_hit = np.maximum(kernels.last_true(high_volume), 0)
+    trigger_date = np.where(selected, bars['日期'][-10:][last_hit, np.arange(len(bars.codes))],
+                            np.datetime64('NaT'))
+    return selection_engine.result_frame(bars, selected, trigger_date)
@@ -1,3 +1,8 @@
+import numpy as np
+
+from utils import kernels
+
+
 def is_selected(stock_code, combined_data):
     """
     自定义均线条件策略
@@ -16,9 +21,10 @@ def is_selected(stock_code, combined_data):
 
     # 提取必要数据
     df = combined_data.copy()
-    df['MA5'] = df['收盘'].rolling(window=5).mean()
-    df['MA30'] = df['收盘'].rolling(window=30).mean()
-    df['MA60'] = df['收盘'].rolling(window=60).mean()
+    # 优先使用指标存储中预计算的均线
+    for window in (5, 30, 60):
+        if f'MA{window}' not in df.columns:
+            df[f'MA{window}'] = kernels.rolling_mean(df['收盘'].to_numpy(dtype=float), window)
 
     # 确保均线数据有效
     if df['MA60'].isna().iloc[-1] or df['MA30'].isna().iloc[-1] or df['MA5'].isna().iloc[-1]:
@@ -29,14 +35,7 @@ def is_selected(stock_code, combined_data):
         return False
 
     # 条件2: 30日均价线上穿60日均价线，且发生在最近5个交易日内
-    # 检查最近5天内是否有上穿信号
-    crossover_detected = False
-    for i in range(1, min(6, len(df))):  # 检查最近5天
-        if df['MA30'].iloc[-i] > df['MA60'].iloc[-i] and df['MA30'].iloc[-i-1] <= df['MA60'].iloc[-i-1]:
-            crossover_detected = True
-            break
-    
-    if not crossover_detected:
+    if not kernels.crossed_within(df['MA30'].to_numpy(dtype=float), df['MA60'].to_numpy(dtype=float), 5):
         return False
 
     # 条件3: 今日收盘价大于MA5
@@ -65,4 +64,25 @@ def is_selected(stock_code, combined_data):
     # 获取涨跌幅
     change_percent = df['涨跌幅'].iloc[-1] if '涨跌幅' in df.columns else None
     
-    return True, today_volume, yesterday_volume, None, change_percent
\ No newline at end of file
+    return True, today_volume, yesterday_volume, None, change_percent
+
+def select_all(panel):
+    """
+    向量化版本：对全市场一次判断上述 4 个条件，结果与逐只计算一致
+    :param panel: 全市场 历史 + 快照 的 日期 × 股票 面板
+    """
+    from utils import selection_engine
+
+    bars = panel.bars()
+    ma = {w: bars[f'MA{w}'] if f'MA{w}' in bars else kernels.rolling_mean(bars['收盘'], w) for w in (5, 30, 60)}
+    if len(bars['收盘']) < 60:
+        return selection_engine.result_frame(bars, np.zeros(len(bars.codes), dtype=bool))
+
+    with np.errstate(invalid='ignore'):
+        selected = ((bars.counts() >= 60)
+                    & ~np.isnan(ma[5][-1]) & ~np.isnan(ma[30][-1]) & ~np.isnan(ma[60][-1])
+                    & (ma[60][-1] > ma[60][-2])
+                    & kernels.crossed_within(ma[30], ma[60], 5)
+                    & (bars['收盘'][-1] > ma[5][-1])
+                    & (bars['成交量'][-1] > bars['成交量'][-2]))
+    return selection_engine.result_frame(bars, selected)
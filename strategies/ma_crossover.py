@@ -1,3 +1,8 @@
+import numpy as np
+
+from utils import kernels
+
+
 def is_selected(stock_code, combined_data):
     """
     均线交叉策略示例（金叉）
@@ -8,12 +13,31 @@ def is_selected(stock_code, combined_data):
     if len(combined_data) < 2:
         return False
 
-    combined_data['MA5'] = combined_data['收盘'].rolling(window=5).mean()
-    combined_data['MA10'] = combined_data['收盘'].rolling(window=10).mean()
+    # 优先使用指标存储中预计算的均线
+    if 'MA5' not in combined_data.columns:
+        combined_data['MA5'] = kernels.rolling_mean(combined_data['收盘'].to_numpy(dtype=float), 5)
+    if 'MA10' not in combined_data.columns:
+        combined_data['MA10'] = kernels.rolling_mean(combined_data['收盘'].to_numpy(dtype=float), 10)
 
     last_two = combined_data.tail(2)
     if (last_two.iloc[-2]['MA5'] < last_two.iloc[-2]['MA10']) and \
        (last_two.iloc[-1]['MA5'] > last_two.iloc[-1]['MA10']):
         return True
 
-    return False
\ No newline at end of file
+    return False
+
+def select_all(panel):
+    """
+    向量化版本：对全市场一次判断最后一根 K 线是否 MA5 上穿 MA10。
+    :param panel: 全市场 历史 + 快照 的 日期 × 股票 面板
+    """
+    from utils import selection_engine
+
+    bars = panel.bars()
+    ma5 = bars['MA5'] if 'MA5' in bars else kernels.rolling_mean(bars['收盘'], 5)
+    ma10 = bars['MA10'] if 'MA10' in bars else kernels.rolling_mean(bars['收盘'], 10)
+    if len(ma5) < 2:
+        return selection_engine.result_frame(bars, np.zeros(len(bars.codes), dtype=bool), details=False)
+    with np.errstate(invalid='ignore'):
+        selected = (ma5[-2] < ma10[-2]) & (ma5[-1] > ma10[-1])
+    return selection_engine.result_frame(bars, selected, details=False)
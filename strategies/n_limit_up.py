@@ -1,4 +1,9 @@
 # strategies/n_limit_up.py
+import numpy as np
+import pandas as pd
+
+from utils import kernels
+from utils.security_master import limit_up_threshold
 
 def is_selected(stock_code, combined_data):
     """
@@ -12,30 +17,41 @@ def is_selected(stock_code, combined_data):
     if len(combined_data) < N_CONSECUTIVE_DAYS:
         return False, None, None
 
-    daily_records = combined_data.to_dict('records')
+    if '涨跌幅' not in combined_data.columns:
+        return False, None, None
+    # 涨停阈值取自证券主表：主板 9.9、主板 ST 4.95、创业板/科创板 19.8、北交所 29.7
+    threshold = limit_up_threshold([stock_code])[0]
+    pct = pd.to_numeric(combined_data['涨跌幅'], errors='coerce').to_numpy(dtype=float)
+    found = kernels.limit_up_streaks(pct, threshold) >= N_CONSECUTIVE_DAYS
 
-    # N == 1 时，只要过去任意一天涨停就算符合
-    if N_CONSECUTIVE_DAYS == 1:
-        threshold = 19.8 if stock_code.startswith(('30', '68')) else 9.9
-        for day in reversed(daily_records):  # 从最新到最旧遍历
-            pct_change = day.get('涨跌幅', -1)
-            date_str = day['日期'].strftime('%Y-%m-%d') if '日期' in day else '未知'
-            if pct_change >= threshold:
-                print(f"[HIT] {stock_code} 在 {date_str} 涨幅 {pct_change:.2f}% ≥ {threshold:.1f}%，[OK] 符合条件")
-                return True, day['日期'], pct_change
+    # N == 1 时取最近一次涨停；N > 1 时取最早一段连续 N 日涨停的最后一天
+    pos = kernels.last_true(found) if N_CONSECUTIVE_DAYS == 1 else kernels.first_true(found)
+    if pos < 0:
         return False, None, None
+    day = combined_data.iloc[pos]
+    date_str = day['日期'].strftime('%Y-%m-%d') if '日期' in day else '未知'
+    if N_CONSECUTIVE_DAYS == 1:
+        print(f"[HIT] {stock_code} 在 {date_str} 涨幅 {day['涨跌幅']:.2f}% ≥ {threshold:.1f}%，[OK] 符合条件")
+    else:
+        print(f"🎯 {stock_code} 在 {date_str} 及之前连续 {N_CONSECUTIVE_DAYS} 日涨停，✅ 符合条件")
+    return True, day['日期'], float(day['涨跌幅'])
 
-    # N > 1 的情况保持不变
-    for i in range(len(daily_records) - (N_CONSECUTIVE_DAYS - 1)):
-        window = daily_records[i:i + N_CONSECUTIVE_DAYS]
-        is_consecutive_zt = all(
-            day.get('涨跌幅', -1) >= (19.8 if stock_code.startswith(('30','68')) else 9.9)
-            for day in window
-        )
-        if is_consecutive_zt:
-            last_day = window[-1]
-            last_date = last_day['日期'].strftime('%Y-%m-%d')
-            print(f"🎯 {stock_code} 在 {last_date} 及之前连续 {N_CONSECUTIVE_DAYS} 日涨停，✅ 符合条件")
-            return True, last_day['日期'], last_day.get('涨跌幅', None)
+def select_all(panel):
+    """
+    向量化版本：对全市场一次判断 N 连板（连续涨停数由内核一次算出）。
+    N == 1 时触发日期为最近一次涨停日；N > 1 时为最早一段连续 N 日涨停的最后一天（与逐只计算一致）。
+    :param panel: 全市场 历史 + 快照 的 日期 × 股票 面板
+    :return: selection_engine.result_frame 的结果
+    """
+    from config import N_CONSECUTIVE_DAYS
+    from utils import selection_engine
 
-    return False, None, None
\ No newline at end of file
+    bars = panel.bars()
+    found = kernels.limit_up_streaks(bars['涨跌幅'], limit_up_threshold(bars.codes)) >= N_CONSECUTIVE_DAYS
+    pick = kernels.last_true(found) if N_CONSECUTIVE_DAYS == 1 else kernels.first_true(found)
+    selected = pick >= 0
+    cols = np.arange(len(bars.codes))
+    pick = np.maximum(pick, 0)
+    trigger_date = np.where(selected, bars['日期'][pick, cols], np.datetime64('NaT'))
+    change = np.where(selected, bars['涨跌幅'][pick, cols], np.nan)
+    return selection_engine.result_frame(bars, selected, trigger_date, change, details=False)
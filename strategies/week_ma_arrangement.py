@@ -1,3 +1,11 @@
+import numpy as np
+import pandas as pd
+
+from utils import kernels
+
+MA_WINDOWS = (5, 10, 20, 30)
+
+
 def is_selected(stock_code, combined_data):
     """
     周K线多头排列策略
@@ -34,10 +42,9 @@ def is_selected(stock_code, combined_data):
     weekly_df = weekly_df.sort_values('日期').reset_index(drop=True)
     
     # 计算周线移动平均线
-    weekly_df['MA5'] = weekly_df['收盘'].rolling(window=5).mean()
-    weekly_df['MA10'] = weekly_df['收盘'].rolling(window=10).mean()
-    weekly_df['MA20'] = weekly_df['收盘'].rolling(window=20).mean()
-    weekly_df['MA30'] = weekly_df['收盘'].rolling(window=30).mean()
+    weekly_close = weekly_df['收盘'].to_numpy(dtype=float)
+    for n in MA_WINDOWS:
+        weekly_df[f'MA{n}'] = kernels.rolling_mean(weekly_close, n)
     
     # 确保至少有两周的数据
     if len(weekly_df) < 2:
@@ -71,4 +78,73 @@ def is_selected(stock_code, combined_data):
     change_percent = df['涨跌幅'].iloc[-1] if '涨跌幅' in df.columns else None
     
     # 返回结果
-    return True, today_volume, yesterday_volume, current_week['日期'], change_percent
\ No newline at end of file
+    return True, today_volume, yesterday_volume, current_week['日期'], change_percent
+
+def _is_bullish(df):
+    return (df['MA5'] >= df['MA10']) & (df['MA10'] >= df['MA20']) & (df['MA20'] >= df['MA30'])
+
+
+def select_universe(weekly_bars, snapshot_df, daily_bars=None, min_bars=300):
+    """
+    向量化版本：基于预先维护的周线表，一次性对全市场判断周K线多头排列。
+    上周的均线直接取自周线表；本周的均线由此前 29 周收盘价加上快照收盘价计算，
+    每只股票只比较一行。
+
+    :param weekly_bars: 周线表（代码、日期、收盘、MA5、MA10、MA20、MA30），日期为周一
+    :param snapshot_df: 今日行情快照（代码、日期、收盘）
+    :param daily_bars: 各股票今日之前的日线根数（代码 -> 根数）；None 时由 weekly_bars 的 交易日数 汇总，
+                       此时 weekly_bars 须包含全部历史周期
+    :param min_bars: 含今日在内的最少日线根数，与逐只计算时"至少300天数据"的要求一致
+    :return: DataFrame（代码、触发日期），只包含选中的股票
+    """
+    from utils import bar_tables
+
+    snap = snapshot_df[['代码', '日期', '收盘']].dropna(subset=['收盘']).copy()
+    snap['代码'] = snap['代码'].astype(str)
+    today = pd.Timestamp(snap['日期'].max())
+    week_start = today.to_period('W').start_time
+
+    bars = weekly_bars.copy()
+    bars['代码'] = bars['代码'].astype(str)
+    prior = bars[bars['日期'] < week_start].sort_values(['代码', '日期'])
+    last_week = prior.groupby('代码', sort=False).tail(1).set_index('代码')
+
+    current = snap.set_index('代码')[['收盘']]
+    for n in MA_WINDOWS:
+        window = prior.groupby('代码', sort=False).tail(n - 1).groupby('代码')['收盘'].agg(['sum', 'count'])
+        window = window.reindex(current.index)
+        ma = (window['sum'] + current['收盘']) / n
+        current[f'MA{n}'] = ma.where(window['count'] == n - 1)
+
+    if daily_bars is None:
+        daily_bars = bar_tables.count_daily_bars(bars, today)
+    enough_bars = daily_bars.reindex(current.index, fill_value=0) + 1 >= min_bars
+    prev_bullish = _is_bullish(last_week.reindex(current.index)).fillna(False)
+    selected = _is_bullish(current) & ~prev_bullish & enough_bars
+    return pd.DataFrame({'代码': current.index[selected.to_numpy()], '触发日期': week_start})
+
+
+def select_all(panel, min_bars=300):
+    """
+    向量化版本：由日线面板按周聚合后对全市场一次判断（没有周线表时使用），结果与逐只计算一致
+    :param panel: 全市场 历史 + 快照 的 日期 × 股票 面板
+    """
+    from utils import selection_engine
+    from utils.panel import Panel
+
+    # 每周取各股票最后一个有数据的交易日的收盘价；某只股票整周停牌时该周不计入其周线
+    week_start = panel.dates.to_period('W').start_time
+    weekly_close = pd.DataFrame(np.where(panel.mask, panel['收盘'], np.nan)).groupby(week_start).last()
+    weekly = Panel(weekly_close.index, panel.codes, {'收盘': weekly_close.to_numpy()},
+                   pd.DataFrame(panel.mask).groupby(week_start).any().to_numpy()).bars()
+    ma = {n: kernels.rolling_mean(weekly['收盘'], n) for n in MA_WINDOWS}
+
+    def bullish(i):
+        if len(weekly['收盘']) < i:
+            return np.zeros(len(weekly.codes), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            return (ma[5][-i] >= ma[10][-i]) & (ma[10][-i] >= ma[20][-i]) & (ma[20][-i] >= ma[30][-i])
+
+    bars = panel.bars()
+    selected = (bars.counts() >= min_bars) & bullish(1) & ~bullish(2)
+    return selection_engine.result_frame(bars, selected, weekly.last('日期'))
@@ -1,7 +1,10 @@
-import akshare as ak
 import pandas as pd
+import pytest
 from datetime import datetime
 
+pytestmark = pytest.mark.network
+ak = pytest.importorskip('akshare')
+
 # 测试Akshare接口基本功能
 def test_akshare_api():
     print("--- 开始Akshare接口测试 --- ")
@@ -0,0 +1,92 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from utils import array_store, partition_store
+
+
+def _assert_same(store_a, store_b, codes):
+    for code in codes:
+        a = array_store.load_stock_frame(code, store_a)
+        b = array_store.load_stock_frame(code, store_b)
+        pd.testing.assert_frame_equal(a, b)
+
+
+def test_build_and_load_single_stock(tmp_path, make_day):
+    arrays = str(tmp_path / 'arrays')
+    # 输入不按 (代码, 日期) 排序，且各股票行数不同
+    df = pd.concat([
+        make_day('2025-08-05', ['600000.SH', '000001.SZ'], close=11.0),
+        make_day('2025-08-04', ['000001.SZ', '300001.SZ', '600000.SH']),
+        make_day('2025-08-06', ['000001.SZ'], close=12.0),
+    ])
+    assert array_store.build_array_store(df, arrays) == 3
+
+    with open(tmp_path / 'arrays' / array_store.INDEX_NAME, encoding='utf-8') as f:
+        index = json.load(f)
+    assert index['rows'] == 6
+    assert index['codes'] == {'000001.SZ': [0, 3], '300001.SZ': [3, 1], '600000.SH': [4, 2]}
+
+    frame = array_store.load_stock_frame('000001.sz', arrays)
+    assert frame['代码'].unique().tolist() == ['000001.SZ']
+    assert frame['日期'].tolist() == list(pd.to_datetime(['2025-08-04', '2025-08-05', '2025-08-06']))
+    assert frame['收盘'].tolist() == [10.0, 11.0, 12.0]
+    assert array_store.load_stock_frame('600000.SH', arrays)['收盘'].tolist() == [10.0, 11.0]
+
+    # 单只股票的数组是内存映射上的切片，不复制数据
+    close = array_store.load_stock_arrays('300001.SZ', arrays)['close']
+    assert isinstance(close, np.memmap) and len(close) == 1
+
+    assert array_store.load_stock_arrays('688001.SH', arrays) is None
+    assert array_store.load_stock_frame('688001.SH', arrays).empty
+
+
+def test_rebuild_is_picked_up_by_open_readers(tmp_path, make_day):
+    arrays = str(tmp_path / 'arrays')
+    array_store.build_array_store(make_day('2025-08-04', ['000001.SZ']), arrays)
+    assert array_store.load_stock_frame('000001.SZ', arrays)['收盘'].tolist() == [10.0]
+
+    array_store.build_array_store(pd.concat([
+        make_day('2025-08-04', ['000001.SZ']),
+        make_day('2025-08-05', ['000001.SZ'], close=11.0),
+    ]), arrays)
+    assert array_store.load_stock_frame('000001.SZ', arrays)['收盘'].tolist() == [10.0, 11.0]
+    # 旧版本目录已清理
+    assert len([d for d in os.listdir(arrays) if d.startswith('v')]) == 1
+
+
+def test_update_merges_like_full_rebuild(tmp_path, make_day):
+    master = str(tmp_path / 'master')
+    arrays = str(tmp_path / 'arrays')
+    partition_store.append_partitions(pd.concat([
+        make_day('2025-08-04', ['600000.SH', '000001.SZ']),
+        make_day('2025-08-06', ['000001.SZ', '600000.SH']),
+    ]), master)
+    array_store.build_array_store(partition_store.read_partitions(master), arrays)
+
+    # 追加新交易日（含新股票）、补入历史中间缺失的交易日、整日替换已有交易日
+    written = partition_store.append_partitions(pd.concat([
+        make_day('2025-08-07', ['000001.SZ', '300001.SZ', '600000.SH'], close=12.0),
+        make_day('2025-08-05', ['600000.SH'], close=11.0),
+        make_day('2025-08-06', ['000001.SZ'], close=13.0),
+    ]), master)
+    array_store.update_array_store(written, arrays, master_dir=master)
+
+    rebuilt = str(tmp_path / 'rebuilt')
+    array_store.build_array_store(partition_store.read_partitions(master), rebuilt)
+    codes = ['000001.SZ', '300001.SZ', '600000.SH']
+    _assert_same(arrays, rebuilt, codes)
+    assert array_store.load_stock_frame('600000.SH', arrays)['收盘'].tolist() == [10.0, 11.0, 12.0]
+    assert np.asarray(array_store.load_stock_arrays('000001.SZ', arrays)['close']).tolist() == [10.0, 13.0, 12.0]
+
+
+def test_merge_partitions_keeps_partition_sorted(tmp_path, make_day):
+    master = str(tmp_path / 'master')
+    partition_store.append_partitions(make_day('2025-08-04', ['000001.SZ', '600000.SH']), master)
+    partition_store.merge_partitions(pd.concat([
+        make_day('2025-08-04', ['300001.SZ', '000001.SZ'], close=9.0),
+        make_day('2025-08-04', ['000002.SZ']),
+    ]), master)
+    day = pd.read_feather(str(tmp_path / 'master' / '20250804.feather'))
+    assert day['代码'].tolist() == ['000001.SZ', '000002.SZ', '300001.SZ', '600000.SH']
+    assert day['收盘'].tolist() == [9.0, 10.0, 9.0, 10.0]
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from utils import partition_store, bar_tables
+from strategies import week_ma_arrangement
+
+
+def test_incremental_update_matches_rebuild(tmp_path, monkeypatch, make_master):
+    import config
+    monkeypatch.setattr(config, 'MASTER_STORE_DIR', str(tmp_path / 'master'))
+    monkeypatch.setattr(config, 'BAR_TABLE_DIR', str(tmp_path / 'bars'))
+
+    days = pd.bdate_range('2025-01-01', periods=200)
+    df = make_master(days, ['000001.SZ', '300750.SZ'])
+
+    partition_store.append_partitions(df[df['日期'] <= days[150]])
+    bar_tables.update_bar_tables()
+    for day in days[151:]:
+        written = partition_store.append_partitions(df[df['日期'] == day])
+        bar_tables.update_bar_tables(written)
+    incremental = bar_tables.load_bars('weekly')
+
+    expected = bar_tables.add_moving_averages(bar_tables.aggregate_bars(df, 'weekly'))
+    assert len(incremental) == len(expected)
+    for col in ['开盘', '收盘', '最高', '最低', '成交量', 'MA5', 'MA30']:
+        np.testing.assert_allclose(incremental[col].to_numpy(), expected[col].to_numpy(), equal_nan=True)
+    monthly = bar_tables.load_bars('monthly')
+    assert monthly['日期'].nunique() == 10
+
+
+def test_incremental_ma_skips_suspended_weeks(tmp_path, monkeypatch, make_master):
+    import config
+    monkeypatch.setattr(config, 'MASTER_STORE_DIR', str(tmp_path / 'master'))
+    monkeypatch.setattr(config, 'BAR_TABLE_DIR', str(tmp_path / 'bars'))
+
+    days = pd.bdate_range('2025-01-06', periods=200)
+    df = make_master(days, ['000001.SZ', '600000.SH', '688001.SH'])
+    # 600000.SH 整周停牌（周线表在该周没有它的K线），688001.SH 中途上市
+    suspended = df['日期'].between(days[150], days[154]) & (df['代码'] == '600000.SH')
+    not_listed = (df['日期'] < days[30]) & (df['代码'] == '688001.SH')
+    df = df[~suspended & ~not_listed]
+
+    partition_store.append_partitions(df[df['日期'] < days[195]])
+    bar_tables.update_bar_tables()
+    written = partition_store.append_partitions(df[df['日期'] >= days[195]])
+    bar_tables.update_bar_tables(written)
+    incremental = bar_tables.load_bars('weekly')
+
+    bar_tables.rebuild_bar_table('weekly')
+    rebuilt = bar_tables.load_bars('weekly')
+    last = incremental['日期'] == incremental['日期'].max()
+    assert incremental.loc[last, 'MA30'].notna().all()
+    for col in ['MA5', 'MA10', 'MA20', 'MA30']:
+        np.testing.assert_allclose(incremental[col].to_numpy(), rebuilt[col].to_numpy(), equal_nan=True)
+
+
+def test_select_universe_matches_per_stock():
+    days = pd.bdate_range('2024-01-01', periods=460)
+    trend = np.concatenate([np.linspace(20, 10, 340), np.linspace(10, 30, 120)])
+    df = pd.DataFrame({'代码': '000001.SZ', '日期': days, '收盘': trend,
+                       '成交量': 1e6, '涨跌幅': 0.0})
+
+    selected_days = 0
+    for end in range(300, 460):
+        hist = df.iloc[:end + 1]
+        per_stock = bool(week_ma_arrangement.is_selected('000001.SZ', hist))
+        weekly = bar_tables.add_moving_averages(bar_tables.aggregate_bars(hist.iloc[:-1], 'weekly'))
+        hits = week_ma_arrangement.select_universe(weekly, hist.tail(1))
+        assert per_stock == (not hits.empty), hist['日期'].iloc[-1]
+        selected_days += per_stock
+    assert selected_days > 0
+
+
+def test_select_universe_counts_daily_bars_across_holidays():
+    # 每 4 周有一次周三至周五休市，60 周不足 300 根日线
+    days = pd.bdate_range('2024-01-01', periods=520)
+    week_no = (days - days[0]).days // 7
+    days = days[~((week_no % 4 == 3) & (days.dayofweek >= 2))]
+
+    selected = {}
+    for turn in (240, 250):
+        trend = np.concatenate([np.linspace(20, 10, turn), np.linspace(10, 30, len(days) - turn)])
+        df = pd.DataFrame({'代码': '000001.SZ', '日期': days, '收盘': trend, '成交量': 1e6, '涨跌幅': 0.0})
+        selected[turn] = []
+        for end in range(280, 320):
+            hist = df.iloc[:end + 1]
+            per_stock = bool(week_ma_arrangement.is_selected('000001.SZ', hist))
+            weekly = bar_tables.add_moving_averages(bar_tables.aggregate_bars(hist.iloc[:-1], 'weekly'))
+            hits = week_ma_arrangement.select_universe(weekly, hist.tail(1))
+            assert per_stock == (not hits.empty), hist['日期'].iloc[-1]
+            if per_stock:
+                selected[turn].append(end + 1)
+    # 第 295 根左右满足条件（此时已超过 60 周）但日线不足 300 根；之后的交叉才被选中
+    assert selected[240] == [] and min(selected[250]) >= 300
+
+
+def test_count_daily_bars_excludes_today(make_master):
+    days = pd.bdate_range('2025-01-06', periods=12)
+    df = make_master(days, ['000001.SZ', '300750.SZ'])
+    df = df[~((df['代码'] == '300750.SZ') & df['日期'].isin(days[[2, 3, 9]]))]
+    weekly = bar_tables.aggregate_bars(df, 'weekly')
+    counts = bar_tables.count_daily_bars(weekly, days[-1])
+    assert counts.to_dict() == {'000001.SZ': 11, '300750.SZ': 8}
+    assert bar_tables.count_daily_bars(weekly, days[-1] + pd.offsets.BDay()).to_dict() == {'000001.SZ': 12,
+                                                                                             '300750.SZ': 9}
@@ -0,0 +1,57 @@
+import threading
+
+import pandas as pd
+from utils import bootstrap, partition_store
+
+CALENDAR = pd.bdate_range('2025-07-01', '2025-07-31')
+
+
+class FakePro:
+    """模拟 Tushare pro：指定日期一直失败，stop_after 次调用后触发中断"""
+
+    def __init__(self, failing=(), stop_after=None, shutdown_event=None):
+        self.failing = set(failing)
+        self.stop_after = stop_after
+        self.shutdown_event = shutdown_event
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def daily(self, trade_date):
+        with self._lock:
+            self.calls.append(trade_date)
+            if self.stop_after is not None and len(self.calls) >= self.stop_after:
+                self.shutdown_event.set()
+        if trade_date in self.failing:
+            raise ConnectionError('reset by peer')
+        n = 3 if trade_date == '20250715' else 5
+        return pd.DataFrame({'ts_code': [f'{600000 + i}.SH' for i in range(n)], 'trade_date': trade_date,
+                             'open': 10.0, 'high': 10.5, 'low': 9.5, 'close': 10.2, 'pre_close': 10.0,
+                             'change': 0.2, 'pct_chg': 2.0, 'vol': 100.0, 'amount': 102.0})
+
+
+def _run(pro, store, shutdown_event=None):
+    return bootstrap.bootstrap_history(pro, '2025-07-01', '2025-07-31', store_dir=store,
+                                       shutdown_event=shutdown_event, calendar=CALENDAR, commit_every=3,
+                                       max_workers=2, calls_per_minute=60000, min_interval=0.01,
+                                       max_interval=0.02, max_retries=0)
+
+
+def test_bootstrap_resumes_and_verifies(tmp_path):
+    store = str(tmp_path / 'store')
+    shutdown_event = threading.Event()
+    _run(FakePro(stop_after=8, shutdown_event=shutdown_event), store, shutdown_event)
+    written = partition_store.list_partition_dates(store)
+    assert 0 < len(written) < len(CALENDAR)
+
+    # 重新运行只下载缺少的交易日；一直失败的交易日在核对结果中标为缺失
+    pro = FakePro(failing={'20250730'})
+    report = _run(pro, store)
+    assert not set(pro.calls) & {d.strftime('%Y%m%d') for d in written}
+    assert pro.calls.count('20250730') == 3
+    status = dict(zip(report['日期'].dt.strftime('%Y%m%d'), report['状态']))
+    assert status['20250730'] == '缺失'
+    assert status['20250715'] == '行数偏少'
+    assert sum(s == '正常' for s in status.values()) == len(CALENDAR) - 2
+
+    day = partition_store.read_partitions(store, dates=[pd.Timestamp('2025-07-02')])
+    assert day['成交量'].iloc[0] == 10000 and day['涨跌幅'].iloc[0] == 2.0
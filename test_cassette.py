@@ -0,0 +1,54 @@
+import threading
+
+import pandas as pd
+import pytest
+from utils import cassette, data_sources, downloader
+
+
+class CountingPro:
+    def __init__(self):
+        self.calls = 0
+
+    def daily(self, trade_date=None, **kwargs):
+        self.calls += 1
+        return pd.DataFrame({'ts_code': ['000001.SZ', '600000.SH'], 'trade_date': [trade_date] * 2,
+                             'close': [10.5, 8.25]})
+
+
+def _source(pro):
+    return data_sources.TushareSource(pro, max_concurrency=2, timeout=1, max_retries=1,
+                                      min_interval=0.01, max_interval=0.02)
+
+
+def test_record_then_replay_offline(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_CASSETTE_DIR', str(tmp_path))
+    pro = CountingPro()
+
+    monkeypatch.setenv('DATA_CASSETTE_MODE', 'record')
+    recorded = data_sources.run(_source(pro).daily_by_date('2025-01-02'))
+    assert pro.calls == 1
+    assert list(tmp_path.glob('tushare/daily_by_date_*.feather'))
+
+    monkeypatch.setenv('DATA_CASSETTE_MODE', 'replay')
+    replayed = data_sources.run(_source(cassette.OfflineClient('tushare')).daily_by_date('2025-01-02'))
+    pd.testing.assert_frame_equal(replayed, recorded)
+
+    # 下载器与数据源共用录制键
+    bucket = downloader.TokenBucket(6000)
+    results, failed = downloader.download_daily(cassette.OfflineClient('tushare'), ['20250102', '20250103'],
+                                                shutdown_event=threading.Event(), bucket=bucket)
+    assert [d for d, _ in results] == ['20250102'] and failed == ['20250103']
+    assert pro.calls == 1
+
+    with pytest.raises(cassette.CassetteMiss):
+        data_sources.run(_source(pro).daily_by_date('2025-01-03'))
+    assert pro.calls == 1
+
+
+def test_once_records_misses_only(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_CASSETTE_DIR', str(tmp_path))
+    monkeypatch.setenv('DATA_CASSETTE_MODE', 'once')
+    pro = CountingPro()
+    for _ in range(2):
+        cassette.cached_call('tushare', 'daily_by_date', pro.daily, trade_date='20250102')
+    assert pro.calls == 1
@@ -0,0 +1,70 @@
+import pandas as pd
+from utils import coverage_index, data_sources, downloader, partition_store
+
+DAYS = pd.to_datetime(['2025-08-04', '2025-08-05', '2025-08-06', '2025-08-07', '2025-08-08'])
+
+
+def _store(tmp_path, make_day):
+    store = str(tmp_path / 'store')
+    frames = []
+    for day in DAYS:
+        codes = ['000001.SZ']
+        if day not in DAYS[[1, 2]]:
+            codes.append('600000.SH')       # 中间停牌两天
+        if day >= DAYS[3]:
+            codes.append('688001.SH')       # 新上市
+        if day != DAYS[-1]:
+            codes.append('300001.SZ')       # 最后一天的响应中遗漏
+        frames.append(make_day(day, codes))
+    partition_store.append_partitions(pd.concat(frames), store)
+    return store
+
+
+class FakeSource:
+    def __init__(self, suspended=()):
+        self.suspended = set(suspended)
+        self.calls = []
+
+    async def bars_by_code(self, code, start, end, retries=None):
+        self.calls.append((code, start, end))
+        days = [d for d in DAYS if start <= d <= end and (code, d) not in self.suspended]
+        return pd.DataFrame({'ts_code': code, 'trade_date': [d.strftime('%Y%m%d') for d in days],
+                             'open': 9.0, 'high': 9.0, 'low': 9.0, 'close': 9.0,
+                             'pct_chg': 0.0, 'vol': 10.0, 'amount': 9.0})
+
+
+def test_compute_coverage_finds_inner_and_trailing_gaps(tmp_path, make_day):
+    store = _store(tmp_path, make_day)
+    frame = partition_store.scan_partitions(store, columns=['代码', '日期'])
+    summary, gaps = coverage_index.compute_coverage(frame, DAYS)
+
+    summary = summary.set_index('代码')
+    assert summary.loc['688001.SH', '首日'] == DAYS[3]
+    assert summary.loc['600000.SH', '行数'] == 3
+    assert summary.loc['000001.SZ', '缺失天数'] == 0
+    assert gaps[['代码', '开始', '结束', '缺失天数']].values.tolist() == [
+        ['300001.SZ', DAYS[4], DAYS[4], 1],
+        ['600000.SH', DAYS[1], DAYS[2], 2],
+    ]
+
+
+def test_backfill_fills_holes_and_confirms_suspensions(tmp_path, make_day):
+    store = _store(tmp_path, make_day)
+    coverage_dir = str(tmp_path / 'coverage')
+    frame = partition_store.scan_partitions(store, columns=['代码', '日期'])
+    _, gaps = coverage_index.compute_coverage(frame, DAYS)
+
+    source = FakeSource(suspended={('600000.SH', DAYS[2])})
+    written = coverage_index.backfill_gaps(gaps, source=source, store_dir=store, coverage_dir=coverage_dir,
+                                           bucket=downloader.TokenBucket(6000))
+    assert sorted(written) == [DAYS[1], DAYS[4]]
+    assert len(source.calls) == 2
+
+    day = partition_store.read_partitions(store, dates=[DAYS[4]])
+    assert '300001.SZ' in set(day['代码'])
+    # 同一分区中其他股票的数据不受影响
+    assert day.loc[day['代码'] == '000001.SZ', '收盘'].iloc[0] == 10.0
+
+    summary, gaps = coverage_index.load_coverage(coverage_dir)
+    assert gaps.empty
+    assert summary.set_index('代码').loc['600000.SH', '行数'] == 4
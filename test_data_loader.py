@@ -1,6 +1,9 @@
 import pandas as pd
+import pytest
 from utils.data_loader import load_clean_hist_data, get_clean_snapshot_data
 
+pytestmark = pytest.mark.network
+
 def test_historical_data_loading():
     try:
         df = load_clean_hist_data()
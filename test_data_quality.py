@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from utils import data_quality, partition_store
+
+DAYS = pd.bdate_range('2025-07-14', periods=10)
+
+
+def _make_day(date, n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    close = rng.uniform(5, 50, n)
+    volume = rng.uniform(1e5, 1e7, n).round()
+    return pd.DataFrame({
+        '代码': [f'{600000 + i:06d}.SH' for i in range(n)],
+        '日期': pd.Timestamp(date),
+        '开盘': close * 0.99, '收盘': close, '最高': close * 1.02, '最低': close * 0.98,
+        '成交量': volume, '成交额': volume * close * 1.001, '涨跌幅': 0.0,
+    })
+
+
+def _store(tmp_path):
+    store = str(tmp_path / 'store')
+    days = []
+    for i, day in enumerate(DAYS):
+        df = _make_day(day, seed=i)
+        if i == 6:
+            df['成交量'] = (df['成交量'] / 100).round()     # 成交量误存为手
+        if i == 8:
+            df = df.head(30)                                # 缺失股票
+        if i == 9:
+            df.loc[:3, '最高'] = df.loc[:3, '收盘'] * 0.9  # 最高价低于收盘价
+        days.append(df)
+    partition_store.append_partitions(pd.concat(days), store)
+    return store
+
+
+def test_scan_flags_unit_missing_and_ohlc(tmp_path):
+    store = _store(tmp_path)
+    flagged = data_quality.update_stats(store_dir=store, stats_file=str(tmp_path / 'q.feather'))
+    problems = dict(zip(flagged['日期'], flagged['问题']))
+    assert problems[DAYS[6]] == '单位错误'
+    assert problems[DAYS[8]] == '缺失股票'
+    assert problems[DAYS[9]] == 'OHLC异常'
+    assert all(problems[d] == '' for d in DAYS[[0, 1, 2, 3, 4, 5, 7]])
+    row = flagged.set_index('日期').loc[DAYS[6]]
+    assert row['出错列'] == '成交量' and row['单位因子'] == 100
+
+
+def test_auto_repair_rewrites_only_bad_partition(tmp_path):
+    store = _store(tmp_path)
+    stats_file = str(tmp_path / 'q.feather')
+    data_quality.update_stats(DAYS[:6], store_dir=store, stats_file=stats_file)
+
+    repaired = data_quality.check_after_update(DAYS[6:8], auto_repair=True, store_dir=store,
+                                               stats_file=stats_file)
+    assert repaired == [DAYS[6]]
+    fixed = partition_store.read_partitions(store, dates=[DAYS[6]])
+    expected = (_make_day(DAYS[6], seed=6)['成交量'] / 100).round() * 100
+    assert np.allclose(fixed.sort_values('代码')['成交量'].to_numpy(), expected.to_numpy())
+    flagged = data_quality.flag_anomalies(data_quality.load_stats(stats_file))
+    assert flagged.set_index('日期').loc[DAYS[6], '问题'] == ''
+    # 其他交易日的分区不受影响
+    untouched = partition_store.read_partitions(store, dates=[DAYS[7]])
+    assert np.allclose(untouched.sort_values('代码')['成交量'].to_numpy(), _make_day(DAYS[7], seed=7)['成交量'])
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+
+import pandas as pd
+from utils import data_sources
+
+
+class FakePro:
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def daily(self, trade_date=None, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            with self._lock:
+                if self.failures > 0:
+                    self.failures -= 1
+                    raise ConnectionError('reset by peer')
+            return pd.DataFrame({'ts_code': ['000001.SZ'], 'trade_date': [trade_date]})
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def _source(pro, **kwargs):
+    params = dict(max_concurrency=2, timeout=1, max_retries=2, min_interval=0.01, max_interval=0.02)
+    params.update(kwargs)
+    return data_sources.TushareSource(pro, **params)
+
+
+def test_retries_then_succeeds():
+    source = _source(FakePro(failures=2))
+    df = data_sources.run(source.daily_by_date('2025-01-02'))
+    assert df['trade_date'].iloc[0] == '20250102'
+
+
+def test_concurrency_limit_and_overlap():
+    pro = FakePro(delay=0.1)
+    source = _source(pro)
+
+    async def fetch_all():
+        return await asyncio.gather(*[source.daily_by_date(f'2025-01-{d:02d}') for d in range(2, 8)])
+
+    started = time.monotonic()
+    results = data_sources.run(fetch_all())
+    elapsed = time.monotonic() - started
+    assert len(results) == 6
+    assert pro.max_active == 2
+    assert elapsed < 0.5
+
+
+def test_timeout_counts_as_failure():
+    source = _source(FakePro(delay=0.3), timeout=0.05, max_retries=0)
+    try:
+        data_sources.run(source.daily_by_date('2025-01-02'))
+    except asyncio.TimeoutError:
+        pass
+    else:
+        raise AssertionError('expected timeout')
+
+
+def test_gather_mixes_callables_and_coroutines():
+    source = _source(FakePro(delay=0.05))
+    value, df = data_sources.gather(lambda: 42, source.daily_by_date('2025-01-02'))
+    assert value == 42 and len(df) == 1
@@ -0,0 +1,105 @@
+import threading
+
+import pandas as pd
+from utils.downloader import RateLimitedDownloader, TokenBucket
+
+
+class FakePro:
+    """模拟 Tushare pro：指定日期前几次调用失败"""
+
+    def __init__(self, failures=None, error='抱歉，您每分钟最多访问该接口200次'):
+        self.failures = dict(failures or {})
+        self.error = error
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def daily(self, trade_date):
+        with self._lock:
+            self.calls.append(trade_date)
+            if self.failures.get(trade_date, 0) > 0:
+                self.failures[trade_date] -= 1
+                raise Exception(self.error)
+        return pd.DataFrame({'ts_code': ['000001.SZ'], 'trade_date': [trade_date], 'close': [10.0]})
+
+
+def _downloader(pro, **kwargs):
+    params = dict(max_workers=4, calls_per_minute=60000, min_interval=0.01, max_interval=0.05, max_retries=2)
+    params.update(kwargs)
+    return RateLimitedDownloader(pro, **params)
+
+
+def test_fetch_daily_retries_and_orders_results():
+    dates = [f'202501{d:02d}' for d in range(2, 12)]
+    pro = FakePro(failures={'20250103': 2, '20250106': 5})
+    results, failed = _downloader(pro).fetch_daily(dates)
+    assert [d for d, _ in results] == [d for d in dates if d != '20250106']
+    assert failed == ['20250106']
+    assert pro.calls.count('20250103') == 3
+    assert pro.calls.count('20250106') == 3
+
+
+def test_shutdown_event_cancels_pending_downloads():
+    shutdown = threading.Event()
+    shutdown.set()
+    pro = FakePro()
+    results, failed = _downloader(pro, shutdown_event=shutdown).fetch_daily(['20250102', '20250103'])
+    assert results == [] and failed == ['20250102', '20250103']
+    assert pro.calls == []
+
+
+def test_token_bucket_limits_rate():
+    now = [0.0]
+    bucket = TokenBucket(rate_per_minute=60, capacity=2, clock=lambda: now[0])
+    assert bucket.acquire() and bucket.acquire()
+    assert bucket.tokens < 1
+    now[0] += 1.0
+    assert bucket.acquire()
+    bucket.pause(5)
+    assert bucket.tokens == 0 and bucket.paused_until == 6.0
+
+
+def test_interrupted_run_resumes_from_staging(tmp_path):
+    from utils import update_journal
+    staging = str(tmp_path / 'staging')
+    dates = ['20250102', '20250103', '20250106']
+
+    # 第一次运行：20250106 持续失败，已下载的日期被暂存，不返回数据
+    pro = FakePro(failures={'20250106': 99}, error='timeout')
+    journal = update_journal.UpdateJournal(staging)
+    downloader = _downloader(pro)
+    pending = journal.begin(dates)
+    results, failed = downloader.fetch_daily(pending, on_result=journal.stage)
+    assert failed == ['20250106']
+    assert update_journal.UpdateJournal(staging).staged_dates() == ['20250102', '20250103']
+
+    # 重新运行：只下载尚未暂存的日期，合并时包含全部交易日
+    pro = FakePro()
+    journal = update_journal.UpdateJournal(staging)
+    assert journal.begin(dates) == ['20250106']
+    _downloader(pro).fetch_daily(journal.pending(), on_result=journal.stage)
+    assert pro.calls == ['20250106']
+    assert [df['trade_date'].iloc[0] for df in journal.load_staged()] == dates
+    journal.complete()
+    assert update_journal.UpdateJournal(staging).staged_dates() == []
+
+
+def test_force_refresh_redownloads_staged_date(tmp_path):
+    from utils import update_journal
+    staging = str(tmp_path / 'staging')
+    journal = update_journal.UpdateJournal(staging)
+    journal.begin(['20250102', '20250103'])
+    journal.stage('20250102', pd.DataFrame({'ts_code': ['000001.SZ'], 'trade_date': ['20250102'], 'close': [9.0]}))
+    journal.stage('20250103', pd.DataFrame({'ts_code': ['000001.SZ'], 'trade_date': ['20250103'], 'close': [9.0]}))
+
+    # 强制更新 20250102：即使已暂存也重新下载；20250103 仍复用暂存
+    pro = FakePro()
+    staged = update_journal.fetch_with_journal(pro, ['20250102', '20250103'], shutdown_event=threading.Event(),
+                                               journal=update_journal.UpdateJournal(staging), refresh=['20250102'])
+    assert pro.calls == ['20250102']
+    assert [df['close'].iloc[0] for df in staged] == [10.0, 9.0]
+
+    # 不再请求的暂存日期连同文件一起丢弃
+    journal = update_journal.UpdateJournal(staging)
+    assert journal.begin(['20250103']) == []
+    assert journal.staged_dates() == ['20250103']
+    assert not (tmp_path / 'staging' / '20250102.feather').exists()
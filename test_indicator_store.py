@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from utils import partition_store, indicator_store
+
+
+def test_incremental_matches_rolling(tmp_path, monkeypatch, make_master):
+    import config
+    monkeypatch.setattr(config, 'MASTER_STORE_DIR', str(tmp_path / 'master'))
+    monkeypatch.setattr(config, 'INDICATOR_STORE_DIR', str(tmp_path / 'indicators'))
+
+    days = pd.bdate_range('2025-01-01', periods=80)
+    df = make_master(days, ['000001.SZ', '300750.SZ'])
+    # 停牌一天：当天无数据
+    df = df[~((df['代码'] == '000001.SZ') & (df['日期'] == days[40]))]
+
+    partition_store.append_partitions(df[df['日期'] <= days[69]])
+    assert indicator_store.update_indicators() == 70
+    written = partition_store.append_partitions(df[df['日期'] > days[69]])
+    assert indicator_store.update_indicators(written) == 10
+
+    stored = partition_store.read_partitions(str(tmp_path / 'indicators'))
+    for code, g in df.sort_values('日期').groupby('代码'):
+        got = stored[stored['代码'] == code].set_index('日期')
+        for n in indicator_store.CLOSE_MA_WINDOWS:
+            expected = g['收盘'].rolling(n).mean().to_numpy()
+            np.testing.assert_allclose(got[f'MA{n}'].to_numpy(), expected, equal_nan=True)
+        np.testing.assert_allclose(got['VMA20'].to_numpy(), g['成交量'].rolling(20).mean().to_numpy(),
+                                   equal_nan=True)
+
+    # 300750 涨停阈值为 19.8，连板数只统计连续涨停
+    g = df[df['代码'] == '300750.SZ'].sort_values('日期')
+    got = stored[stored['代码'] == '300750.SZ']
+    streak, expected = 0, []
+    for pct in g['涨跌幅']:
+        streak = streak + 1 if pct >= 19.8 else 0
+        expected.append(streak)
+    assert got['连板数'].tolist() == expected
+
+
+def test_snapshot_indicators_advance_one_day(tmp_path, monkeypatch, make_master):
+    import config
+    monkeypatch.setattr(config, 'MASTER_STORE_DIR', str(tmp_path / 'master'))
+    monkeypatch.setattr(config, 'INDICATOR_STORE_DIR', str(tmp_path / 'indicators'))
+
+    days = pd.bdate_range('2025-01-01', periods=10)
+    df = make_master(days, ['000001.SZ'])
+    partition_store.append_partitions(df)
+    indicator_store.update_indicators()
+
+    snapshot = pd.DataFrame({'代码': ['000001.SZ'], '日期': [days[-1] + pd.offsets.BDay()],
+                             '收盘': [30.0], '成交量': [1e6], '涨跌幅': [1.0]})
+    out = indicator_store.snapshot_indicators(snapshot, ['MA5'])
+    expected = (df['收盘'].iloc[-4:].sum() + 30.0) / 5
+    assert np.isclose(out['MA5'].iloc[0], expected)
+    # 快照计算不应修改已保存的滚动状态
+    assert indicator_store.load_state()['last_date'] == days[-1]
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import kernels
+
+
+def test_rolling_matches_pandas_on_1d_and_2d():
+    rng = np.random.default_rng(0)
+    values = rng.normal(10, 1, (40, 3))
+    values[5, 1] = np.nan
+    expected = pd.DataFrame(values).rolling(5)
+    np.testing.assert_allclose(kernels.rolling_mean(values, 5), expected.mean().to_numpy(), equal_nan=True)
+    np.testing.assert_allclose(kernels.rolling_max(values, 5), expected.max().to_numpy(), equal_nan=True)
+    np.testing.assert_allclose(kernels.rolling_sum(values[:, 0], 5), expected.sum().to_numpy()[:, 0], equal_nan=True)
+    assert np.isnan(kernels.rolling_mean(values[:3], 5)).all()
+
+
+def test_runs_streaks_and_crossovers():
+    mask = np.array([[1, 0], [1, 1], [0, 1], [1, 1], [1, 1], [1, 0]], dtype=bool)
+    assert kernels.run_lengths(mask[:, 0]).tolist() == [1, 2, 0, 1, 2, 3]
+    assert kernels.longest_run(mask).tolist() == [3, 4]
+    assert kernels.first_true(~mask).tolist() == [2, 0]
+    assert kernels.last_true(np.zeros((3, 2), dtype=bool)).tolist() == [-1, -1]
+
+    pct = np.array([[10.0, 20.0], [9.95, 19.9], [3.0, 19.9], [10.0, np.nan]])
+    streaks = kernels.limit_up_streaks(pct, np.array([9.9, 19.8]))
+    assert streaks.tolist() == [[1, 1], [2, 2], [0, 3], [1, 0]]
+
+    fast = np.array([1.0, 2.0, 3.0, 2.0, 4.0])
+    slow = np.array([2.0, 2.0, 2.0, 2.5, 2.5])
+    assert kernels.crossover(fast, slow).tolist() == [False, False, True, False, True]
+    assert kernels.crossed_within(fast, slow, 1) and not kernels.crossed_within(fast[:4], slow[:4], 1)
+    assert kernels.n_bar_high(np.array([1.0, 3.0, 2.0, 4.0]), 3).tolist() == [False, False, False, True]
+
+
+def test_numba_rolling_matches_numpy():
+    pytest.importorskip('numba')
+    rng = np.random.default_rng(1)
+    values = rng.normal(10, 1, (300, 4))
+    values[rng.random(values.shape) < 0.03] = np.nan
+    values[100:104, 2] = np.nan
+    values[:, 3] = np.round(values[:, 3])  # 含大量相等值
+    for window in (1, 5, 20, 299, 300, 301):
+        for op in (0, 1, 2):
+            np.testing.assert_allclose(kernels._rolling_2d(values, window, op),
+                                       kernels._rolling_numpy(values, window, op), rtol=1e-9, equal_nan=True)
@@ -0,0 +1,110 @@
+import importlib
+import sys
+import threading
+
+import pandas as pd
+from utils import downloader, partition_store, snapshot_recorder, trade_calendar
+from utils.schema import tushare_daily_to_master
+
+# 回放的交易日取真实今天之前最近的周五：更新程序把它视为已收盘的缺失交易日，且同一周内有历史
+TODAY = pd.Timestamp.today().normalize() - pd.offsets.Week(weekday=4)
+DAYS = pd.bdate_range(end=TODAY, periods=15)
+CODES = ['000001.SZ', '000002.SZ', '600000.SH', '600004.SH']
+
+# 涨停安排（主板阈值 9.9%）：
+#   000001.SZ 周二涨停，在初始母版中；600004.SH 周四涨停，由更新程序从录制的响应补入；
+#   600000.SH 在 10:30 的快照中涨停；000002.SZ 到 14:00 的快照和当天收盘数据才涨停，
+#   回放到 10:31 时不能选中（不能看到回放时刻之后的数据）
+LIMIT_UPS = {('000001.SZ', DAYS[-4]), ('600004.SH', DAYS[-2]), ('000002.SZ', DAYS[-1])}
+
+
+class RecordingPro:
+    """录制时代替 tushare pro：返回某个交易日的 daily（vol 为手，amount 为千元）"""
+
+    def daily(self, trade_date=None, **kwargs):
+        day = pd.Timestamp(trade_date)
+        close = 10.0 + DAYS.get_loc(day) * 0.1
+        return pd.DataFrame({
+            'ts_code': CODES, 'trade_date': trade_date,
+            'open': close, 'high': close, 'low': close, 'close': close,
+            'pct_chg': [10.0 if (code, day) in LIMIT_UPS else 0.5 for code in CODES],
+            'vol': 1000.0, 'amount': 1000.0 * close / 10,
+        })
+
+
+def _snapshot(limit_up_codes):
+    return pd.DataFrame({
+        '代码': CODES, '日期': TODAY, '开盘': 11.0, '收盘': 11.0, '最高': 11.0, '最低': 11.0,
+        '成交量': 1e5, '成交额': 1.1e6, '涨跌幅': [10.0 if code in limit_up_codes else 0.5 for code in CODES],
+    })
+
+
+def _prepare_workspace(tmp_path, monkeypatch):
+    """在临时目录中准备股票池、交易日历、初始母版、录制的 Tushare 响应和盘中快照"""
+    monkeypatch.chdir(tmp_path)
+    pd.DataFrame({'ts_code': CODES, 'name': ['平安银行', '万科A', '浦发银行', '白云机场']}).to_csv(
+        'stock_pool.csv', index=False, encoding='utf-8-sig')
+    # 当天写入的交易日历文件视为最新，不联网刷新
+    pd.DataFrame({'trade_date': DAYS}).to_feather('trade_calendar.feather')
+    monkeypatch.setattr(trade_calendar, '_CALENDAR', None)
+
+    pro = RecordingPro()
+    partition_store.append_partitions(pd.concat(
+        [tushare_daily_to_master(pro.daily(day.strftime('%Y%m%d'))) for day in DAYS[:-3]], ignore_index=True))
+
+    monkeypatch.setenv('DATA_CASSETTE_DIR', str(tmp_path / 'cassettes'))
+    monkeypatch.setenv('DATA_CASSETTE_MODE', 'record')
+    _, failed = downloader.download_daily(pro, [day.strftime('%Y%m%d') for day in DAYS[-3:]],
+                                          shutdown_event=threading.Event())
+    assert not failed
+
+    for at, limit_up_codes in [('10:30', {'600000.SH'}), ('14:00', {'600000.SH', '000002.SZ'})]:
+        fetched_at = pd.Timestamp(f"{TODAY:%Y-%m-%d} {at}").to_pydatetime()
+        snapshot_recorder.record_snapshot(_snapshot(limit_up_codes), fetched_at)
+
+
+def test_update_and_select_replay_offline(tmp_path, monkeypatch):
+    _prepare_workspace(tmp_path, monkeypatch)
+    monkeypatch.setenv('DATA_CASSETTE_MODE', 'replay')
+    monkeypatch.delenv('TUSHARE_TOKEN', raising=False)
+
+    # 更新程序从录制的响应补齐缺失的交易日
+    updater = importlib.import_module('2_update_daily_data_fully_auto')
+    updater.update_data_fully_auto()
+    assert partition_store.latest_date() == DAYS[-1]
+    assert list(partition_store.list_partition_dates()) == list(DAYS)
+
+    # 选股程序回放 10:31 的快照，只使用回放交易日之前的历史
+    monkeypatch.setattr(snapshot_recorder, '_ACTIVE_REPLAYER', None)
+    monkeypatch.setattr(snapshot_recorder, '_ENV_CHECKED', False)
+    monkeypatch.setenv('SNAPSHOT_REPLAY', f"{TODAY:%Y-%m-%d} 10:31")
+    selector = importlib.import_module('3_stock_selector')
+    monkeypatch.setattr(selector, 'SELECTED_STRATEGY', 'n_limit_up')
+    monkeypatch.setattr(selector, '__file__', str(tmp_path / '3_stock_selector.py'))
+    monkeypatch.setattr(sys, 'argv', ['3_stock_selector.py'])
+    monkeypatch.setattr(sys, 'stderr', sys.stderr)
+    selector.main()
+
+    result = pd.read_csv(tmp_path / 'selected_stocks.csv', encoding='utf-8-sig')
+    assert result['ts_code'].tolist() == ['000001.SZ', '600000.SH', '600004.SH']
+    assert result['最后触发日期'].tolist() == [f"{DAYS[-4]:%Y-%m-%d}", f"{TODAY:%Y-%m-%d}", f"{DAYS[-2]:%Y-%m-%d}"]
+    assert result['名称'].tolist() == ['平安银行', '浦发银行', '白云机场']
+
+
+def test_force_date_downloads_again_instead_of_reusing_staged(tmp_path, monkeypatch):
+    from utils import update_journal
+    _prepare_workspace(tmp_path, monkeypatch)
+    monkeypatch.setenv('DATA_CASSETTE_MODE', 'replay')
+    updater = importlib.import_module('2_update_daily_data_fully_auto')
+    updater.update_data_fully_auto()
+
+    # 上次中断的运行留下了 DAYS[-2] 的过期暂存数据
+    forced = DAYS[-2].strftime('%Y%m%d')
+    journal = update_journal.UpdateJournal()
+    journal.begin([forced])
+    stale = RecordingPro().daily(forced).assign(close=1.0)
+    journal.stage(forced, stale)
+
+    updater.update_data_fully_auto(force_date=f"{DAYS[-2]:%Y-%m-%d}")
+    day = partition_store.read_partitions(dates=[DAYS[-2]])
+    assert (day['收盘'] == RecordingPro().daily(forced)['close'].iloc[0]).all()
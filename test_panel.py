@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from utils import panel
+
+DAYS = pd.to_datetime(['2025-08-04', '2025-08-05', '2025-08-06', '2025-08-07'])
+
+
+def _frame():
+    rows = [('000001.SZ', d, 10.0 + i) for i, d in enumerate(DAYS)]
+    rows += [('600000.SH', d, 20.0 + i) for i, d in enumerate(DAYS) if d != DAYS[1]]   # 停牌一天
+    return pd.DataFrame(rows, columns=['代码', '日期', '收盘'])
+
+
+def test_panel_aligns_calendar_and_bars():
+    p = panel.from_frame(_frame())
+    assert p.shape == (4, 2)
+    assert list(p.codes) == ['000001.SZ', '600000.SH']
+    assert np.isnan(p['收盘'][1, 1]) and not p.mask[1, 1]
+
+    bars = p.bars()
+    # 每只股票最新的 K 线在最后一行，停牌日不占位置
+    assert bars['收盘'][:, 1][1:].tolist() == [20.0, 22.0, 23.0]
+    assert np.isnan(bars['收盘'][0, 1])
+    assert bars.last('收盘', 1).tolist() == [12.0, 22.0]
+    assert pd.Timestamp(bars['日期'][1, 1]) == DAYS[0]
+    assert bars.counts().tolist() == [4, 3]
+
+
+def test_saved_panel_opens_as_memmap(tmp_path):
+    p = panel.from_frame(_frame())
+    panel.save_panel(p, str(tmp_path))
+    opened = panel.open_panel(str(tmp_path))
+    assert isinstance(opened['收盘'], np.memmap)
+    np.testing.assert_array_equal(opened['收盘'], p['收盘'])
+    np.testing.assert_array_equal(opened.mask, p.mask)
+    assert opened.dates.equals(p.dates)
+    pd.testing.assert_frame_equal(opened.stock_frame('600000.SH'), p.stock_frame('600000.SH'))
@@ -0,0 +1,31 @@
+from strategies import STRATEGIES
+from utils import parallel_selection, selection_engine
+from test_selection_engine import TODAY, _market
+
+
+def test_parse_result_formats():
+    assert parallel_selection.parse_result(True) == (True, None, None, None, None)
+    assert parallel_selection.parse_result((True, 10, 8, TODAY, 1.5)) == (True, 10, 8, TODAY, 1.5)
+    assert parallel_selection.parse_result((False,)) == (False, None, None, None, None)
+    assert parallel_selection.parse_result(None)[0] is False
+
+
+def test_process_pool_matches_serial_loop(capsys):
+    hist, snapshot = _market(n_stocks=60)
+    combined, _ = selection_engine.prepare_universe(hist, snapshot, TODAY, ['涨跌幅', '收盘', '成交量'], tail_bars=30)
+    universe = selection_engine.build_panel(combined)
+
+    progress = []
+    hits = parallel_selection.run_parallel(universe, 'high_volume_strategy', workers=2, chunk_size=25,
+                                           on_chunk=lambda done, total: progress.append((done, total)))
+
+    expected = []
+    for code, group in combined.groupby('代码', sort=False):
+        parsed = parallel_selection.parse_result(STRATEGIES['high_volume_strategy'](
+            code, group.drop(columns='代码').reset_index(drop=True)))
+        if parsed[0]:
+            expected.append((code, parsed))
+    capsys.readouterr()
+
+    assert hits == expected and hits
+    assert progress == [(25, 60), (50, 60), (60, 60)]
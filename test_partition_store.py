@@ -0,0 +1,57 @@
+import pandas as pd
+from utils import partition_store
+
+
+def test_append_and_read_partitions(tmp_path, make_day):
+    store = str(tmp_path / 'store')
+    new_data = pd.concat([
+        make_day('2025-08-06', ['600000.SH', '000001.SZ']),
+        make_day('2025-08-07', ['000001.SZ', '600000.SH']),
+    ])
+    written = partition_store.append_partitions(new_data, store)
+    assert [d.strftime('%Y%m%d') for d in written] == ['20250806', '20250807']
+    assert partition_store.latest_date(store) == pd.Timestamp('2025-08-07')
+
+    df = partition_store.read_partitions(store)
+    assert len(df) == 4
+    # 与旧母版文件一致：按 代码、日期 排序
+    assert df['代码'].tolist() == ['000001.SZ', '000001.SZ', '600000.SH', '600000.SH']
+
+
+def test_rewrite_partition_replaces_only_that_day(tmp_path, make_day):
+    store = str(tmp_path / 'store')
+    partition_store.append_partitions(make_day('2025-08-06', ['000001.SZ']), store)
+    partition_store.append_partitions(make_day('2025-08-07', ['000001.SZ']), store)
+    partition_store.append_partitions(make_day('2025-08-07', ['000001.SZ'], close=11.0), store)
+
+    df = partition_store.read_partitions(store)
+    assert len(df) == 2
+    assert df.loc[df['日期'] == '2025-08-07', '收盘'].iloc[0] == 11.0
+    assert df.loc[df['日期'] == '2025-08-06', '收盘'].iloc[0] == 10.0
+
+
+def test_read_partitions_with_missing_columns(tmp_path, make_day):
+    store = str(tmp_path / 'store')
+    partition_store.append_partitions(make_day('2025-08-06', ['000001.SZ']), store)
+    partial = make_day('2025-08-07', ['000001.SZ']).drop(columns=['成交量'])
+    partition_store.append_partitions(partial, store)
+
+    df = partition_store.read_partitions(store, columns=['代码', '日期', '成交量'])
+    assert list(df.columns) == ['代码', '日期', '成交量']
+    assert df['成交量'].isna().sum() == 1
+
+
+def test_scan_partitions_pushdown(tmp_path, make_day):
+    store = str(tmp_path / 'store')
+    days = pd.bdate_range('2025-08-04', periods=5)
+    partition_store.append_partitions(
+        pd.concat([make_day(d, ['000001.SZ', '600000.SH', '300750.SZ']) for d in days]), store)
+
+    df = partition_store.scan_partitions(store, codes=['600000.SH'], columns=['代码', '日期', '收盘'],
+                                         last_n_days=3)
+    assert list(df.columns) == ['代码', '日期', '收盘']
+    assert df['代码'].unique().tolist() == ['600000.SH']
+    assert df['日期'].tolist() == list(days[-3:])
+
+    df = partition_store.scan_partitions(store, start='2025-08-05', end='2025-08-06')
+    assert sorted(df['日期'].unique()) == list(days[1:3])
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategies import VECTORIZED_STRATEGIES
+from utils import partition_store, schema, selection_engine
+from utils.data_loader import load_clean_hist_data
+
+DAYS = pd.bdate_range('2025-03-03', periods=40)
+
+
+def _master(seed=0):
+    rng = np.random.default_rng(seed)
+    codes = ['000001.SZ', '300750.SZ', '600000.SH', '688001.SH']
+    df = pd.DataFrame({'代码': np.repeat(codes, len(DAYS)), '日期': np.tile(DAYS, len(codes))})
+    df['收盘'] = rng.uniform(5, 50, len(df)).round(2)
+    df['开盘'] = df['收盘'] * 0.99
+    df['最高'] = df['收盘'] * 1.02
+    df['最低'] = df['收盘'] * 0.98
+    # Tushare 的 vol 为手（两位小数），×100 后带浮点误差
+    df['成交量'] = rng.integers(1, 10 ** 7, len(df)) / 100 * 100
+    df['成交额'] = df['成交量'] * df['收盘']
+    df['涨跌幅'] = rng.choice([0.0, 1.5, 10.0], len(df))
+    return df
+
+
+def test_compact_frame_rounds_volume():
+    df = pd.DataFrame({'成交量': np.array([1234.57, 0.29, 5.0]) * 100})
+    assert (df['成交量'].astype(np.int64) != [123457, 29, 500]).any()
+    assert schema.compact_frame(df)['成交量'].tolist() == [123457, 29, 500]
+
+
+def test_encode_frame_round_trip():
+    df = _master()
+    encoded, code_table, calendar = schema.encode_frame(df)
+    assert encoded['代码ID'].dtype == np.int32 and encoded['日期序号'].dtype == np.int32
+    assert code_table[encoded['代码ID']].tolist() == df['代码'].tolist()
+    assert calendar[encoded['日期序号']].equals(pd.DatetimeIndex(df['日期']))
+    assert encoded['成交量'].tolist() == np.rint(df['成交量']).astype(np.int64).tolist()
+    np.testing.assert_allclose(encoded['收盘'], df['收盘'], rtol=1e-6)
+
+    with pytest.raises(ValueError):
+        schema.encode_frame(df, calendar=DAYS[1:])
+
+
+@pytest.mark.parametrize('compact_store', [False, True])
+def test_compact_and_plain_reads_agree(tmp_path, monkeypatch, compact_store):
+    import config
+    monkeypatch.setattr(config, 'MASTER_STORE_DIR', str(tmp_path / 'master'))
+    monkeypatch.setattr(config, 'COMPACT_SCHEMA', compact_store)
+    df = _master()
+    partition_store.append_partitions(df)
+
+    loaded = load_clean_hist_data(compact=True)
+    assert loaded['收盘'].dtype == np.float32 and loaded['成交量'].dtype == np.int64
+    # 分区扫描只决定代码列是否字典编码，数值列保持磁盘上的类型
+    for read in (load_clean_hist_data, lambda **kw: partition_store.scan_partitions(start=DAYS[5], **kw)):
+        plain, compact = read(compact=False), read(compact=True)
+        assert isinstance(compact['代码'].dtype, pd.CategoricalDtype)
+        assert compact['代码'].astype(str).tolist() == plain['代码'].astype(str).tolist()
+        assert compact['日期'].tolist() == plain['日期'].tolist()
+        np.testing.assert_array_equal(np.rint(compact['成交量']), np.rint(plain['成交量']))
+        for col in ['开盘', '收盘', '最高', '最低', '成交额', '涨跌幅']:
+            np.testing.assert_allclose(compact[col], plain[col], rtol=1e-6)
+
+    # 策略在两种类型上得到相同的结果
+    snapshot = df[df['日期'] == DAYS[-1]].drop(columns='日期')
+    for name, select_all in VECTORIZED_STRATEGIES.items():
+        results = []
+        for compact in (False, True):
+            hist = load_clean_hist_data(end=DAYS[-2], compact=compact)
+            combined, _ = selection_engine.prepare_universe(hist, snapshot, DAYS[-1], ['涨跌幅', '收盘', '成交量'])
+            results.append(select_all(selection_engine.build_panel(combined)))
+        pd.testing.assert_frame_equal(results[0], results[1], rtol=1e-6)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+from utils import security_master
+
+
+def _pool(tmp_path):
+    path = tmp_path / 'stock_pool.csv'
+    pd.DataFrame({
+        'ts_code': ['000001.SZ', '000004.SZ', '300750.SZ', '688981.SH', '600000.SH', '430047.BJ', '920001.BJ'],
+        'name': ['平安银行', '*ST国华', '宁德时代', '中芯国际', '浦发银行', '诺思兰德', '纬达光电'],
+    }).to_csv(path, index=False, encoding='utf-8-sig')
+    return str(path)
+
+
+def test_normalize_codes():
+    codes = pd.Series(['000001', 'sz000001', '600000.sh', '430047', '920001', '688981', 1])
+    normalized = security_master.normalize_codes(codes)
+    assert normalized.tolist() == ['000001.SZ', '000001.SZ', '600000.SH', '430047.BJ',
+                                   '920001.BJ', '688981.SH', '000001.SZ']
+    categorical = security_master.normalize_codes(codes.astype(str).astype('category'))
+    assert categorical.astype(str).tolist() == normalized.tolist()
+
+
+def test_master_lookups(tmp_path):
+    master = security_master.load_master(_pool(tmp_path))
+    assert master['证券ID'].tolist() == list(range(7))
+    assert master.set_index('ts_code')['板块']['430047.BJ'] == '北交所'
+
+    ids = security_master.security_ids(['600000', '999999.SH'], master)
+    assert ids.tolist() == [4, -1]
+    assert security_master.lookup(['300750'], '名称', master).tolist() == ['宁德时代']
+
+    thresholds = security_master.limit_up_threshold(
+        ['000001.SZ', '000004.SZ', '300750.SZ', '688981.SH', '430047.BJ', '601398.SH'], master)
+    np.testing.assert_allclose(thresholds, [9.9, 4.95, 19.8, 19.8, 29.7, 9.9])
+
+
+def test_snapshot_to_tushare_daily():
+    from utils.schema import snapshot_to_tushare_daily
+    snapshot = pd.DataFrame({
+        '代码': ['000001', '600000', '430047', '300750'],
+        '名称': ['平安银行', '浦发银行', '诺思兰德', '宁德时代'],
+        '最新价': [11.5, 8.2, 12.0, None],
+        '今开': [11.0, 8.0, 11.8, None], '最高': [11.6, 8.3, 12.1, None], '最低': [10.9, 7.9, 11.7, None],
+        '涨跌幅': [1.2, 0.5, -0.3, None], '成交量': [12345, 6789, 100, None], '成交额': [1.4e7, 5.5e6, 1.2e5, None],
+    })
+    daily = snapshot_to_tushare_daily(snapshot, '2025-09-30', codes=['000001.SZ', '430047.BJ', '300750.SZ'])
+    assert daily['ts_code'].tolist() == ['000001.SZ', '430047.BJ']
+    assert (daily['trade_date'] == '20250930').all()
+    assert daily['vol'].tolist() == [12345, 100]
+    assert daily['amount'].tolist() == [1.4e4, 120.0]
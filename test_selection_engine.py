@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategies import STRATEGIES, VECTORIZED_STRATEGIES
+from utils import selection_engine
+
+DAYS = pd.bdate_range('2024-06-03', periods=320)
+TODAY = DAYS[-1]
+
+
+def _market(n_stocks=120, seed=1):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(n_stocks):
+        returns = rng.normal(0, 0.025, len(DAYS))
+        returns[rng.random(len(DAYS)) < 0.03] = 0.1
+        close = 10 * np.exp(np.cumsum(returns))
+        volume = rng.lognormal(10, 0.6, len(DAYS))
+        if i % 5 == 0:
+            # 放量后连续缩量下跌
+            volume[-8] = volume[-9] * 12
+            for k in range(-6, -2):
+                volume[k], close[k] = volume[k - 1] * 0.8, close[k - 1] * 0.98
+        frames.append(pd.DataFrame({'代码': f'{i + 1:06d}.SZ', '日期': DAYS, '收盘': close, '成交量': volume,
+                                    '涨跌幅': np.r_[0, np.diff(close) / close[:-1] * 100]}))
+    hist = pd.concat(frames, ignore_index=True)
+    # 部分股票随机停牌
+    suspended = (hist['代码'].str[:6].astype(int) % 3 == 0) & (rng.random(len(hist)) < 0.05)
+    hist = hist[~suspended | (hist['日期'] == TODAY)]
+    return hist[hist['日期'] < TODAY], hist[hist['日期'] == TODAY].drop(columns='日期')
+
+
+@pytest.mark.parametrize('name, tail_bars', [('n_limit_up', None), ('ma_crossover', None),
+                                             ('ma_condition_strategy', 60), ('high_volume_strategy', 30),
+                                             ('week_ma_arrangement', 300)])
+def test_vectorized_matches_per_stock_strategy(name, tail_bars, capsys):
+    hist, snapshot = _market()
+    combined, _ = selection_engine.prepare_universe(hist, snapshot, TODAY, ['涨跌幅', '收盘', '成交量'],
+                                                    tail_bars=tail_bars, start_date=DAYS[-30])
+    result = VECTORIZED_STRATEGIES[name](selection_engine.build_panel(combined))
+
+    expected = {}
+    for code, group in combined.groupby('代码'):
+        outcome = STRATEGIES[name](code, group.drop(columns='代码').reset_index(drop=True))
+        if (outcome[0] if isinstance(outcome, tuple) else outcome):
+            expected[code] = outcome
+    capsys.readouterr()
+
+    assert set(result.index[result['选中']]) == set(expected)
+    for code, outcome in expected.items():
+        if isinstance(outcome, tuple) and len(outcome) == 5:
+            row = result.loc[code]
+            assert (int(row['当天成交量']), int(row['上一交易日成交量'])) == outcome[1:3]
+
+
+def test_prepare_universe_prefers_rows_with_volume():
+    hist = pd.DataFrame({'代码': ['000001.SZ'] * 2 + ['000002.SZ'], '日期': pd.to_datetime([DAYS[-2], TODAY, TODAY]),
+                         '收盘': [10.0, 11.0, 5.0], '成交量': [100.0, 200.0, 50.0], '涨跌幅': 0.0})
+    snapshot = pd.DataFrame({'代码': ['000001.SZ', '000003.SZ'], '收盘': [11.5, 8.0],
+                             '成交量': [np.nan, 10.0], '涨跌幅': 1.0})
+    combined, latest_close = selection_engine.prepare_universe(hist, snapshot, TODAY, ['收盘', '成交量', '涨跌幅'],
+                                                               tail_bars=10)
+    # 没有快照的股票不参与；同一天的历史记录有成交量，优先于快照
+    assert combined['代码'].unique().tolist() == ['000001.SZ']
+    assert combined['成交量'].tolist() == [100.0, 200.0]
+    assert latest_close.to_dict() == {'000001.SZ': 11.5}
+
+
+def test_index_snapshot_keys_by_upper_code():
+    snapshot = pd.DataFrame({'代码': ['000001.sz', '600000.SH', '000001.SZ'], '收盘': [1.0, 2.0, 3.0]})
+    indexed = selection_engine.index_snapshot(snapshot)
+    assert indexed.index.is_unique
+    assert indexed.loc['000001.SZ', '收盘'] == 3.0
+
+
+def test_prepare_universe_ignores_bars_after_today():
+    # 回放过去的交易日时，母版中已有之后的数据
+    hist, snapshot = _market(n_stocks=3)
+    replay_day = DAYS[-10]
+    for tail_bars, start_date in ((30, None), (None, DAYS[-40])):
+        combined, _ = selection_engine.prepare_universe(hist, snapshot, replay_day, ['收盘', '成交量'],
+                                                        tail_bars=tail_bars, start_date=start_date)
+        assert combined.groupby('代码')['日期'].max().eq(replay_day).all()
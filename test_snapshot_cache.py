@@ -0,0 +1,69 @@
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from utils import snapshot_cache, trade_calendar
+
+
+def _use_calendar(monkeypatch, dates):
+    calendar = pd.DatetimeIndex(pd.to_datetime(dates))
+    monkeypatch.setattr(trade_calendar, 'load_trade_dates', lambda *a, **k: calendar)
+
+
+def test_snapshot_expiry_follows_session(monkeypatch):
+    # 2025-10-01 ~ 10-07 国庆休市
+    _use_calendar(monkeypatch, ['2025-09-29', '2025-09-30', '2025-10-08', '2025-10-09'])
+
+    intraday = datetime(2025, 9, 29, 10, 31)
+    assert snapshot_cache.snapshot_expiry(intraday) > intraday
+    assert snapshot_cache.snapshot_expiry(intraday) < datetime(2025, 9, 29, 10, 40)
+    assert snapshot_cache.snapshot_expiry(datetime(2025, 9, 29, 12, 0)) == datetime(2025, 9, 29, 13, 0)
+    assert snapshot_cache.snapshot_expiry(datetime(2025, 9, 29, 8, 0)) == datetime(2025, 9, 29, 9, 30)
+    # 节前收盘后的快照一直用到节后第一个交易日开盘
+    assert snapshot_cache.snapshot_expiry(datetime(2025, 9, 30, 16, 0)) == datetime(2025, 10, 8, 9, 30)
+    assert snapshot_cache.snapshot_trade_date(datetime(2025, 10, 3, 10, 0)) == pd.Timestamp('2025-09-30')
+
+
+def test_write_and_read_snapshot(monkeypatch, tmp_path):
+    _use_calendar(monkeypatch, ['2025-09-29', '2025-09-30', '2025-10-08'])
+    cache_file = str(tmp_path / 'snapshot.feather')
+    df = pd.DataFrame({
+        '代码': ['000001.SZ'], '日期': [pd.Timestamp('2025-09-30')],
+        '开盘': [11.0], '收盘': [11.5], '最高': [11.6], '最低': [10.9],
+        '成交量': [1234500.0], '成交额': [1.4e7], '涨跌幅': [1.2],
+    })
+    snapshot_cache.write_snapshot(df, cache_file, fetched_at=datetime(2025, 9, 30, 16, 0))
+
+    cached, fetched_at = snapshot_cache.read_snapshot(cache_file, now=datetime(2025, 10, 5, 12, 0))
+    assert fetched_at == datetime(2025, 9, 30, 16, 0)
+    assert cached['成交量'].iloc[0] == 1234500.0
+
+    expired, _ = snapshot_cache.read_snapshot(cache_file, now=datetime(2025, 10, 8, 9, 31))
+    assert expired is None
+    stale, _ = snapshot_cache.read_snapshot(cache_file, allow_stale=True, now=datetime(2025, 10, 8, 9, 31))
+    assert stale is not None
+
+
+def test_cache_lock_is_not_stolen_during_long_fetch(tmp_path):
+    path = str(tmp_path / 'snapshot.feather')
+    with snapshot_cache.CacheLock(path, stale_seconds=0.2):
+        # 持锁时间远超失效时间，心跳使锁保持有效
+        time.sleep(0.6)
+        with pytest.raises(TimeoutError):
+            with snapshot_cache.CacheLock(path, timeout=0.3, stale_seconds=0.2, poll_interval=0.05):
+                pass
+    with snapshot_cache.CacheLock(path, timeout=0.3):
+        pass
+
+
+def test_cache_lock_left_by_dead_holder_expires(tmp_path):
+    path = str(tmp_path / 'snapshot.feather')
+    with open(f"{path}.lock", 'w') as f:
+        f.write('12345')
+    old = time.time() - 10
+    os.utime(f"{path}.lock", (old, old))
+    with snapshot_cache.CacheLock(path, timeout=0.3, stale_seconds=1):
+        pass
+    assert not os.path.exists(f"{path}.lock")
@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from utils import snapshot_recorder
+
+POLLS = [datetime(2025, 8, 7, 9, 30, 5), datetime(2025, 8, 7, 10, 31), datetime(2025, 8, 7, 10, 36)]
+
+
+def _snapshot(close):
+    return pd.DataFrame({
+        '代码': ['600000.SH', '000001.SZ'], '日期': pd.Timestamp('2025-08-07'),
+        '开盘': 10.0, '收盘': close, '最高': 11.0, '最低': 9.0,
+        '成交量': 1e6, '成交额': 1e7, '涨跌幅': 0.5,
+    })
+
+
+def _record(record_dir):
+    for i, fetched_at in enumerate(POLLS):
+        snapshot_recorder.record_snapshot(_snapshot(10.0 + i), fetched_at, record_dir)
+
+
+def test_record_and_list_polls(tmp_path):
+    record_dir = str(tmp_path / 'records')
+    _record(record_dir)
+    # 另一个交易日的录制互不影响
+    snapshot_recorder.record_snapshot(_snapshot(9.0), datetime(2025, 8, 8, 9, 31), record_dir)
+
+    assert snapshot_recorder.list_polls('2025-08-07', record_dir) == POLLS
+    assert snapshot_recorder.list_polls('2025-08-06', record_dir) == []
+
+    poll = snapshot_recorder.load_poll(POLLS[1], record_dir)
+    assert poll['时间'].unique().tolist() == [pd.Timestamp(POLLS[1])]
+    assert poll['代码'].tolist() == ['000001.SZ', '600000.SH']
+    session = snapshot_recorder.load_session('2025-08-07', record_dir)
+    assert len(session) == 6 and session['时间'].is_monotonic_increasing
+
+
+def test_replayer_follows_simulated_clock(tmp_path, monkeypatch):
+    record_dir = str(tmp_path / 'records')
+    _record(record_dir)
+    clock = [1000.0]
+    monkeypatch.setattr(snapshot_recorder.time, 'monotonic', lambda: clock[0])
+
+    replayer = snapshot_recorder.SnapshotReplayer('2025-08-07', '10:31', speed=60, record_dir=record_dir)
+    assert replayer.now() == POLLS[1]
+    assert replayer.current()['收盘'].unique().tolist() == [11.0]
+    # 实际经过 4 秒，60 倍速下模拟时间前进 4 分钟，仍在下一次录制之前
+    clock[0] += 4
+    assert replayer.now() == datetime(2025, 8, 7, 10, 35)
+    assert replayer.current()['收盘'].unique().tolist() == [11.0]
+    clock[0] += 1
+    assert replayer.current()['收盘'].unique().tolist() == [12.0]
+
+    assert replayer.at(datetime(2025, 8, 7, 9, 30, 5))['收盘'].iloc[0] == 10.0
+    with pytest.raises(ValueError):
+        replayer.at(datetime(2025, 8, 7, 9, 0))
+
+    # speed=0 冻结时钟
+    frozen = snapshot_recorder.SnapshotReplayer('2025-08-07', '10:33', speed=0, record_dir=record_dir)
+    clock[0] += 3600
+    assert frozen.now() == datetime(2025, 8, 7, 10, 33)
+
+
+def test_replay_start_before_first_poll_is_clamped(tmp_path):
+    record_dir = str(tmp_path / 'records')
+    _record(record_dir)
+    replayer = snapshot_recorder.SnapshotReplayer('2025-08-07', datetime(2025, 8, 7, 9, 0), speed=0,
+                                                  record_dir=record_dir)
+    assert replayer.now() == POLLS[0]
+    assert replayer.current() is not None
+    with pytest.raises(FileNotFoundError):
+        snapshot_recorder.SnapshotReplayer('2025-08-06', record_dir=record_dir)
+
+
+def test_replay_env_var(tmp_path, monkeypatch):
+    assert snapshot_recorder.parse_replay_spec('2025-08-07 10:31') == (datetime(2025, 8, 7, 10, 31), 0.0)
+    assert snapshot_recorder.parse_replay_spec(' 2025-08-07 10:31 @ 60 ') == (datetime(2025, 8, 7, 10, 31), 60.0)
+
+    import config
+    record_dir = str(tmp_path / 'records')
+    _record(record_dir)
+    monkeypatch.setattr(config, 'SNAPSHOT_RECORD_DIR', record_dir)
+    monkeypatch.setattr(snapshot_recorder, '_ACTIVE_REPLAYER', None)
+    monkeypatch.setattr(snapshot_recorder, '_ENV_CHECKED', False)
+    monkeypatch.setenv('SNAPSHOT_REPLAY', '2025-08-07 10:32')
+
+    replayer = snapshot_recorder.active_replayer()
+    assert replayer is not None and replayer.speed == 0.0
+    assert replayer.now() == datetime(2025, 8, 7, 10, 32)
+    assert snapshot_recorder.active_replayer() is replayer
+    snapshot_recorder.stop_replay()
@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+from utils import data_sources, source_router
+from utils.schema import MASTER_COLUMNS, SchemaError, tushare_daily_to_master
+
+
+def _daily(trade_date, drop=()):
+    df = pd.DataFrame({'ts_code': ['000001.SZ', '600000.SH'], 'trade_date': [trade_date] * 2,
+                       'open': [10.0, 8.0], 'high': [10.5, 8.3], 'low': [9.8, 7.9], 'close': [10.2, 8.1],
+                       'pre_close': [10.0, 8.0], 'change': [0.2, 0.1], 'pct_chg': [2.0, 1.25],
+                       'vol': [1200.0, 800.0], 'amount': [1224.0, 648.0]})
+    return df.drop(columns=list(drop))
+
+
+def _fetcher(delay=0.0, drop=(), fail=False):
+    async def fetch(day):
+        await asyncio.sleep(delay)
+        if fail:
+            raise ConnectionError('reset by peer')
+        return _daily(pd.Timestamp(day).strftime('%Y%m%d'), drop)
+    return fetch
+
+
+def test_normalized_schema_rejects_missing_columns():
+    master = tushare_daily_to_master(_daily('20250102'))
+    assert list(master.columns) == MASTER_COLUMNS
+    assert master['成交量'].iloc[0] == 120000 and master['成交额'].iloc[0] == 1224000
+    with pytest.raises(SchemaError):
+        tushare_daily_to_master(_daily('20250102', drop=['vol', 'pct_chg']))
+
+
+def test_falls_back_on_incomplete_source_and_learns(tmp_path):
+    stats_file = str(tmp_path / 'stats.json')
+    fetchers = {'snapshot': _fetcher(drop=['pct_chg']), 'tushare': _fetcher(delay=0.02)}
+    router = source_router.SourceRouter(fetchers, stats_file=stats_file, window=10, hedge_delay=1)
+    name, df = data_sources.run(router.fetch('2025-01-02'))
+    assert name == 'tushare'
+    assert df['涨跌幅'].notna().all()
+
+    for _ in range(2):
+        data_sources.run(router.fetch('2025-01-02'))
+    saved = json.load(open(stats_file, encoding='utf-8'))
+    assert [ok for _, ok in saved['snapshot']] == [False]
+    # 重新加载统计后，失败的数据源排在后面
+    reloaded = source_router.SourceRouter(fetchers, stats_file=stats_file, window=10)
+    assert reloaded.ranked() == ['tushare', 'snapshot']
+
+
+def test_hedges_slow_source_and_raises_when_all_fail(tmp_path):
+    stats_file = str(tmp_path / 'stats.json')
+    router = source_router.SourceRouter({'slow': _fetcher(delay=1.0), 'fast': _fetcher(delay=0.01)},
+                                        stats_file=stats_file, hedge_delay=0.05)
+    name, _ = data_sources.run(router.fetch('2025-01-02'))
+    assert name == 'fast'
+
+    router = source_router.SourceRouter({'a': _fetcher(fail=True), 'b': _fetcher(drop=['vol'])},
+                                        stats_file=stats_file, hedge_delay=0.05)
+    with pytest.raises(source_router.SourceUnavailable) as excinfo:
+        data_sources.run(router.fetch('2025-01-02'))
+    assert set(excinfo.value.errors) == {'a', 'b'}
@@ -0,0 +1,34 @@
+import pandas as pd
+from utils import trade_calendar
+
+# 2025-10-01 ~ 10-07 国庆休市
+CALENDAR = pd.DatetimeIndex(pd.to_datetime(['2025-09-26', '2025-09-29', '2025-09-30', '2025-10-08', '2025-10-09']))
+
+
+def test_trading_day_queries():
+    assert trade_calendar.is_trading_day('2025-09-30', CALENDAR)
+    assert not trade_calendar.is_trading_day('2025-10-03', CALENDAR)
+    assert trade_calendar.prev_trading_day('2025-10-08', CALENDAR) == pd.Timestamp('2025-09-30')
+    assert trade_calendar.trading_day_index('2025-10-08', CALENDAR) == 3
+    assert trade_calendar.trading_day_index('2025-10-05', CALENDAR) == 2
+    assert trade_calendar.trading_day_index('2025-09-01', CALENDAR) == -1
+
+    assert trade_calendar.n_trading_days_before('2025-10-09', 3, CALENDAR) == pd.Timestamp('2025-09-29')
+    assert trade_calendar.n_trading_days_before('2025-10-05', 1, CALENDAR) == pd.Timestamp('2025-09-30')
+    assert trade_calendar.n_trading_days_before('2025-09-29', 5, CALENDAR) is None
+
+
+def test_lookback_start_falls_back_to_calendar_start():
+    assert trade_calendar.lookback_start('2025-10-09', 3, CALENDAR) == pd.Timestamp('2025-09-29')
+    # 日历中不足 n 个交易日时取日历第一天
+    assert trade_calendar.lookback_start('2025-10-09', 300, CALENDAR) == pd.Timestamp('2025-09-26')
+    assert trade_calendar.lookback_start('2025-10-09', 3, pd.DatetimeIndex([])) is None
+
+
+def test_trading_days_between():
+    between = trade_calendar.trading_days_between('2025-09-29', '2025-10-08', calendar=CALENDAR)
+    assert list(between.strftime('%m%d')) == ['0929', '0930', '1008']
+    between = trade_calendar.trading_days_between('2025-09-29', '2025-10-08', inclusive='neither', calendar=CALENDAR)
+    assert list(between.strftime('%m%d')) == ['0930']
+    between = trade_calendar.trading_days_between('2025-09-29', '2025-10-08', inclusive='right', calendar=CALENDAR)
+    assert list(between.strftime('%m%d')) == ['0930', '1008']
@@ -0,0 +1,231 @@
+# utils/array_store.py
+# 按股票连续存放的内存映射行情数组：每个数值列一个二进制文件（按 代码、日期 排序），
+# 另有一个 代码 -> (偏移, 长度) 索引。单只股票的全部历史通过 np.memmap 零拷贝切片读取，
+# 耗时与股票总数无关。日期列为 int32 交易日序号，交易日历保存在索引中。
+# 日常更新用 update_array_store() 把新交易日按 (代码, 日期) 有序归并进现有数组，不重新排序全部历史。
+
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from utils.schema import PRICE_COLUMNS, compact_enabled, encode_frame
+
+INDEX_NAME = '_index.json'
+
+# 列名映射：磁盘列名 -> 数据框列名
+COLUMN_MAP = {
+    'open': '开盘',
+    'high': '最高',
+    'low': '最低',
+    'close': '收盘',
+    'volume': '成交量',
+    'amount': '成交额',
+    'pct': '涨跌幅',
+}
+
+# 已打开的内存映射缓存：{store_dir: (索引文件mtime, 索引, {列名: memmap})}
+_OPENED = {}
+
+
+def _resolve_dir(store_dir=None):
+    from config import ARRAY_STORE_DIR
+    return store_dir or ARRAY_STORE_DIR
+
+
+def store_exists(store_dir=None):
+    return os.path.exists(os.path.join(_resolve_dir(store_dir), INDEX_NAME))
+
+
+def build_array_store(df=None, store_dir=None):
+    """
+    由母版数据重建数组存储。
+    新版本写入独立的子目录，最后原子替换索引文件，正在读取的进程不受影响。
+    :param df: 已清洗的历史数据；None 时调用 load_clean_hist_data()
+    :return: 写入的股票数量
+    """
+    if df is None:
+        from utils.data_loader import load_clean_hist_data
+        df = load_clean_hist_data()
+    store_dir = _resolve_dir(store_dir)
+    os.makedirs(store_dir, exist_ok=True)
+
+    df = df.sort_values(['代码', '日期'], kind='stable').reset_index(drop=True)
+    # 日期存为 int32 交易日序号，交易日历作为旁表写入索引
+    encoded, _, calendar = encode_frame(df[['代码', '日期']])
+    columns = _column_arrays(df, _column_dtypes())
+    count = _write_version(store_dir, df['代码'].astype(str).to_numpy(), encoded['日期序号'].to_numpy(),
+                           columns, calendar)
+    print(f"--- 数组存储已重建: {count} 只股票, {len(df)} 行 ---")
+    return count
+
+
+def _column_dtypes():
+    compact = compact_enabled()
+    return {name: ('float32' if compact and col in PRICE_COLUMNS else 'float64')
+            for name, col in COLUMN_MAP.items()}
+
+
+def _column_arrays(df, dtypes):
+    """数据框 -> {磁盘列名: ndarray}，缺少的列填 NaN"""
+    arrays = {}
+    for name, col in COLUMN_MAP.items():
+        if col in df.columns:
+            arrays[name] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=dtypes[name])
+        else:
+            arrays[name] = np.full(len(df), np.nan, dtype=dtypes[name])
+    return arrays
+
+
+def _write_version(store_dir, codes, dates, columns, calendar):
+    """
+    把已按 (代码, 日期) 排序的数组写为一个新版本，并原子替换索引。
+    :return: 股票数量
+    """
+    # 每只股票的起始位置与长度
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=np.int64)
+    lengths = np.diff(np.r_[starts, len(codes)])
+
+    version = datetime.now().strftime('v%Y%m%d%H%M%S%f')
+    version_dir = os.path.join(store_dir, version)
+    os.makedirs(version_dir)
+    np.asarray(dates, dtype=np.int32).tofile(os.path.join(version_dir, 'dates.bin'))
+    dtypes = {'dates': 'int32'}
+    for name, values in columns.items():
+        values.tofile(os.path.join(version_dir, f'{name}.bin'))
+        dtypes[name] = str(values.dtype)
+
+    index = {
+        'version': version,
+        'rows': int(len(codes)),
+        'dtypes': dtypes,
+        'calendar': pd.DatetimeIndex(calendar).strftime('%Y-%m-%d').tolist(),
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+        'codes': {str(c): [int(s), int(n)] for c, s, n in zip(codes[starts], starts, lengths)},
+    }
+    index_path = os.path.join(store_dir, INDEX_NAME)
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+
+    # 清理旧版本（可能仍被其他进程映射，失败则留待下次）
+    for entry in os.listdir(store_dir):
+        if entry.startswith('v') and entry != version:
+            shutil.rmtree(os.path.join(store_dir, entry), ignore_errors=True)
+    return len(starts)
+
+
+def update_array_store(written_dates, store_dir=None, master_dir=None):
+    """
+    把母版中新写入（或整日替换）的交易日有序归并进数组存储：
+    这些交易日原有的行整体删除，新行按 (代码, 日期) 用二分定位插入，
+    其余历史只做一次顺序拷贝，不重新排序、不从母版重新读取。
+    存储不存在时全量重建。
+    :param master_dir: 母版分区目录，None 时取 config.MASTER_STORE_DIR
+    :return: 股票数量
+    """
+    from utils import partition_store
+    store_dir = _resolve_dir(store_dir)
+    if not store_exists(store_dir):
+        return build_array_store(store_dir=store_dir)
+    written = pd.DatetimeIndex(pd.to_datetime(list([] if written_dates is None else written_dates))).normalize().unique()
+    if written.empty:
+        return None
+    new_df = partition_store.read_partitions(master_dir, dates=written, compact=False)
+
+    index, arrays = _open_store(store_dir)
+    old_calendar = index['calendar']
+    calendar = old_calendar.union(written)
+    # 新交易日插在历史中间时，原有日期序号整体平移
+    remap = calendar.get_indexer(old_calendar).astype(np.int32)
+    old_dates = remap[np.asarray(arrays['dates'])] if len(old_calendar) else np.empty(0, dtype=np.int32)
+
+    # 原有行的代码：按索引中的 (偏移, 长度) 展开，索引中的代码本身是有序的
+    old_codes = np.array(sorted(index['codes']), dtype=object)
+    old_lengths = np.array([index['codes'][c][1] for c in old_codes], dtype=np.int64)
+    new_codes = new_df['代码'].astype(str).str.upper().to_numpy(dtype=object)
+    all_codes = np.union1d(old_codes, new_codes).astype(object)
+    old_rank = np.repeat(np.searchsorted(all_codes, old_codes), old_lengths)
+    new_rank = np.searchsorted(all_codes, new_codes)
+    new_dates = calendar.get_indexer(pd.to_datetime(new_df['日期'])).astype(np.int32)
+
+    # 排序键：代码序号 * 日历长度 + 日期序号；原有行天然有序
+    width = np.int64(len(calendar))
+    keep = ~np.isin(old_dates, calendar.get_indexer(written))
+    old_keys = old_rank[keep] * width + old_dates[keep]
+    order = np.argsort(new_rank * width + new_dates, kind='stable')
+    new_keys = (new_rank * width + new_dates)[order]
+    positions = np.searchsorted(old_keys, new_keys)
+
+    dtypes = {name: index['dtypes'][name] for name in COLUMN_MAP}
+    new_columns = _column_arrays(new_df.iloc[order], dtypes)
+    columns = {name: np.insert(np.asarray(arrays[name])[keep], positions, new_columns[name])
+               for name in COLUMN_MAP}
+    codes = np.insert(all_codes[old_rank[keep]], positions, all_codes[new_rank[order]])
+    dates = np.insert(old_dates[keep], positions, new_dates[order])
+
+    count = _write_version(store_dir, codes, dates, columns, calendar)
+    print(f"--- 数组存储已归并 {len(written)} 个交易日（{len(new_df)} 行），共 {count} 只股票, {len(codes)} 行 ---")
+    return count
+
+
+def _open_store(store_dir=None):
+    """打开（或复用已打开的）内存映射；索引变化时自动重新映射"""
+    store_dir = _resolve_dir(store_dir)
+    index_path = os.path.join(store_dir, INDEX_NAME)
+    if not os.path.exists(index_path):
+        raise FileNotFoundError(f"找不到数组存储索引 {index_path}")
+    mtime = os.stat(index_path).st_mtime_ns
+    cached = _OPENED.get(store_dir)
+    if cached and cached[0] == mtime:
+        return cached[1], cached[2]
+
+    with open(index_path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    version_dir = os.path.join(store_dir, index['version'])
+    arrays = {}
+    for name, dtype in index['dtypes'].items():
+        if index['rows'] == 0:
+            arrays[name] = np.empty(0, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(os.path.join(version_dir, f'{name}.bin'),
+                                     dtype=dtype, mode='r', shape=(index['rows'],))
+    index['calendar'] = pd.DatetimeIndex(index['calendar'])
+    _OPENED[store_dir] = (mtime, index, arrays)
+    return index, arrays
+
+
+def load_stock_arrays(stock_code, store_dir=None):
+    """
+    读取单只股票的全部历史，返回 {列名: ndarray 视图}（零拷贝）。
+    dates 为 int32 交易日序号，可用 trading_calendar() 还原为日期。
+    股票不存在时返回 None。
+    """
+    index, arrays = _open_store(store_dir)
+    loc = index['codes'].get(str(stock_code).upper())
+    if loc is None:
+        return None
+    start, length = loc
+    return {name: arr[start:start + length] for name, arr in arrays.items()}
+
+
+def trading_calendar(store_dir=None):
+    """数组存储使用的交易日历（dates 序号 -> 日期）"""
+    index, _ = _open_store(store_dir)
+    return index['calendar']
+
+
+def load_stock_frame(stock_code, store_dir=None):
+    """读取单只股票的全部历史，返回与 load_clean_hist_data() 相同列名的 DataFrame"""
+    arrays = load_stock_arrays(stock_code, store_dir)
+    if arrays is None:
+        return pd.DataFrame(columns=['代码', '日期'] + list(COLUMN_MAP.values()))
+    df = pd.DataFrame({
+        '代码': str(stock_code).upper(),
+        '日期': trading_calendar(store_dir)[np.asarray(arrays['dates'])],
+    })
+    for name, col in COLUMN_MAP.items():
+        df[col] = np.asarray(arrays[name])
+    return df
@@ -0,0 +1,173 @@
+# utils/bar_tables.py
+# 周线、月线 OHLCV 表（含收盘价 MA5/10/20/30），按周期分区存放（分区键为周期起始日）。
+# 日常更新只重写包含新交易日的周期分区（通常只有本周、本月各一个）。
+
+import os
+import pandas as pd
+from utils import partition_store
+
+PERIODS = {
+    'weekly': 'W',   # 周一为一周开始，与 week_ma_arrangement 的 to_period('W') 口径一致
+    'monthly': 'M',
+}
+MA_WINDOWS = (5, 10, 20, 30)
+BAR_COLUMNS = ['代码', '日期', '开盘', '最高', '最低', '收盘', '成交量', '成交额', '最后交易日', '交易日数'] + \
+              [f'MA{n}' for n in MA_WINDOWS]
+DAILY_COLUMNS = ['代码', '日期', '开盘', '最高', '最低', '收盘', '成交量', '成交额']
+
+
+def _resolve_dir(period, store_dir=None):
+    from config import BAR_TABLE_DIR
+    return os.path.join(store_dir or BAR_TABLE_DIR, period)
+
+
+def period_start(dates, period):
+    """交易日所属周期的起始日（周一 / 月初）"""
+    return pd.to_datetime(pd.Series(dates)).dt.to_period(PERIODS[period]).dt.start_time.to_numpy()
+
+
+def aggregate_bars(daily_df, period):
+    """把日线聚合为周期K线（不含均线）"""
+    df = daily_df.copy()
+    df['日期'] = pd.to_datetime(df['日期'])
+    df['代码'] = df['代码'].astype(str)
+    df = df.sort_values(['代码', '日期'])
+    df['周期'] = period_start(df['日期'], period)
+    agg = {'开盘': 'first', '最高': 'max', '最低': 'min', '收盘': 'last',
+           '成交量': 'sum', '成交额': 'sum', '日期': 'last'}
+    agg = {k: v for k, v in agg.items() if k in df.columns}
+    grouped = df.groupby(['代码', '周期'], sort=True)
+    bars = grouped.agg(agg).reset_index()
+    # 周期内的日线根数，策略据此判断日线数量是否足够（节假日较多的周期少于 5 根）
+    bars['交易日数'] = grouped.size().to_numpy()
+    bars = bars.rename(columns={'日期': '最后交易日', '周期': '日期'})
+    return bars
+
+
+def count_daily_bars(bars, today):
+    """
+    由周期K线的 交易日数 汇总各股票在 today 之前的日线根数（today 当天已写入母版的日线不计入）。
+    :param bars: 该股票全部周期的K线（至少包含 代码、交易日数、最后交易日）
+    :return: Series（代码 -> 根数）
+    """
+    today = pd.Timestamp(today).normalize()
+    codes = bars['代码'].astype(str)
+    counted = bars['交易日数'] - (pd.to_datetime(bars['最后交易日']) >= today)
+    return counted.groupby(codes).sum()
+
+
+def add_moving_averages(bars):
+    """按股票计算周期收盘价均线（bars 需按 代码、日期 排序）"""
+    grouped = bars.groupby('代码', sort=False)['收盘']
+    for n in MA_WINDOWS:
+        bars[f'MA{n}'] = grouped.rolling(n).mean().droplevel(0)
+    return bars
+
+
+def table_exists(period, store_dir=None):
+    """周期表存在且包含当前版本的全部列（旧版本的表在下次更新时重建）"""
+    table_dir = _resolve_dir(period, store_dir)
+    if not partition_store.store_exists(table_dir):
+        return False
+    partitions = partition_store.load_manifest(table_dir)['partitions'].values()
+    return all(set(BAR_COLUMNS) <= set(entry.get('columns', BAR_COLUMNS)) for entry in partitions)
+
+
+def load_bars(period, codes=None, last_n=None, start=None, columns=None, store_dir=None):
+    """读取周期K线表；last_n 为全表最近 N 个周期（停牌的股票在其中可能少于 N 根）"""
+    return partition_store.scan_partitions(_resolve_dir(period, store_dir), codes=codes, start=start,
+                                           last_n_days=last_n, columns=columns, compact=False)
+
+
+def rebuild_bar_table(period, store_dir=None):
+    """由母版全部历史重建某个周期表"""
+    table_dir = _resolve_dir(period, store_dir)
+    daily = partition_store.scan_partitions(columns=DAILY_COLUMNS, compact=False)
+    bars = add_moving_averages(aggregate_bars(daily, period))
+    manifest = partition_store.load_manifest(table_dir)
+    manifest['partitions'] = {}
+    for key, part in bars.groupby('日期', sort=True):
+        partition_store.write_partition(key, part, table_dir, manifest=manifest, commit=False)
+    partition_store.save_manifest(manifest, table_dir)
+    return bars['日期'].nunique()
+
+
+def _previous_closes(current_codes, before_key, table_dir, manifest):
+    """
+    各股票在 before_key 之前最近 max(MA_WINDOWS)-1 根周期K线的收盘价（表中没有更早的周期时返回 None）。
+    按股票计数而不是按周期分区计数：整周（整月）停牌的股票在最近 29 个分区中不足 29 根，
+    对不足的股票逐步加倍回看的分区数，直到根数足够或到达表的起点。
+    """
+    need = max(MA_WINDOWS) - 1
+    prev_keys = [k for k in sorted(manifest['partitions']) if k < before_key]
+    columns = ['代码', '日期', '收盘']
+    parts = []
+    codes, scanned, span = list(current_codes), 0, need
+    while codes and scanned < len(prev_keys):
+        keys = prev_keys[-span:len(prev_keys) - scanned]
+        part = partition_store.scan_partitions(table_dir, codes=codes, start=keys[0], end=keys[-1],
+                                               columns=columns, compact=False)
+        part['代码'] = part['代码'].astype(str)
+        parts.append(part)
+        scanned, span = len(prev_keys[-span:]), span * 2
+        counts = pd.concat(parts)['代码'].value_counts()
+        codes = [c for c in codes if counts.get(c, 0) < need]
+    if not parts:
+        return None
+    history = pd.concat(parts, ignore_index=True).sort_values(['代码', '日期'], kind='stable')
+    return history.groupby('代码', sort=False).tail(need)
+
+
+def _rewrite_period(period, start, table_dir, manifest):
+    """重算某个周期：从母版读取该周期的日线，结合各股票此前 29 根周期K线的收盘价计算均线"""
+    end = (pd.Period(start, PERIODS[period]).end_time).normalize()
+    daily = partition_store.scan_partitions(start=start, end=end, columns=DAILY_COLUMNS, compact=False)
+    if daily.empty:
+        return False
+    current = aggregate_bars(daily, period)
+
+    history = _previous_closes(current['代码'].unique(), pd.Timestamp(start).strftime('%Y%m%d'),
+                               table_dir, manifest)
+    combined = current[['代码', '日期', '收盘']]
+    if history is not None:
+        combined = pd.concat([history, combined], ignore_index=True)
+    combined = add_moving_averages(combined.sort_values(['代码', '日期'], kind='stable'))
+    ma_cols = [f'MA{n}' for n in MA_WINDOWS]
+    current = current.merge(combined.loc[combined['日期'] == pd.Timestamp(start), ['代码'] + ma_cols],
+                            on='代码', how='left')
+    partition_store.write_partition(start, current, table_dir, manifest=manifest, commit=False)
+    return True
+
+
+def update_bar_tables(written_dates=None, store_dir=None):
+    """
+    增量更新周线、月线表：只重写包含新交易日的周期。
+    若改动的是较早的周期，其后各周期的均线也随之重算。
+    """
+    latest_daily = partition_store.latest_date()
+    if latest_daily is None:
+        return
+    for period in PERIODS:
+        table_dir = _resolve_dir(period, store_dir)
+        manifest = partition_store.load_manifest(table_dir)
+        if not manifest['partitions'] or not table_exists(period, store_dir):
+            count = rebuild_bar_table(period, store_dir)
+            print(f"--- {period} 表已重建，共 {count} 个周期 ---")
+            continue
+
+        last_key = sorted(manifest['partitions'])[-1]
+        starts = set(pd.to_datetime(period_start(written_dates, period))) if written_dates else set()
+        # 母版中比表更新的交易日（例如上次刷新失败）也要补上
+        pending_daily = [d for d in partition_store.list_partition_dates()
+                         if d >= pd.Timestamp(last_key)]
+        starts |= set(pd.to_datetime(period_start(pending_daily, period)))
+        if not starts:
+            continue
+        first = min(starts)
+        # 较早的周期被改动时，之后所有周期的均线都要重算
+        existing = [pd.Timestamp(k) for k in manifest['partitions'] if pd.Timestamp(k) > first]
+        to_rewrite = sorted(starts | set(existing))
+        for start in to_rewrite:
+            _rewrite_period(period, start, table_dir, manifest)
+        partition_store.save_manifest(manifest, table_dir)
+        print(f"--- {period} 表已更新 {len(to_rewrite)} 个周期 ---")
@@ -0,0 +1,103 @@
+# utils/bootstrap.py
+# 全量历史初始化：按交易日并发、限速地下载 Tushare 日线，每个交易日到达即写入对应的母版分区，
+# 不在内存中累积全部历史。
+#   - 已有非空分区的交易日视为完成，中断后重新运行只下载缺少的交易日（母版分区本身即进度记录）；
+#   - 清单每写入 commit_every 个分区提交一次，中断时也会提交已写入的部分；
+#   - 结束时按交易日历核对：每个交易日都应有分区，且行数不明显少于前后交易日。
+
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils import partition_store, trade_calendar, downloader, cassette
+from utils.schema import tushare_daily_to_master
+
+# 行数低于此前交易日中位数的该比例时视为行数偏少（与数据质量检查一致）
+ROW_COUNT_RATIO = 0.9
+
+
+def pending_dates(trade_dates, store_dir=None):
+    """尚未写入（或写入了空分区）的交易日"""
+    partitions = partition_store.load_manifest(store_dir)['partitions']
+    return [d for d in pd.DatetimeIndex(trade_dates)
+            if partitions.get(d.strftime('%Y%m%d'), {}).get('rows', 0) == 0]
+
+
+def verify(trade_dates, store_dir=None, window=20):
+    """
+    按交易日历核对分区：只读清单中记录的行数，不打开分区文件。
+    :return: DataFrame[日期, 行数, 状态]，状态为 正常 / 缺失 / 行数偏少
+    """
+    trade_dates = pd.DatetimeIndex(trade_dates)
+    partitions = partition_store.load_manifest(store_dir)['partitions']
+    rows = np.array([partitions.get(d.strftime('%Y%m%d'), {}).get('rows', 0) for d in trade_dates],
+                    dtype=np.int64)
+    counts = pd.Series(rows, dtype=float).where(rows > 0)
+    baseline = counts.shift(1).rolling(window, min_periods=3).median()
+    status = np.where(rows == 0, '缺失', np.where((counts < baseline * ROW_COUNT_RATIO).to_numpy(), '行数偏少', '正常'))
+    return pd.DataFrame({'日期': trade_dates, '行数': rows, '状态': status})
+
+
+def ensure_stock_pool(pro, pool_file=None):
+    """新机器上没有股票池文件时，从 Tushare 获取在市股票列表生成"""
+    from config import STOCK_POOL_FILE
+    pool_file = pool_file or STOCK_POOL_FILE
+    if os.path.exists(pool_file):
+        return False
+    basic = cassette.cached_call('tushare', 'stock_basic', pro.stock_basic, exchange='', list_status='L',
+                                 fields='ts_code,name')
+    basic[['ts_code', 'name']].to_csv(pool_file, index=False, encoding='utf-8-sig')
+    print(f"--- 已生成股票池文件 '{pool_file}'，共 {len(basic)} 只股票 ---")
+    return True
+
+
+def bootstrap_history(pro, start, end, store_dir=None, shutdown_event=None, max_passes=3, commit_every=20,
+                      calendar=None, **download_kwargs):
+    """
+    下载 [start, end] 内全部交易日的日线并写入母版分区。
+    :param max_passes: 失败或返回空数据的交易日最多重新下载几轮
+    :param calendar: 交易日历，None 时使用本地缓存的交易日历
+    :return: verify() 的核对结果
+    """
+    shutdown_event = shutdown_event or threading.Event()
+    trade_dates = trade_calendar.trading_days_between(start, end, inclusive='both', calendar=calendar)
+    total = len(trade_dates)
+    if total == 0:
+        raise ValueError(f"{start} ~ {end} 之间没有交易日")
+
+    for attempt in range(max_passes):
+        todo = pending_dates(trade_dates, store_dir)
+        if not todo or shutdown_event.is_set():
+            break
+        done = total - len(todo)
+        print(f"--- 第 {attempt + 1} 轮: 共 {total} 个交易日，已完成 {done} 个，待下载 {len(todo)} 个 ---")
+        manifest = partition_store.load_manifest(store_dir)
+        state = {'written': 0, 'empty': []}
+
+        def on_result(trade_date, df):
+            if df is None or df.empty:
+                state['empty'].append(trade_date)
+                return
+            partition_store.write_partition(trade_date, tushare_daily_to_master(df), store_dir,
+                                            manifest=manifest, commit=False)
+            state['written'] += 1
+            if state['written'] % commit_every == 0:
+                partition_store.save_manifest(manifest, store_dir)
+            print(f"PROGRESS: {int((done + state['written']) * 100 / total)}", flush=True)
+
+        try:
+            downloader.download_daily(pro, [d.strftime('%Y%m%d') for d in todo], shutdown_event=shutdown_event,
+                                      on_result=on_result, collect=False, desc="全量历史下载",
+                                      **download_kwargs)
+        finally:
+            # 中断时也提交已写入的分区，下次运行从这里继续
+            if state['written']:
+                partition_store.save_manifest(manifest, store_dir)
+        if state['empty']:
+            print(f"--- 警告: {len(state['empty'])} 个交易日返回空数据: {', '.join(sorted(state['empty'])[:10])} ---",
+                  file=sys.stderr)
+
+    return verify(trade_dates, store_dir)
@@ -0,0 +1,137 @@
+# utils/cassette.py
+# 数据源请求的录制/回放（cassette）：
+#   - record：正常联网，并把每次请求的返回结果按请求键保存为 zstd 压缩的 Arrow (Feather) 文件；
+#   - replay：只从录制文件返回结果，完全不联网；没有录制的请求直接报错；
+#   - once：有录制就回放，没有就联网并录制。
+# 请求键由 (数据源, 接口, 参数) 决定，文件内的 Arrow 元数据记录原始请求，便于排查。
+#
+# 模式取 config.CASSETTE_MODE，可用环境变量覆盖：
+#   DATA_CASSETTE_MODE=replay  DATA_CASSETTE_DIR=cassettes/2025-09-30  python 2_update_daily_data_fully_auto.py
+
+import os
+import json
+import hashlib
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+MODES = ('record', 'replay', 'once')
+META_KEY = b'cassette_request'
+
+_LOCK = threading.Lock()
+
+
+class CassetteMiss(LookupError):
+    """回放模式下请求没有对应的录制"""
+
+
+def mode():
+    """当前模式：None（不启用）、'record'、'replay' 或 'once'"""
+    value = os.getenv('DATA_CASSETTE_MODE')
+    if value is None:
+        try:
+            from config import CASSETTE_MODE as value
+        except ImportError:
+            value = None
+    value = (value or '').strip().lower() or None
+    if value is not None and value not in MODES:
+        raise ValueError(f"未知的 cassette 模式: {value}（可选 {', '.join(MODES)}）")
+    return value
+
+
+def replaying():
+    return mode() == 'replay'
+
+
+def _resolve_dir(cassette_dir=None):
+    if cassette_dir:
+        return cassette_dir
+    if os.getenv('DATA_CASSETTE_DIR'):
+        return os.getenv('DATA_CASSETTE_DIR')
+    from config import CASSETTE_DIR
+    return CASSETTE_DIR
+
+
+def _normalize(value):
+    if isinstance(value, (pd.Timestamp,)):
+        return value.strftime('%Y%m%d')
+    if isinstance(value, (list, tuple, set)):
+        return [_normalize(v) for v in value]
+    return value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+
+
+def request_key(source, endpoint, args=(), kwargs=None):
+    """请求键：可读的请求描述与其哈希"""
+    request = {'source': source, 'endpoint': endpoint, 'args': _normalize(list(args)),
+               'kwargs': {k: _normalize(v) for k, v in sorted((kwargs or {}).items())}}
+    text = json.dumps(request, ensure_ascii=False, sort_keys=True)
+    return request, hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _path(source, endpoint, digest, cassette_dir=None):
+    return os.path.join(_resolve_dir(cassette_dir), source, f"{endpoint}_{digest}.feather")
+
+
+def load(source, endpoint, args=(), kwargs=None, cassette_dir=None):
+    """读取录制的结果，没有录制时返回 None"""
+    _, digest = request_key(source, endpoint, args, kwargs)
+    path = _path(source, endpoint, digest, cassette_dir)
+    if not os.path.exists(path):
+        return None
+    return feather.read_table(path).to_pandas()
+
+
+def save(df, source, endpoint, args=(), kwargs=None, cassette_dir=None):
+    """录制一次请求的结果（只录制 DataFrame）；返回写入的路径，无法录制时返回 None"""
+    if not isinstance(df, pd.DataFrame):
+        return None
+    request, digest = request_key(source, endpoint, args, kwargs)
+    path = _path(source, endpoint, digest, cassette_dir)
+    try:
+        table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        print(f"[WARNING] 无法录制 {source}.{endpoint}: {e}")
+        return None
+    metadata = dict(table.schema.metadata or {})
+    metadata[META_KEY] = json.dumps(request, ensure_ascii=False).encode('utf-8')
+    table = table.replace_schema_metadata(metadata)
+    with _LOCK:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.{threading.get_ident()}"
+        feather.write_feather(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+    return path
+
+
+def cached_call(source, endpoint, func, *args, **kwargs):
+    """
+    按当前模式执行一次数据源请求：
+    不启用时直接调用 func；replay 只读录制；record 调用后录制；once 先读录制，缺失时调用并录制。
+    """
+    current = mode()
+    if current is None:
+        return func(*args, **kwargs)
+    if current in ('replay', 'once'):
+        df = load(source, endpoint, args, kwargs)
+        if df is not None:
+            return df
+        if current == 'replay':
+            request, _ = request_key(source, endpoint, args, kwargs)
+            raise CassetteMiss(f"没有录制的请求: {json.dumps(request, ensure_ascii=False)}")
+    df = func(*args, **kwargs)
+    save(df, source, endpoint, args, kwargs)
+    return df
+
+
+class OfflineClient:
+    """回放模式下代替 SDK 接口对象（如未配置 Token 的 tushare pro），任何实际调用都会报错"""
+
+    def __init__(self, source):
+        self.source = source
+
+    def __getattr__(self, name):
+        def _unavailable(*args, **kwargs):
+            raise CassetteMiss(f"{self.source}.{name} 没有录制，且回放模式下不联网")
+        return _unavailable
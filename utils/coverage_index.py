@@ -0,0 +1,231 @@
+# utils/coverage_index.py
+# 逐只股票的数据覆盖索引：首个交易日、最后交易日、行数以及缺失的交易日区间（缺口）。
+#   - 参照日历为母版中已有分区的交易日（与交易日历核对，日历中有、母版整日缺失的交易日单独列出，
+#     由日常更新按日补齐）；
+#   - 只读取 代码/日期 两列，整列排序后用相邻差值找出缺口，不逐只股票循环；
+#   - 补洞时只按 (代码, 日期区间) 请求缺口，数据源确认没有数据的日期（停牌）记入已确认表，
+#     之后不再视为缺口。
+# 文件：<COVERAGE_DIR>/summary.feather、gaps.feather、confirmed.feather
+
+import os
+import asyncio
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils import partition_store, trade_calendar, security_master, data_sources, downloader
+from utils.schema import tushare_daily_to_master
+
+SUMMARY_FILE = 'summary.feather'
+GAPS_FILE = 'gaps.feather'
+CONFIRMED_FILE = 'confirmed.feather'
+
+
+def _resolve_dir(coverage_dir=None):
+    from config import COVERAGE_DIR
+    return coverage_dir or COVERAGE_DIR
+
+
+def _write(df, path):
+    tmp_path = f"{path}.tmp"
+    df.reset_index(drop=True).to_feather(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_confirmed(coverage_dir=None):
+    """已确认没有数据（停牌等）的 (代码, 日期)"""
+    path = os.path.join(_resolve_dir(coverage_dir), CONFIRMED_FILE)
+    if not os.path.exists(path):
+        return pd.DataFrame({'代码': pd.Series(dtype=object), '日期': pd.Series(dtype='datetime64[ns]')})
+    return pd.read_feather(path)
+
+
+def compute_coverage(frame, days, confirmed=None, active_codes=None):
+    """
+    由 (代码, 日期) 计算覆盖情况。
+    :param frame: 含 代码、日期 两列的数据
+    :param days: 参照交易日（升序 DatetimeIndex）
+    :param confirmed: 已确认没有数据的 (代码, 日期)，视为已覆盖
+    :param active_codes: 仍在交易的股票；给出时只有这些股票会报告尾部缺口（最后交易日之后的缺失）
+    :return: (summary, gaps)
+      summary: 代码、首日、末日、行数、缺失天数
+      gaps:    代码、开始、结束、缺失天数（每行一个连续缺失区间，按交易日计）
+    """
+    days = pd.DatetimeIndex(days)
+    code_values = frame['代码'].astype(str).to_numpy()
+    positions = days.get_indexer(pd.to_datetime(frame['日期']))
+    present = np.ones(len(frame), dtype=bool)
+    if confirmed is not None and len(confirmed):
+        code_values = np.concatenate([code_values, confirmed['代码'].astype(str).to_numpy()])
+        positions = np.concatenate([positions, days.get_indexer(pd.to_datetime(confirmed['日期']))])
+        present = np.concatenate([present, np.zeros(len(confirmed), dtype=bool)])
+    valid = positions >= 0
+    code_ids, codes = pd.factorize(code_values[valid], sort=True)
+    positions, present = positions[valid], present[valid]
+
+    order = np.lexsort((positions, code_ids))
+    code_ids, positions, present = code_ids[order], positions[order], present[order]
+    # 同一 (代码, 日期) 可能同时出现在母版和已确认表中
+    keep = np.r_[True, (code_ids[1:] != code_ids[:-1]) | (positions[1:] != positions[:-1])]
+    code_ids, positions, present = code_ids[keep], positions[keep], present[keep]
+    if not len(code_ids):
+        return (pd.DataFrame(columns=['代码', '首日', '末日', '行数', '缺失天数']),
+                pd.DataFrame(columns=['代码', '开始', '结束', '缺失天数']))
+
+    starts = np.flatnonzero(np.r_[True, code_ids[1:] != code_ids[:-1]])
+    ends = np.r_[starts[1:], len(code_ids)] - 1
+    first, last = positions[starts], positions[ends]
+    rows = np.bincount(code_ids[present], minlength=len(codes))
+
+    # 内部缺口：同一股票相邻两条记录之间隔了不止一个交易日
+    step = np.diff(positions)
+    inner = np.flatnonzero((step > 1) & (code_ids[1:] == code_ids[:-1]))
+    gap_codes = [code_ids[inner]]
+    gap_start, gap_end = [positions[inner] + 1], [positions[inner + 1] - 1]
+
+    # 尾部缺口：最后交易日之后参照日历还有交易日
+    trailing = last < len(days) - 1
+    if active_codes is not None:
+        trailing &= pd.Index(codes).isin(list(active_codes))
+    gap_codes.append(np.flatnonzero(trailing))
+    gap_start.append(last[trailing] + 1)
+    gap_end.append(np.full(int(trailing.sum()), len(days) - 1))
+
+    gap_codes, gap_start, gap_end = (np.concatenate(a).astype(np.int64) for a in (gap_codes, gap_start, gap_end))
+    gaps = pd.DataFrame({'代码': np.asarray(codes, dtype=object)[gap_codes],
+                         '开始': days[gap_start], '结束': days[gap_end],
+                         '缺失天数': gap_end - gap_start + 1})
+    gaps = gaps.sort_values(['代码', '开始']).reset_index(drop=True)
+
+    summary = pd.DataFrame({'代码': np.asarray(codes, dtype=object),
+                            '首日': days[first], '末日': days[last], '行数': rows})
+    missing = gaps.groupby('代码')['缺失天数'].sum()
+    summary['缺失天数'] = summary['代码'].map(missing).fillna(0).astype(np.int64)
+    return summary, gaps
+
+
+def missing_market_days(store_dir=None, calendar=None):
+    """交易日历中有、但母版中整日缺失的交易日（位于母版首末日期之间）"""
+    stored = pd.DatetimeIndex(partition_store.list_partition_dates(store_dir))
+    if stored.empty:
+        return stored
+    calendar = trade_calendar.load_trade_dates() if calendar is None else pd.DatetimeIndex(calendar)
+    in_range = calendar[(calendar >= stored[0]) & (calendar <= stored[-1])]
+    return in_range.difference(stored)
+
+
+def build_coverage(store_dir=None, coverage_dir=None, calendar=None):
+    """重新计算并保存覆盖索引，返回 (summary, gaps)"""
+    days = pd.DatetimeIndex(partition_store.list_partition_dates(store_dir))
+    frame = partition_store.scan_partitions(store_dir, columns=['代码', '日期'], compact=True)
+    master = security_master.load_master()
+    active = set(master['ts_code']) if len(master) else None
+    summary, gaps = compute_coverage(frame, days, load_confirmed(coverage_dir), active)
+
+    coverage_dir = _resolve_dir(coverage_dir)
+    os.makedirs(coverage_dir, exist_ok=True)
+    _write(summary, os.path.join(coverage_dir, SUMMARY_FILE))
+    _write(gaps, os.path.join(coverage_dir, GAPS_FILE))
+
+    market_gaps = missing_market_days(store_dir, calendar)
+    if len(market_gaps):
+        print(f"[WARNING] 母版整日缺失 {len(market_gaps)} 个交易日: "
+              f"{', '.join(d.strftime('%Y-%m-%d') for d in market_gaps[:10])}")
+    return summary, gaps
+
+
+def load_coverage(coverage_dir=None):
+    """读取已保存的覆盖索引；不存在时重新计算"""
+    coverage_dir = _resolve_dir(coverage_dir)
+    summary_path = os.path.join(coverage_dir, SUMMARY_FILE)
+    gaps_path = os.path.join(coverage_dir, GAPS_FILE)
+    if not (os.path.exists(summary_path) and os.path.exists(gaps_path)):
+        return build_coverage(coverage_dir=coverage_dir)
+    return pd.read_feather(summary_path), pd.read_feather(gaps_path)
+
+
+def report(summary, gaps):
+    """打印覆盖情况摘要"""
+    incomplete = summary[summary['缺失天数'] > 0]
+    print(f"--- 覆盖索引: {len(summary)} 只股票，{len(incomplete)} 只存在缺口，"
+          f"共 {len(gaps)} 个缺口 / {int(gaps['缺失天数'].sum())} 个交易日 ---")
+    if len(incomplete):
+        worst = incomplete.sort_values('缺失天数', ascending=False).head(10)
+        print(worst.to_string(index=False))
+
+
+async def _fetch_gaps(gaps, source, bucket, shutdown_event):
+    loop = asyncio.get_running_loop()
+
+    async def fetch(row):
+        # Tushare 按账号限制每分钟调用次数，与按日下载共用同一套令牌桶限流
+        if not await loop.run_in_executor(None, bucket.acquire, shutdown_event):
+            raise downloader.DownloadCancelled(row.代码)
+        return await source.bars_by_code(row.代码, row.开始, row.结束)
+
+    return await asyncio.gather(*[fetch(row) for row in gaps.itertuples(index=False)],
+                                return_exceptions=True)
+
+
+def backfill_gaps(gaps=None, source=None, store_dir=None, coverage_dir=None, max_gaps=None,
+                  shutdown_event=None, bucket=None):
+    """
+    按 (代码, 日期区间) 并发请求缺口数据并并入母版分区。
+    数据源成功返回但缺口中仍没有数据的日期记为已确认（停牌），不再重复请求。
+    :param gaps: 要补的缺口；None 时使用覆盖索引中的全部缺口
+    :param source: 提供 bars_by_code 的数据源，默认 Tushare
+    :param max_gaps: 本次最多补多少个缺口（按缺失天数从多到少）
+    :return: 写入的交易日列表
+    """
+    from config import TUSHARE_CALLS_PER_MINUTE
+    if gaps is None:
+        _, gaps = load_coverage(coverage_dir)
+    if gaps.empty:
+        print("--- 没有需要补齐的缺口 ---")
+        return []
+    if max_gaps is not None:
+        gaps = gaps.sort_values('缺失天数', ascending=False).head(max_gaps)
+    source = source or data_sources.tushare_source()
+    bucket = bucket or downloader.TokenBucket(TUSHARE_CALLS_PER_MINUTE)
+    shutdown_event = shutdown_event or threading.Event()
+    days = pd.DatetimeIndex(partition_store.list_partition_dates(store_dir))
+
+    print(f"--- 开始补齐 {len(gaps)} 个缺口（{gaps['代码'].nunique()} 只股票）... ---")
+    results = data_sources.run(_fetch_gaps(gaps, source, bucket, shutdown_event))
+
+    filled, confirmed, failed = [], [], 0
+    for row, result in zip(gaps.itertuples(index=False), results):
+        try:
+            if isinstance(result, BaseException):
+                raise result
+            rows = tushare_daily_to_master(result) if len(result) else pd.DataFrame(columns=['代码', '日期'])
+        except Exception as e:
+            failed += 1
+            print(f"[WARNING] 补齐 {row.代码} {row.开始:%Y-%m-%d}~{row.结束:%Y-%m-%d} 失败: {e}")
+            continue
+        wanted = days[(days >= row.开始) & (days <= row.结束)]
+        rows['日期'] = pd.to_datetime(rows['日期'])
+        rows = rows[rows['日期'].isin(wanted)]
+        filled.append(rows)
+        absent = wanted.difference(pd.DatetimeIndex(rows['日期']))
+        confirmed.append(pd.DataFrame({'代码': row.代码, '日期': absent}))
+
+    written = []
+    filled = [df for df in filled if len(df)]
+    if filled:
+        written = partition_store.merge_partitions(pd.concat(filled, ignore_index=True), store_dir)
+    confirmed = [df for df in confirmed if len(df)]
+    if confirmed:
+        coverage_dir = _resolve_dir(coverage_dir)
+        os.makedirs(coverage_dir, exist_ok=True)
+        all_confirmed = pd.concat([load_confirmed(coverage_dir)] + confirmed, ignore_index=True)
+        all_confirmed = all_confirmed.drop_duplicates(['代码', '日期']).sort_values(['代码', '日期'])
+        _write(all_confirmed, os.path.join(coverage_dir, CONFIRMED_FILE))
+
+    n_rows = sum(len(df) for df in filled)
+    n_confirmed = sum(len(df) for df in confirmed)
+    print(f"--- 补齐完成: 写入 {n_rows} 行（{len(written)} 个交易日分区），"
+          f"确认停牌 {n_confirmed} 个股票日，失败 {failed} 个缺口 ---")
+    build_coverage(store_dir, coverage_dir)
+    return written
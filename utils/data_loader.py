@@ -1,166 +1,171 @@
 # utils/data_loader.py
 
 import pandas as pd
+import pyarrow.dataset as ds
 import os
 from datetime import datetime
-import akshare as ak
-from config import MIN_INTERVAL, MAX_INTERVAL
-import time
-
-
-def load_clean_hist_data(file_path=None):
-    """加载并清洗历史行情数据"""
+from utils import partition_store, snapshot_cache, snapshot_recorder, security_master, data_sources, data_quality
+from utils.schema import compact_enabled, compact_frame
+
+
+def _scan_master_file(file_path, codes=None, start=None, end=None, columns=None, last_n_days=None):
+    """对单文件母版做同样的谓词/投影下推扫描"""
+    dataset = ds.dataset(file_path, format='feather')
+    date_field = ds.field('日期')
+    row_filter = None
+    if start is not None:
+        row_filter = date_field >= pd.Timestamp(start)
+    if end is not None:
+        cond = date_field <= pd.Timestamp(end)
+        row_filter = cond if row_filter is None else row_filter & cond
+    if last_n_days is not None:
+        dates = dataset.to_table(columns=['日期'], filter=row_filter).column('日期').unique().to_pandas()
+        dates = dates.sort_values()
+        if len(dates) > last_n_days:
+            cond = date_field >= dates.iloc[-int(last_n_days)]
+            row_filter = cond if row_filter is None else row_filter & cond
+    if codes is not None:
+        cond = ds.field('代码').isin(list(codes))
+        row_filter = cond if row_filter is None else row_filter & cond
+    if columns is not None:
+        columns = [c for c in columns if c in dataset.schema.names]
+    return dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+
+
+def load_clean_hist_data(file_path=None, codes=None, start=None, end=None, columns=None,
+                         last_n_days=None, compact=None):
+    """
+    加载并清洗历史行情数据（优先读取日期分区存储，其次读取单文件母版）。
+    过滤条件在读取阶段下推，不需要的分区、行和列不会被解码。
+    :param codes: 只加载这些股票（如 '000001.SZ' 或 '000001'）
+    :param start: 起始日期（含）
+    :param end: 结束日期（含）
+    :param columns: 只加载这些列（代码、日期 总会被加载）
+    :param last_n_days: 只加载全市场最近 N 个交易日（按交易日分区计，不是每只股票的最近 N 根K线；
+                        停牌或新上市的股票在此范围内少于 N 根，需要按股票取根数时再 groupby('代码').tail(n)）
+    :param compact: 是否使用紧凑类型（代码为 category、价格为 float32），None 时取 config.COMPACT_SCHEMA
+    """
     from config import MASTER_DATA_FILE
-    file_path = file_path or MASTER_DATA_FILE
-
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"找不到母版数据文件 {file_path}")
-    df = pd.read_feather(file_path)
+    compact = compact_enabled() if compact is None else compact
+    if columns is not None:
+        columns = ['代码', '日期'] + [c for c in columns if c not in ('代码', '日期')]
+    if codes is not None:
+        # 同时匹配带后缀与不带后缀的写法
+        codes = security_master.normalize_codes(pd.Series(list(codes)))
+        codes = set(codes) | set(codes.str[:6])
+
+    if file_path is None and partition_store.store_exists():
+        df = partition_store.scan_partitions(codes=codes, start=start, end=end, columns=columns,
+                                             last_n_days=last_n_days, compact=compact)
+    else:
+        file_path = file_path or MASTER_DATA_FILE
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"找不到母版数据文件 {file_path}")
+        df = _scan_master_file(file_path, codes, start, end, columns, last_n_days)
     df['日期'] = pd.to_datetime(df['日期'], errors='coerce')
-    df['代码'] = df['代码'].astype(str).apply(
-        lambda x: x if '.' in x else (f"{x}.SZ" if x.startswith(('0','3')) else f"{x}.SH")
-    )
-    df['涨跌幅'] = pd.to_numeric(df['涨跌幅'], errors='coerce')
+    if compact:
+        compact_frame(df)
+    # 代码规范化按去重后的代码（或类别）批量处理，而非逐行处理
+    df['代码'] = security_master.normalize_codes(df['代码'])
+    if '涨跌幅' in df.columns:
+        df['涨跌幅'] = pd.to_numeric(df['涨跌幅'], errors='coerce')
     # 历史数据已为股单位，无需转换
     # if '成交量' in df.columns:
     #     df['成交量'] = df['成交量'] * 100
     return df
 
 
+def _fetch_snapshot_once(retries=None):
+    """通过数据源层获取全市场快照（含超时与退避重试）并清洗为统一字段（成交量单位：股）"""
+    print("[INFO] 正在获取实时行情快照...")
+    df = data_sources.run(data_sources.akshare_source().snapshot(retries=retries))
+    print(f"[DEBUG] API返回的列: {df.columns.tolist()}")  # 调试API列名
+
+    column_mapping = {
+        '代码': ['代码', 'symbol'],
+        '名称': ['名称', 'name'],
+        '开盘': ['今开', '开盘', 'open'],
+        '收盘': ['最新价', 'price', 'close'],
+        '最高': ['最高', 'high'],
+        '最低': ['最低', 'low'],
+        '成交量': ['成交量', 'volume'],
+        '成交额': ['成交额', 'amount'],
+        '涨跌幅': ['涨跌幅', 'changepercent']
+    }
+
+    actual_columns = {}
+    for target, candidates in column_mapping.items():
+        for col in candidates:
+            if col in df.columns:
+                actual_columns[col] = target
+                break
+
+    df = df[list(actual_columns.keys())].copy()
+    df.rename(columns=actual_columns, inplace=True)
+
+    # 按交易日历确定快照所属交易日（节假日、盘前取上一交易日）
+    df['日期'] = snapshot_cache.snapshot_trade_date()
+    print(f"[DEBUG] 生成的日期: {df['日期'].iloc[0]}")
+    df['代码'] = security_master.normalize_codes(df['代码'])
+
+    # ✅ 将“手”转为“股”（接口固定返回手，缓存中统一存股）
+    if '成交量' in df.columns:
+        df['成交量'] = pd.to_numeric(df['成交量'], errors='coerce') * 100
+        if df['成交量'].isna().all():
+            print("[WARNING] 成交量数据为空或无效")
+        else:
+            # 用隐含价格比核对单位：成交额 /（成交量 × 最新价）应接近 1
+            ratio = data_quality.compute_daily_stats(df)['隐含价格比'].iloc[0]
+            if pd.notna(ratio) and not 0.1 < ratio < 10:
+                print(f"[WARNING] 快照成交量/成交额单位异常（隐含价格比 {ratio:.4g}），接口返回的单位可能已变化")
+
+    return df[snapshot_cache.SNAPSHOT_COLUMNS].copy()
+
+
 def get_clean_snapshot_data(cache_file=None, force_refresh=False, max_retries=3):
-    """获取并清洗实时快照行情（带缓存机制）"""
-    # 使用用户检查的CSV文件路径
-    cache_file = cache_file or 'snapshot_cache.csv'
-    # 强制刷新缓存以确保获取最新数据
-    force_refresh = True  # [TEMP] 临时强制刷新缓存
-    # 临时强制刷新缓存以获取最新数据并应用单位转换
-    force_refresh = True
-
-    now = datetime.now()
-    today = pd.to_datetime(now)
-    is_market_closed = now.hour >= 15 and now.minute >= 5
-    cache_duration_minutes = 12 * 60 if is_market_closed else 2  # 缓存时间（分钟）
-
-    # ✅ 强制刷新逻辑（调试时建议开启）
-    if not force_refresh and os.path.exists(cache_file):
-        try:
-            df = pd.read_csv(cache_file)
-            cache_time = pd.to_datetime(df['日期'].iloc[0])
-            if (now - cache_time).total_seconds() / 60 < cache_duration_minutes:
-                print(f"[SUCCESS] 使用缓存快照数据（时间：{cache_time}）")
-                # 检查并转换缓存数据的成交量单位
-                if '成交量' in df.columns:
-                    median_volume = df['成交量'].median()
-                    if median_volume < 1000 and median_volume > 0:
-                        df['成交量'] = df['成交量'] * 100
-                        print(f"[DEBUG] 缓存数据转换: {median_volume} → {median_volume*100} (手→股)")
-                    else:
-                        print(f"[DEBUG] 缓存成交量样本: {df['成交量'].iloc[0]}")
-                return df[['代码', '日期', '开盘', '收盘', '最高', '最低', '成交量', '成交额', '涨跌幅']]
-        except Exception as e:
-            print(f"[WARNING] 缓存读取失败: {e}")
-
-    # 开始请求新快照
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            print("[INFO] 正在获取实时行情快照...")
-            df = ak.stock_zh_a_spot_em()
-            print(f"[DEBUG] API返回的列: {df.columns.tolist()}")  # 调试API列名
-            # 移动到日期设置后打印
-            pass
-            if df.empty:
-                raise Exception("空数据")
-
-            column_mapping = {
-                '代码': ['代码', 'symbol'],
-                '名称': ['名称', 'name'],
-                '开盘': ['今开', '开盘', 'open'],
-                '收盘': ['最新价', 'price', 'close'],
-                '最高': ['最高', 'high'],
-                '最低': ['最低', 'low'],
-                '成交量': ['成交量', 'volume'],
-                '成交额': ['成交额', 'amount'],
-                '涨跌幅': ['涨跌幅', 'changepercent']
-            }
-
-            actual_columns = {}
-            for target, candidates in column_mapping.items():
-                for col in candidates:
-                    if col in df.columns:
-                        actual_columns[col] = target
-                        break
-
-            df = df[list(actual_columns.keys())].copy()
-            df.rename(columns=actual_columns, inplace=True)
-
-            # ✅ 设置精确到秒的时间戳
-            # 根据当前时间设置正确的交易日期
-            now = datetime.now()
-            print(f"[DEBUG] 当前系统日期: {now.date()}")
-            # 改进的交易日期判断逻辑
-            current_hour = now.hour
-            current_minute = now.minute
-            is_weekday = now.weekday() < 5  # 周一至周五
-            market_started = current_hour > 9 or (current_hour == 9 and current_minute >= 30)
-            market_closed = current_hour >= 15
-
-            if is_weekday:
-                # 工作日无论是否交易时间均使用当天日期
-                df['日期'] = pd.to_datetime(now.date())
-            else:
-                # 非交易时间/周末/节假日使用前一个交易日
-                offset = 1
-                while True:
-                    prev_date = now - pd.Timedelta(days=offset)
-                    if prev_date.weekday() < 5:  # 跳过周末
-                        df['日期'] = pd.to_datetime(prev_date.date())
-                        break
-                    offset += 1
-            print(f"[DEBUG] 生成的日期: {df['日期'].iloc[0]}")
-            df['代码'] = df['代码'].astype(str).apply(lambda x: f"{x}.SZ" if x.startswith(('0','3')) else f"{x}.SH")
-
-            # ✅ 将“手”转为“股”
-            if '成交量' in df.columns:
-                # 固定单位转换：手→股
-                original_volume = df['成交量'].copy()
-                df['成交量'] = pd.to_numeric(df['成交量'], errors='coerce')
-                df['成交量'] = df['成交量'] * 100  # 确保从手转换为股
-                
-                # 添加转换验证
-                if not df['成交量'].isna().all():
-                    print(f"[DEBUG] 成交量转换: {original_volume.iloc[0]} → {df['成交量'].iloc[0]}")
-                else:
-                    print("[WARNING] 成交量数据为空或无效")
-
-            # ✅ 返回更多字段支持 K 线图绘制
-            df = df[['代码', '日期', '开盘', '收盘', '最高', '最低', '成交量', '成交额', '涨跌幅']].copy()
-            df.to_csv(cache_file, index=False)
-            print(f"[CACHE] 快照已缓存到 {cache_file}")
-            # 打印缓存数据样本以验证日期
-            print(f"[DEBUG] 缓存数据日期样本: {df['日期'].unique()[:5]}")
+    """
+    获取并清洗实时快照行情（带交易时段感知的缓存）
+    :param cache_file: 缓存文件路径，None 时取 config.SNAPSHOT_FILE
+    :param force_refresh: 忽略缓存强制请求
+    """
+    replayer = snapshot_recorder.active_replayer()
+    if replayer is not None:
+        df = replayer.current()
+        print(f"[REPLAY] 使用录制快照（模拟时间：{replayer.now():%Y-%m-%d %H:%M:%S}）")
+        return df
+
+    if not force_refresh:
+        df, fetched_at = snapshot_cache.read_snapshot(cache_file)
+        if df is not None:
+            print(f"[SUCCESS] 使用缓存快照数据（时间：{fetched_at}）")
             return df
 
-        except Exception as e:
-            print(f"[ERROR] 第 {attempt+1} 次获取失败: {e}")
-            time.sleep(min(MIN_INTERVAL * (2 ** attempt), MAX_INTERVAL))
-            attempt += 1
+    try:
+        with snapshot_cache.cache_lock(cache_file):
+            # 等待锁期间其他进程可能已经刷新了缓存
+            if not force_refresh:
+                df, fetched_at = snapshot_cache.read_snapshot(cache_file)
+                if df is not None:
+                    print(f"[SUCCESS] 使用其他进程刚刷新的快照（时间：{fetched_at}）")
+                    return df
+
+            try:
+                fetched_at = datetime.now()
+                df = _fetch_snapshot_once(retries=max_retries - 1)
+                snapshot_cache.write_snapshot(df, cache_file, fetched_at=fetched_at)
+                if snapshot_recorder.recording_enabled():
+                    snapshot_recorder.record_snapshot(df, fetched_at)
+                print(f"[CACHE] 快照已缓存，有效期至 {snapshot_cache.snapshot_expiry(fetched_at)}")
+                return df
+            except Exception as e:
+                print(f"[ERROR] 获取快照失败: {e}")
+    except TimeoutError as e:
+        print(f"[WARNING] {e}")
 
     print("🚫 达到最大重试次数，跳过本次快照获取")
-    # 尝试使用缓存数据
-    if os.path.exists(cache_file):
-        try:
-            df = pd.read_csv(cache_file)
-            print(f"[SUCCESS] 使用缓存快照数据")
-            # 检查并转换缓存数据的成交量单位
-            if '成交量' in df.columns:
-                median_volume = df['成交量'].median()
-                if median_volume < 1000 and median_volume > 0:
-                    df['成交量'] = df['成交量'] * 100
-                    print(f"[DEBUG] 缓存数据转换: {median_volume} → {median_volume*100} (手→股)")
-                else:
-                    print(f"[DEBUG] 缓存成交量样本: {df['成交量'].iloc[0]}")
-            return df[['代码', '日期', '开盘', '收盘', '最高', '最低', '成交量', '成交额', '涨跌幅']]
-        except Exception as e:
-            print(f"[ERROR] 缓存数据读取失败: {e}")
-    return None
\ No newline at end of file
+    # 尝试使用（可能已过期的）缓存数据
+    df, fetched_at = snapshot_cache.read_snapshot(cache_file, allow_stale=True)
+    if df is not None:
+        print(f"[SUCCESS] 使用缓存快照数据（时间：{fetched_at}，已过期）")
+        return df
+    return None
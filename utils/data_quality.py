@@ -0,0 +1,183 @@
+# utils/data_quality.py
+# 母版数据质量检查：按交易日计算截面统计（一次向量化 groupby），与此前若干交易日的基准比较。
+#   - 行数：明显少于基准时标记“缺失股票”；
+#   - 单位：成交额 /（成交量 × 收盘）的中位数应接近 1（成交量为股、成交额为元），
+#     偏离 10 的整数次幂即为单位错误（如成交量存成了手）；再按成交量、成交额各自相对基准的偏移
+#     判断是哪一列出错；
+#   - OHLC：最高价低于开/收/最低价、最低价高于开/收价或价格非正的行。
+# 每日统计保存在 DATA_QUALITY_FILE 中，日常更新只计算新写入的交易日。
+# 单位错误可自动修复：只改写出错交易日的分区。
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import partition_store
+
+STAT_COLUMNS = ['日期', '行数', '缺失值行数', 'OHLC异常行数', '成交量中位数', '成交额中位数', '隐含价格比']
+READ_COLUMNS = ['代码', '日期', '开盘', '收盘', '最高', '最低', '成交量', '成交额']
+
+BASELINE_WINDOW = 20        # 基准：此前最多 20 个交易日的中位数
+MIN_BASELINE = 3            # 基准至少需要的交易日数
+ROW_COUNT_RATIO = 0.9       # 行数低于基准的 90% 视为缺失股票
+UNIT_LOG_THRESHOLD = 1.0    # 隐含价格比偏离 1 超过 10 倍视为单位错误
+BAD_ROW_FRACTION = 0.005    # OHLC 异常或缺失值的行超过 0.5% 时标记
+
+
+def _resolve_file(stats_file=None):
+    from config import DATA_QUALITY_FILE
+    return stats_file or DATA_QUALITY_FILE
+
+
+def compute_daily_stats(df):
+    """按交易日计算截面统计，返回 STAT_COLUMNS 各列（每个交易日一行）"""
+    prices = df[['开盘', '收盘', '最高', '最低']].apply(pd.to_numeric, errors='coerce')
+    volume = pd.to_numeric(df['成交量'], errors='coerce')
+    amount = pd.to_numeric(df['成交额'], errors='coerce')
+    open_, close, high, low = (prices[c].to_numpy() for c in ('开盘', '收盘', '最高', '最低'))
+
+    missing = prices.isna().any(axis=1).to_numpy() | volume.isna().to_numpy() | amount.isna().to_numpy()
+    with np.errstate(invalid='ignore'):
+        bad_ohlc = ((high < np.maximum(open_, close)) | (low > np.minimum(open_, close)) | (low > high) |
+                    (np.fmin(np.fmin(open_, close), np.fmin(high, low)) <= 0))
+    # 停牌或无成交的行不参与单位判断
+    traded = (volume > 0).to_numpy() & (close > 0)
+    implied = np.where(traded, amount.to_numpy() / np.where(traded, volume.to_numpy() * close, 1), np.nan)
+
+    work = pd.DataFrame({
+        '日期': pd.to_datetime(df['日期']).to_numpy(),
+        '缺失值行数': missing,
+        'OHLC异常行数': bad_ohlc & ~missing,
+        '成交量中位数': volume.where(traded).to_numpy(),
+        '成交额中位数': amount.where(traded).to_numpy(),
+        '隐含价格比': implied,
+    })
+    grouped = work.groupby('日期', sort=True)
+    stats = grouped.agg({'缺失值行数': 'sum', 'OHLC异常行数': 'sum', '成交量中位数': 'median',
+                         '成交额中位数': 'median', '隐含价格比': 'median'})
+    stats.insert(0, '行数', grouped.size())
+    return stats.reset_index()[STAT_COLUMNS]
+
+
+def flag_anomalies(stats):
+    """
+    与此前交易日的基准比较，给每个交易日标注问题。
+    新增列：行数比、成交量偏移、成交额偏移（log10）、单位因子、出错列、问题。
+    """
+    stats = stats.sort_values('日期').reset_index(drop=True)
+
+    def baseline(col):
+        return stats[col].shift(1).rolling(BASELINE_WINDOW, min_periods=MIN_BASELINE).median()
+
+    stats['行数比'] = stats['行数'] / baseline('行数')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats['成交量偏移'] = np.log10(stats['成交量中位数'] / baseline('成交量中位数'))
+        stats['成交额偏移'] = np.log10(stats['成交额中位数'] / baseline('成交额中位数'))
+        price_log = np.log10(stats['隐含价格比'])
+
+    unit_error = price_log.abs() >= UNIT_LOG_THRESHOLD
+    stats['单位因子'] = np.where(unit_error, 10.0 ** price_log.round(), 1.0)
+    # 隐含价格比偏大：成交量偏小或成交额偏大，取相对基准偏移更明显的一列；无基准时默认成交量
+    amount_worse = (stats['成交额偏移'].abs() > stats['成交量偏移'].abs()).fillna(False)
+    stats['出错列'] = np.where(unit_error, np.where(amount_worse, '成交额', '成交量'), '')
+
+    problems = pd.DataFrame({
+        '单位错误': unit_error,
+        '缺失股票': (stats['行数比'] < ROW_COUNT_RATIO).fillna(False),
+        'OHLC异常': stats['OHLC异常行数'] > stats['行数'] * BAD_ROW_FRACTION,
+        '缺失值': stats['缺失值行数'] > stats['行数'] * BAD_ROW_FRACTION,
+    })
+    labels = problems.columns.to_numpy()
+    stats['问题'] = ['、'.join(labels[mask]) for mask in problems.to_numpy(dtype=bool)]
+    return stats
+
+
+def load_stats(stats_file=None):
+    path = _resolve_file(stats_file)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=STAT_COLUMNS)
+    return pd.read_feather(path)
+
+
+def _save_stats(stats, stats_file=None):
+    path = _resolve_file(stats_file)
+    tmp_path = f"{path}.tmp"
+    stats[STAT_COLUMNS].reset_index(drop=True).to_feather(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def update_stats(dates=None, store_dir=None, stats_file=None):
+    """
+    重新计算指定交易日（None 表示全部）的统计并并入统计表。
+    统计表中缺少的交易日也一并计算，基准始终完整。
+    :return: 全部交易日的统计（已标注问题）
+    """
+    stored = partition_store.list_partition_dates(store_dir)
+    stats = load_stats(stats_file)
+    known = set(pd.to_datetime(stats['日期'])) if len(stats) else set()
+    wanted = set(stored) if dates is None else set(pd.to_datetime(list(dates)))
+    todo = sorted((wanted | (set(stored) - known)) & set(stored))
+    if todo:
+        df = partition_store.read_partitions(store_dir, dates=todo, columns=READ_COLUMNS, compact=False)
+        fresh = compute_daily_stats(df)
+        stats = stats[~pd.to_datetime(stats['日期']).isin(todo)] if len(stats) else stats
+        stats = pd.concat([stats, fresh], ignore_index=True) if len(stats) else fresh
+        # 已不在母版中的交易日不再保留
+        stats = stats[pd.to_datetime(stats['日期']).isin(stored)].sort_values('日期')
+        _save_stats(stats, stats_file)
+    return flag_anomalies(stats)
+
+
+def report(flagged):
+    """打印有问题的交易日"""
+    bad = flagged[flagged['问题'] != '']
+    if bad.empty:
+        print(f"--- 数据质量检查通过（{len(flagged)} 个交易日） ---")
+        return
+    print(f"!!! 数据质量检查发现 {len(bad)} 个有问题的交易日:")
+    columns = ['日期', '行数', '行数比', '隐含价格比', '单位因子', '出错列', 'OHLC异常行数', '问题']
+    print(bad[columns].to_string(index=False))
+
+
+def repair_units(trade_date, column, factor, store_dir=None, stats_file=None):
+    """
+    修复某个交易日分区的单位错误：成交量乘以 factor，或成交额除以 factor。
+    只改写该交易日的分区。
+    """
+    trade_date = pd.Timestamp(trade_date).normalize()
+    df = partition_store.read_partitions(store_dir, dates=[trade_date], compact=False)
+    if df.empty:
+        raise ValueError(f"母版中没有 {trade_date.date()} 的分区")
+    if column == '成交量':
+        df['成交量'] = pd.to_numeric(df['成交量'], errors='coerce') * factor
+    elif column == '成交额':
+        df['成交额'] = pd.to_numeric(df['成交额'], errors='coerce') / factor
+    else:
+        raise ValueError(f"不支持修复的列: {column}")
+    partition_store.write_partition(trade_date, df, store_dir)
+    update_stats([trade_date], store_dir, stats_file)
+    print(f"--- 已修复 {trade_date.date()} 的{column}（{'×' if column == '成交量' else '÷'}{factor:g}），只改写该日分区 ---")
+
+
+def check_after_update(written_dates, auto_repair=None, store_dir=None, stats_file=None):
+    """
+    更新后检查新写入的交易日；开启自动修复时修复其中的单位错误。
+    :return: 被修复的交易日列表（派生存储需随之刷新）
+    """
+    if auto_repair is None:
+        from config import DATA_QUALITY_AUTO_REPAIR
+        auto_repair = DATA_QUALITY_AUTO_REPAIR
+    written = pd.DatetimeIndex(pd.to_datetime(list([] if written_dates is None else written_dates)))
+    if written.empty:
+        return []
+    flagged = update_stats(written, store_dir, stats_file)
+    flagged = flagged[flagged['日期'].isin(written)]
+    report(flagged)
+
+    repaired = []
+    if auto_repair:
+        for row in flagged[flagged['单位因子'] != 1.0].itertuples(index=False):
+            repair_units(row.日期, row.出错列, row.单位因子, store_dir, stats_file)
+            repaired.append(pd.Timestamp(row.日期))
+    return repaired
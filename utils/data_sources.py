@@ -0,0 +1,211 @@
+# utils/data_sources.py
+# 异步数据源层：akshare / tushare 的网络调用统一通过这里发起。
+#   - 统一接口：snapshot()、trade_calendar()、daily_by_date()、bars_by_code()；
+#   - 阻塞的 SDK 调用放到共享线程池中执行，线程（及其 HTTP 连接）在多次调用间复用；
+#   - 每个数据源有独立的并发上限、超时和退避重试（MIN_INTERVAL/MAX_INTERVAL/MAX_RETRIES）；
+#   - gather() 让互不依赖的获取（如交易日历与快照、本地历史与快照）同时进行。
+#
+# 脚本中用 run(coro) 执行单个请求，用 gather(...) 并发执行多个请求或阻塞函数。
+# 每次 SDK 调用都经过 cassette.cached_call()，可录制响应或离线回放（见 utils/cassette.py）。
+
+import os
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils import cassette
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+_SOURCES = {}
+
+
+def _executor():
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            from config import DATA_SOURCE_THREADS
+            _EXECUTOR = ThreadPoolExecutor(max_workers=DATA_SOURCE_THREADS, thread_name_prefix='data-source')
+        return _EXECUTOR
+
+
+class DataSource:
+    """数据源基类：子类实现四个接口中自己支持的部分，网络调用统一经过 _call()"""
+
+    name = 'base'
+
+    def __init__(self, max_concurrency=None, timeout=None, max_retries=None,
+                 min_interval=None, max_interval=None):
+        from config import (MIN_INTERVAL, MAX_INTERVAL, MAX_RETRIES,
+                            DATA_SOURCE_CONCURRENCY, DATA_SOURCE_TIMEOUT)
+        self.max_concurrency = max_concurrency or DATA_SOURCE_CONCURRENCY.get(self.name, 2)
+        self.timeout = DATA_SOURCE_TIMEOUT if timeout is None else timeout
+        self.max_retries = MAX_RETRIES if max_retries is None else max_retries
+        self.min_interval = MIN_INTERVAL if min_interval is None else min_interval
+        self.max_interval = MAX_INTERVAL if max_interval is None else max_interval
+        # asyncio.Semaphore 绑定事件循环，每个循环各建一个
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    async def _call(self, what, func, *args, retries=None, **kwargs):
+        """
+        在线程池中执行阻塞调用：受并发上限约束，超时视为失败，失败后退避重试。
+        回放模式下没有录制的请求立即失败，不重试。
+        :param retries: 本次调用的重试次数，None 时取 max_retries
+        """
+        retries = 0 if cassette.replaying() else (self.max_retries if retries is None else retries)
+        call = functools.partial(cassette.cached_call, self.name, what, func, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        for attempt in range(retries + 1):
+            async with self._semaphore():
+                try:
+                    return await asyncio.wait_for(
+                        loop.run_in_executor(_executor(), call),
+                        self.timeout)
+                except Exception as e:
+                    if attempt >= retries:
+                        raise
+                    reason = f"超时（{self.timeout} 秒）" if isinstance(e, asyncio.TimeoutError) else e
+                    delay = min(self.min_interval * (2 ** attempt), self.max_interval)
+                    print(f"[WARNING] {self.name}.{what} 第 {attempt + 1} 次失败: {reason}，{delay} 秒后重试")
+            await asyncio.sleep(delay)
+
+    async def snapshot(self, retries=None):
+        """全市场实时快照（原始列名）"""
+        raise NotImplementedError(f"{self.name} 不支持 snapshot")
+
+    async def trade_calendar(self, retries=None):
+        """交易日历（升序 DatetimeIndex）"""
+        raise NotImplementedError(f"{self.name} 不支持 trade_calendar")
+
+    async def daily_by_date(self, trade_date, retries=None):
+        """某个交易日的全市场日线（Tushare daily 格式）"""
+        raise NotImplementedError(f"{self.name} 不支持 daily_by_date")
+
+    async def bars_by_code(self, code, start, end, retries=None):
+        """单只股票在 [start, end] 内的日线（Tushare daily 格式）"""
+        raise NotImplementedError(f"{self.name} 不支持 bars_by_code")
+
+
+def _yyyymmdd(day):
+    return pd.Timestamp(day).strftime('%Y%m%d')
+
+
+class AkshareSource(DataSource):
+    name = 'akshare'
+
+    # stock_zh_a_hist 列名 -> Tushare daily 列名
+    HIST_COLUMNS = {'日期': 'trade_date', '开盘': 'open', '最高': 'high', '最低': 'low', '收盘': 'close',
+                    '涨跌额': 'change', '涨跌幅': 'pct_chg', '成交量': 'vol', '成交额': 'amount'}
+
+    @property
+    def ak(self):
+        """akshare 模块；回放模式下请求都由录制应答，不需要安装 akshare"""
+        if cassette.replaying():
+            return cassette.OfflineClient(self.name)
+        import akshare
+        return akshare
+
+    async def snapshot(self, retries=None):
+        df = await self._call('snapshot', self.ak.stock_zh_a_spot_em, retries=retries)
+        if df is None or df.empty:
+            raise ValueError("空数据")
+        return df
+
+    async def trade_calendar(self, retries=None):
+        df = await self._call('trade_calendar', self.ak.tool_trade_date_hist_sina, retries=retries)
+        return pd.DatetimeIndex(pd.to_datetime(df['trade_date'])).normalize().sort_values().unique()
+
+    async def bars_by_code(self, code, start, end, retries=None):
+        from utils import security_master
+        ts_code = security_master.normalize_codes([code])[0]
+        df = await self._call('bars_by_code', self.ak.stock_zh_a_hist, symbol=ts_code[:6], period='daily',
+                              start_date=_yyyymmdd(start), end_date=_yyyymmdd(end), adjust='',
+                              retries=retries)
+        df = df.rename(columns=self.HIST_COLUMNS)
+        df['ts_code'] = ts_code
+        df['trade_date'] = pd.to_datetime(df['trade_date']).dt.strftime('%Y%m%d')
+        # akshare 成交额单位为元，Tushare 为千元
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce') / 1000
+        return df[['ts_code'] + list(self.HIST_COLUMNS.values())]
+
+
+class TushareSource(DataSource):
+    name = 'tushare'
+
+    def __init__(self, pro=None, **kwargs):
+        super().__init__(**kwargs)
+        self._pro = pro
+
+    @property
+    def pro(self):
+        if self._pro is None:
+            token = os.getenv('TUSHARE_TOKEN')
+            if not token and cassette.replaying():
+                return cassette.OfflineClient(self.name)
+            import tushare as ts
+            if not token:
+                raise RuntimeError("未在环境变量中找到Tushare Token")
+            ts.set_token(token)
+            self._pro = ts.pro_api()
+        return self._pro
+
+    async def trade_calendar(self, retries=None):
+        df = await self._call('trade_calendar', self.pro.trade_cal, exchange='SSE', is_open='1',
+                              retries=retries)
+        return pd.DatetimeIndex(pd.to_datetime(df['cal_date'])).normalize().sort_values().unique()
+
+    async def daily_by_date(self, trade_date, retries=None):
+        return await self._call('daily_by_date', self.pro.daily, trade_date=_yyyymmdd(trade_date),
+                                retries=retries)
+
+    async def bars_by_code(self, code, start, end, retries=None):
+        from utils import security_master
+        ts_code = security_master.normalize_codes([code])[0]
+        df = await self._call('bars_by_code', self.pro.daily, ts_code=ts_code,
+                              start_date=_yyyymmdd(start), end_date=_yyyymmdd(end), retries=retries)
+        return df.sort_values('trade_date').reset_index(drop=True)
+
+
+def akshare_source():
+    """进程内共享的 akshare 数据源"""
+    if 'akshare' not in _SOURCES:
+        _SOURCES['akshare'] = AkshareSource()
+    return _SOURCES['akshare']
+
+
+def tushare_source(pro=None):
+    """进程内共享的 tushare 数据源；传入 pro 时使用该接口对象"""
+    if 'tushare' not in _SOURCES or (pro is not None and _SOURCES['tushare']._pro is not pro):
+        _SOURCES['tushare'] = TushareSource(pro)
+    return _SOURCES['tushare']
+
+
+def run(coro):
+    """在新的事件循环中执行一个协程（供同步脚本调用）"""
+    return asyncio.run(coro)
+
+
+async def _gather(tasks, return_exceptions):
+    loop = asyncio.get_running_loop()
+    # 阻塞函数放在循环自带的线程池中，避免与数据源调用争用同一个线程池
+    awaitables = [task if asyncio.iscoroutine(task) else loop.run_in_executor(None, task)
+                  for task in tasks]
+    return await asyncio.gather(*awaitables, return_exceptions=return_exceptions)
+
+
+def gather(*tasks, return_exceptions=False):
+    """
+    并发执行多个协程或无参阻塞函数，按传入顺序返回结果。
+    例：hist, snapshot = gather(lambda: load_clean_hist_data(...), get_clean_snapshot_data)
+    """
+    return run(_gather(tasks, return_exceptions))
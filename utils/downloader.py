@@ -0,0 +1,164 @@
+# utils/downloader.py
+# 限速的并发下载：有界线程池 + 令牌桶限流（遵守 Tushare 每分钟调用配额），
+# 失败时按 MIN_INTERVAL * 2^n（不超过 MAX_INTERVAL）退避重试，最多 MAX_RETRIES 次。
+# 触发配额限制时整个桶暂停一段时间，所有线程一起放慢。
+# 通过 shutdown_event 支持优雅中断：正在等待令牌或退避的任务会立即放弃。
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+from utils import cassette
+
+# Tushare 超出频次限制时的报错关键字
+RATE_LIMIT_MARKERS = ('每分钟最多访问', '每小时最多访问', '频率', 'rate limit')
+
+
+class DownloadCancelled(Exception):
+    """下载被 shutdown_event 中断"""
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶：每分钟补充 rate_per_minute 个令牌，最多积累 capacity 个。
+    acquire() 在拿到令牌前阻塞；cancel_event 被置位时返回 False。
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else max(1, rate_per_minute // 10))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated_at = clock()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def pause(self, seconds):
+        """暂停发放令牌 seconds 秒（用于触发配额限制后的整体退避）"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+            self.tokens = 0.0
+
+    def acquire(self, cancel_event=None):
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            with self._lock:
+                now = self.clock()
+                if now >= self.paused_until:
+                    self._refill(max(now, self.updated_at))
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return True
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.paused_until - now
+                    self.updated_at = self.paused_until
+            if _wait(wait, cancel_event):
+                return False
+
+
+def _wait(seconds, cancel_event=None):
+    """等待 seconds 秒；等待期间被中断时返回 True"""
+    if cancel_event is None:
+        time.sleep(seconds)
+        return False
+    return cancel_event.wait(seconds)
+
+
+def _is_rate_limited(error):
+    message = str(error)
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+class RateLimitedDownloader:
+    """
+    按交易日并发下载 Tushare 日线。pro 只需提供 daily(trade_date=...) 方法，
+    测试时可以传入本地的假对象。
+    """
+
+    def __init__(self, pro, max_workers=None, calls_per_minute=None, min_interval=None,
+                 max_interval=None, max_retries=None, shutdown_event=None, bucket=None):
+        from config import (MIN_INTERVAL, MAX_INTERVAL, MAX_RETRIES,
+                            DOWNLOAD_WORKERS, TUSHARE_CALLS_PER_MINUTE)
+        self.pro = pro
+        self.max_workers = max_workers or DOWNLOAD_WORKERS
+        self.min_interval = MIN_INTERVAL if min_interval is None else min_interval
+        self.max_interval = MAX_INTERVAL if max_interval is None else max_interval
+        self.max_retries = MAX_RETRIES if max_retries is None else max_retries
+        self.shutdown_event = shutdown_event or threading.Event()
+        self.bucket = bucket or TokenBucket(calls_per_minute or TUSHARE_CALLS_PER_MINUTE)
+
+    def _backoff(self, attempt):
+        return min(self.min_interval * (2 ** attempt), self.max_interval)
+
+    def fetch_one(self, trade_date):
+        """下载单个交易日，失败时退避重试；重试耗尽后抛出最后一次的异常"""
+        if cassette.replaying():
+            # 回放不占用配额，也不重试
+            return cassette.cached_call('tushare', 'daily_by_date', self.pro.daily, trade_date=trade_date)
+        for attempt in range(self.max_retries + 1):
+            if not self.bucket.acquire(self.shutdown_event):
+                raise DownloadCancelled(trade_date)
+            try:
+                # 与 TushareSource.daily_by_date 使用同一个录制键
+                return cassette.cached_call('tushare', 'daily_by_date', self.pro.daily, trade_date=trade_date)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                if _is_rate_limited(e):
+                    # 配额耗尽：所有线程一起暂停
+                    self.bucket.pause(delay)
+                tqdm.write(f"下载 {trade_date} 失败: {e}，{delay:.0f} 秒后重试 ({attempt + 1}/{self.max_retries})")
+                if _wait(delay, self.shutdown_event):
+                    raise DownloadCancelled(trade_date)
+
+    def fetch_daily(self, trade_dates, on_result=None, desc="Tushare补齐数据", collect=True):
+        """
+        并发下载多个交易日。
+        :param on_result: 每个交易日下载成功后的回调 on_result(trade_date, df)，在主线程中调用
+        :param collect: 是否在内存中保留下载结果；全量下载时置 False，数据只经 on_result 流式写出
+        :return: (results, failed)，results 为按交易日排序的 [(trade_date, df)]，failed 为失败的交易日
+        """
+        results, failed = {}, []
+        if not trade_dates:
+            return [], failed
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(trade_dates))) as executor:
+            futures = {executor.submit(self.fetch_one, d): d for d in trade_dates}
+            with tqdm(total=len(futures), desc=desc) as progress:
+                for future in as_completed(futures):
+                    trade_date = futures[future]
+                    progress.update(1)
+                    try:
+                        df = future.result()
+                    except DownloadCancelled:
+                        failed.append(trade_date)
+                        continue
+                    except Exception as e:
+                        tqdm.write(f"下载 {trade_date} 数据时失败: {e}，将跳过。")
+                        failed.append(trade_date)
+                        continue
+                    if collect:
+                        results[trade_date] = df
+                    if on_result is not None:
+                        on_result(trade_date, df)
+            if self.shutdown_event.is_set():
+                print("\n正在中断下载任务...", file=sys.stderr)
+                for future in futures:
+                    future.cancel()
+        return sorted(results.items()), sorted(failed)
+
+
+def download_daily(pro, trade_dates, shutdown_event=None, on_result=None, collect=True, desc="Tushare补齐数据",
+                   **kwargs):
+    """便捷函数：用默认配置并发下载多个交易日的日线"""
+    downloader = RateLimitedDownloader(pro, shutdown_event=shutdown_event, **kwargs)
+    return downloader.fetch_daily(list(trade_dates), on_result=on_result, desc=desc, collect=collect)
@@ -0,0 +1,163 @@
+# utils/indicator_store.py
+# 增量维护的衍生指标存储：收盘价均线 MA_n、成交量均线 VMA_n、涨停标记、连板数。
+# 指标按交易日分区存放（与母版分区格式相同），另保存每只股票的滚动状态
+# （最近 60 根收盘价 / 20 根成交量、当前连板数），每日更新只需在状态上推进一天，
+# 不必对全部股票重新做滚动计算。
+
+import os
+import numpy as np
+import pandas as pd
+from utils import partition_store
+from utils.security_master import limit_up_threshold
+
+CLOSE_MA_WINDOWS = (5, 10, 20, 30, 60)
+VOLUME_MA_WINDOWS = (5, 20)
+STATE_FILE = '_state.npz'
+
+INDICATOR_COLUMNS = ([f'MA{n}' for n in CLOSE_MA_WINDOWS] +
+                     [f'VMA{n}' for n in VOLUME_MA_WINDOWS] + ['涨停', '连板数'])
+
+
+def _resolve_dir(store_dir=None):
+    from config import INDICATOR_STORE_DIR
+    return store_dir or INDICATOR_STORE_DIR
+
+
+def _empty_state():
+    return {
+        'codes': np.array([], dtype=str),
+        'close': np.empty((0, max(CLOSE_MA_WINDOWS))),
+        'volume': np.empty((0, max(VOLUME_MA_WINDOWS))),
+        'streak': np.empty(0, dtype=np.int32),
+        'last_date': None,
+    }
+
+
+def load_state(store_dir=None):
+    path = os.path.join(_resolve_dir(store_dir), STATE_FILE)
+    if not os.path.exists(path):
+        return _empty_state()
+    with np.load(path, allow_pickle=False) as z:
+        last_date = str(z['last_date'])
+        return {
+            'codes': z['codes'],
+            'close': z['close'],
+            'volume': z['volume'],
+            'streak': z['streak'],
+            'last_date': pd.Timestamp(last_date) if last_date else None,
+        }
+
+
+def save_state(state, store_dir=None):
+    store_dir = _resolve_dir(store_dir)
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, STATE_FILE)
+    tmp_path = f"{path}.tmp.npz"
+    last_date = state['last_date'].strftime('%Y-%m-%d') if state['last_date'] is not None else ''
+    np.savez(tmp_path, codes=state['codes'].astype(str), close=state['close'], volume=state['volume'],
+             streak=state['streak'], last_date=np.array(last_date))
+    os.replace(tmp_path, path)
+
+
+def _advance(state, day_df, trade_date):
+    """
+    把一天的行情推进到滚动状态上（原地修改 state），返回当天的指标行。
+    停牌（当天无数据）的股票状态保持不变，与按自身K线序列 rolling 的口径一致。
+    """
+    codes = day_df['代码'].astype(str).to_numpy()
+    pos = pd.Index(state['codes']).get_indexer(codes)
+    new_codes = codes[pos < 0]
+    if len(new_codes):
+        n = len(new_codes)
+        state['codes'] = np.concatenate([state['codes'], new_codes])
+        state['close'] = np.vstack([state['close'], np.full((n, state['close'].shape[1]), np.nan)])
+        state['volume'] = np.vstack([state['volume'], np.full((n, state['volume'].shape[1]), np.nan)])
+        state['streak'] = np.concatenate([state['streak'], np.zeros(n, dtype=np.int32)])
+        pos = pd.Index(state['codes']).get_indexer(codes)
+
+    close_today = pd.to_numeric(day_df['收盘'], errors='coerce').to_numpy(dtype=np.float64)
+    volume_today = (pd.to_numeric(day_df['成交量'], errors='coerce').to_numpy(dtype=np.float64)
+                    if '成交量' in day_df.columns else np.full(len(day_df), np.nan))
+    pct_today = (pd.to_numeric(day_df['涨跌幅'], errors='coerce').to_numpy(dtype=np.float64)
+                 if '涨跌幅' in day_df.columns else np.full(len(day_df), np.nan))
+
+    for key, today_values in (('close', close_today), ('volume', volume_today)):
+        buf = state[key]
+        buf[pos, :-1] = buf[pos, 1:]
+        buf[pos, -1] = today_values
+
+    is_limit_up = pct_today >= limit_up_threshold(codes)
+    state['streak'][pos] = np.where(is_limit_up, state['streak'][pos] + 1, 0)
+    state['last_date'] = pd.Timestamp(trade_date)
+
+    out = pd.DataFrame({'代码': codes, '日期': pd.Timestamp(trade_date)})
+    for n in CLOSE_MA_WINDOWS:
+        out[f'MA{n}'] = state['close'][pos, -n:].mean(axis=1)
+    for n in VOLUME_MA_WINDOWS:
+        out[f'VMA{n}'] = state['volume'][pos, -n:].mean(axis=1)
+    out['涨停'] = is_limit_up
+    out['连板数'] = state['streak'][pos].astype(np.int32)
+    return out
+
+
+def update_indicators(changed_dates=None, store_dir=None):
+    """
+    把母版中尚未处理的交易日推进到指标存储。
+    若 changed_dates 中有早于等于状态日期的交易日（如 --force-date 覆盖了历史某天），
+    滚动状态已失效，从头重建。
+    :return: 本次写入的指标分区数量
+    """
+    store_dir = _resolve_dir(store_dir)
+    state = load_state(store_dir)
+    if changed_dates and state['last_date'] is not None and \
+            min(pd.to_datetime(list(changed_dates))) <= state['last_date']:
+        print("--- 历史交易日数据有变动，重建指标存储... ---")
+        state = _empty_state()
+
+    pending = [d for d in partition_store.list_partition_dates()
+               if state['last_date'] is None or d > state['last_date']]
+    if not pending:
+        return 0
+
+    manifest = partition_store.load_manifest(store_dir)
+    for trade_date in pending:
+        day_df = partition_store.scan_partitions(start=trade_date, end=trade_date,
+                                                 columns=['代码', '日期', '收盘', '成交量', '涨跌幅'],
+                                                 compact=False)
+        indicators = _advance(state, day_df, trade_date)
+        partition_store.write_partition(trade_date, indicators, store_dir, manifest=manifest, commit=False)
+    partition_store.save_manifest(manifest, store_dir)
+    save_state(state, store_dir)
+    print(f"--- 指标存储已更新 {len(pending)} 个交易日，最新日期: {state['last_date'].strftime('%Y-%m-%d')} ---")
+    return len(pending)
+
+
+def store_exists(store_dir=None):
+    return os.path.exists(os.path.join(_resolve_dir(store_dir), STATE_FILE))
+
+
+def attach_indicators(hist_df, columns, store_dir=None):
+    """按 (代码, 日期) 把预计算的指标列拼接到历史数据上"""
+    start = pd.to_datetime(hist_df['日期']).min()
+    indicators = partition_store.scan_partitions(_resolve_dir(store_dir), start=start,
+                                                 columns=['代码', '日期'] + list(columns), compact=False)
+    hist_df = hist_df.copy()
+    hist_df['代码'] = hist_df['代码'].astype(str)
+    return hist_df.merge(indicators, on=['代码', '日期'], how='left')
+
+
+def snapshot_indicators(snapshot_df, columns, store_dir=None):
+    """
+    计算快照当天的指标：若该交易日已入库直接读取，否则在滚动状态的副本上推进一天。
+    """
+    trade_date = pd.Timestamp(snapshot_df['日期'].iloc[0]).normalize()
+    state = load_state(store_dir)
+    if state['last_date'] is not None and trade_date <= state['last_date']:
+        day = partition_store.scan_partitions(_resolve_dir(store_dir), start=trade_date, end=trade_date,
+                                              columns=['代码'] + list(columns), compact=False)
+    else:
+        state = {k: (v.copy() if isinstance(v, np.ndarray) else v) for k, v in state.items()}
+        day = _advance(state, snapshot_df, trade_date)[['代码'] + list(columns)]
+    snapshot_df = snapshot_df.copy()
+    snapshot_df['代码'] = snapshot_df['代码'].astype(str)
+    return snapshot_df.merge(day, on='代码', how='left')
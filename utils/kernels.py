@@ -0,0 +1,178 @@
+# utils/kernels.py
+# 策略用的批量计算内核：输入为 1-D（单只股票）或 2-D（日期 × 股票，见 utils/panel.py 的 bars() 视图）数组，
+# 沿第 0 轴（时间）计算，一次调用覆盖全部股票。
+#   - 滚动和/均值/最高/最低：窗口内有 NaN 时为 NaN，前 window-1 行为 NaN（与 pandas rolling(window) 一致）；
+#   - 上穿检测、最近 k 根 K 线内是否上穿；
+#   - 连续为真的长度、最长连续段、连续涨停数；
+#   - N 根 K 线新高/新低。
+# 默认用 NumPy 滑动窗口视图（stride tricks）实现；安装了 numba 时滚动窗口与连续段改用 JIT 编译的循环。
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKEND = 'numba' if numba is not None else 'numpy'
+
+
+def _as_2d(values):
+    """1-D 数组视为单列，返回 (2-D 数组, 是否需要还原为 1-D)"""
+    values = np.asarray(values)
+    if values.ndim == 1:
+        return values[:, None], True
+    return values, False
+
+
+def _restore(result, squeeze):
+    return result[:, 0] if squeeze else result
+
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _rolling_2d(values, window, op):
+        # 每列一次扫描：求和用滑动累加，最高/最低用单调队列（存行号），都是 O(rows)；
+        # last_nan 记录最近的 NaN 行，窗口内有 NaN 时结果为 NaN
+        rows, cols = values.shape
+        out = np.full((rows, cols), np.nan)
+        queue = np.empty(rows, dtype=np.int64)
+        for j in range(cols):
+            acc = 0.0
+            last_nan = -1
+            head, tail = 0, 0
+            for i in range(rows):
+                v = values[i, j]
+                if v != v:
+                    last_nan = i
+                elif op == 0:
+                    acc += v
+                else:
+                    while tail > head and ((op == 1 and values[queue[tail - 1], j] <= v)
+                                           or (op == 2 and values[queue[tail - 1], j] >= v)):
+                        tail -= 1
+                    queue[tail] = i
+                    tail += 1
+                start = i - window + 1
+                if op == 0 and start > 0:
+                    old = values[start - 1, j]
+                    if old == old:
+                        acc -= old
+                if op != 0:
+                    while tail > head and queue[head] < start:
+                        head += 1
+                if start < 0 or last_nan >= start:
+                    continue
+                out[i, j] = acc if op == 0 else values[queue[head], j]
+        return out
+
+    @numba.njit(cache=True)
+    def _run_lengths_2d(mask):
+        rows, cols = mask.shape
+        out = np.zeros((rows, cols), dtype=np.int64)
+        for j in range(cols):
+            run = 0
+            for i in range(rows):
+                run = run + 1 if mask[i, j] else 0
+                out[i, j] = run
+        return out
+
+
+_NUMPY_REDUCERS = {0: np.sum, 1: np.max, 2: np.min}
+
+
+def _rolling_numpy(values, window, op):
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        out[window - 1:] = _NUMPY_REDUCERS[op](sliding_window_view(values, window, axis=0), axis=-1)
+    return out
+
+
+def _rolling(values, window, op):
+    values, squeeze = _as_2d(np.asarray(values, dtype=np.float64))
+    if numba is not None:
+        return _restore(_rolling_2d(np.ascontiguousarray(values), window, op), squeeze)
+    return _restore(_rolling_numpy(values, window, op), squeeze)
+
+
+def rolling_sum(values, window):
+    """滚动和"""
+    return _rolling(values, window, 0)
+
+
+def rolling_mean(values, window):
+    """滚动均值"""
+    return _rolling(values, window, 0) / window
+
+
+def rolling_max(values, window):
+    """滚动最高值"""
+    return _rolling(values, window, 1)
+
+
+def rolling_min(values, window):
+    """滚动最低值"""
+    return _rolling(values, window, 2)
+
+
+def crossover(fast, slow):
+    """上穿：本行 fast > slow 且上一行 fast <= slow（第一行为 False，NaN 比较为 False）"""
+    fast, slow = np.asarray(fast, dtype=np.float64), np.asarray(slow, dtype=np.float64)
+    out = np.zeros(fast.shape, dtype=bool)
+    with np.errstate(invalid='ignore'):
+        out[1:] = (fast[1:] > slow[1:]) & (fast[:-1] <= slow[:-1])
+    return out
+
+
+def crossed_within(fast, slow, k):
+    """最近 k 行内是否发生过上穿"""
+    return crossover(fast, slow)[-k:].any(axis=0)
+
+
+def run_lengths(mask):
+    """截至每一行连续为 True 的长度（本行为 False 时为 0）"""
+    mask, squeeze = _as_2d(np.asarray(mask, dtype=bool))
+    if numba is not None:
+        return _restore(_run_lengths_2d(np.ascontiguousarray(mask)), squeeze)
+    rows = np.arange(len(mask))[:, None]
+    last_false = np.maximum.accumulate(np.where(mask, -1, rows), axis=0)
+    return _restore(rows - last_false, squeeze)
+
+
+def longest_run(mask):
+    """最长连续为 True 的长度"""
+    runs = run_lengths(mask)
+    return runs.max(axis=0) if len(runs) else np.zeros(np.shape(mask)[1:], dtype=np.int64)
+
+
+def limit_up_streaks(pct, threshold):
+    """截至每一行的连续涨停天数；threshold 为标量或每只股票的涨停阈值"""
+    with np.errstate(invalid='ignore'):
+        return run_lengths(np.asarray(pct, dtype=np.float64) >= threshold)
+
+
+def first_true(mask):
+    """第一个为 True 的行号，没有时为 -1"""
+    mask = np.asarray(mask, dtype=bool)
+    return np.where(mask.any(axis=0), mask.argmax(axis=0), -1)
+
+
+def last_true(mask):
+    """最后一个为 True 的行号，没有时为 -1"""
+    mask = np.asarray(mask, dtype=bool)
+    return np.where(mask.any(axis=0), len(mask) - 1 - mask[::-1].argmax(axis=0), -1)
+
+
+def n_bar_high(values, n):
+    """本行是否为最近 n 根 K 线（含本行）的最高值"""
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        return values >= rolling_max(values, n)
+
+
+def n_bar_low(values, n):
+    """本行是否为最近 n 根 K 线（含本行）的最低值"""
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        return values <= rolling_min(values, n)
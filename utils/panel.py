@@ -0,0 +1,160 @@
+# utils/panel.py
+# 日期 × 股票 二维面板：每个字段（收盘、成交量、涨跌幅、预计算均线等）一个 float64 二维数组，
+# 行与交易日对齐（停牌处为 NaN，mask 标记该股票当天是否有数据），列与代码对齐。
+# 选股时由 历史 + 今日快照 的长表构建一次（今日快照即最后一行），所有策略共用；
+# 也可写入磁盘后以 np.memmap 只读打开，多个进程共享同一份数据而不复制。
+#
+# 策略关心的是“每只股票自己的第几根 K 线”而不是日历位置：bars() 把每只股票的有效行
+# 按原顺序下推到底部（最后一行是各股票最新的一根 K 线），滚动窗口与逐只计算完全一致。
+
+import os
+import json
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+INDEX_NAME = '_panel.json'
+
+
+class Panel:
+    """
+    二维面板。
+    :param dates: 行对应的交易日（DatetimeIndex）；bars() 视图中为 None，日期在 '日期' 字段中
+    :param codes: 列对应的股票代码
+    :param fields: {字段名: (行数, 股票数) 数组}
+    :param mask: (行数, 股票数) 布尔数组，该股票当天是否有数据
+    """
+
+    def __init__(self, dates, codes, fields, mask):
+        self.dates = None if dates is None else pd.DatetimeIndex(dates)
+        self.codes = np.asarray(codes, dtype=object)
+        self.fields = fields
+        self.mask = mask
+
+    @property
+    def shape(self):
+        return self.mask.shape
+
+    def __getitem__(self, name):
+        return self.fields[name]
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def counts(self):
+        """每只股票的 K 线数"""
+        return self.mask.sum(axis=0)
+
+    def last(self, name, offset=0):
+        """最后第 offset+1 行（bars() 视图中即各股票倒数第 offset+1 根 K 线），行数不足时为 NaN"""
+        values = self.fields[name]
+        if offset >= len(values):
+            return np.full(values.shape[1], np.nan)
+        return values[-1 - offset]
+
+    def code_positions(self, codes):
+        """代码 -> 列号，不在面板中的为 -1"""
+        return pd.Index(self.codes).get_indexer(pd.Index(codes).astype(str))
+
+    def bars(self):
+        """按各股票自己的 K 线对齐的视图：有效行按原顺序下推到底部，前面补 NaN"""
+        order = np.argsort(self.mask, axis=0, kind='stable')
+        mask = np.take_along_axis(self.mask, order, axis=0)
+        fields = {name: np.where(mask, np.take_along_axis(values, order, axis=0), np.nan)
+                  for name, values in self.fields.items()}
+        if self.dates is not None:
+            dates = np.broadcast_to(self.dates.to_numpy()[:, None], self.shape)
+            fields['日期'] = np.where(mask, np.take_along_axis(dates, order, axis=0), np.datetime64('NaT'))
+        return Panel(None, self.codes, fields, mask)
+
+    def stock_frame(self, code):
+        """单只股票的有效行，列名与长表一致"""
+        col = self.code_positions([code])[0]
+        if col < 0:
+            return pd.DataFrame(columns=['日期'] + list(self.fields))
+        return self.column_frame(col)
+
+    def column_frame(self, col):
+        """第 col 列股票的有效行（按列号取，逐只遍历时不必查找代码）"""
+        rows = np.asarray(self.mask[:, col])
+        df = pd.DataFrame({name: np.asarray(values[rows, col]) for name, values in self.fields.items()})
+        if self.dates is not None:
+            df.insert(0, '日期', self.dates[rows])
+        return df
+
+
+def from_frame(frame, columns=None, calendar=None):
+    """
+    由按 (代码, 日期) 去重的长表构建面板。
+    :param columns: 数值字段，None 时取除代码、日期外的全部列
+    :param calendar: 行对应的交易日，None 时取长表中出现过的全部日期
+    """
+    columns = [c for c in (frame.columns if columns is None else columns) if c not in ('代码', '日期')]
+    codes, col = np.unique(frame['代码'].astype(str).to_numpy(), return_inverse=True)
+    day = pd.to_datetime(frame['日期'])
+    dates = pd.DatetimeIndex(np.unique(day)) if calendar is None else pd.DatetimeIndex(calendar)
+    row = dates.get_indexer(day)
+    if (row < 0).any():
+        raise ValueError("长表中有不在交易日历内的日期")
+
+    mask = np.zeros((len(dates), len(codes)), dtype=bool)
+    mask[row, col] = True
+    fields = {}
+    for name in columns:
+        values = np.full(mask.shape, np.nan)
+        values[row, col] = pd.to_numeric(frame[name], errors='coerce').to_numpy(dtype=np.float64)
+        fields[name] = values
+    return Panel(dates, codes, fields, mask)
+
+
+def save_panel(panel, panel_dir):
+    """
+    写入磁盘：每个字段一个二进制文件，新版本写入独立子目录后原子替换索引。
+    :return: 版本目录
+    """
+    os.makedirs(panel_dir, exist_ok=True)
+    version = datetime.now().strftime('v%Y%m%d%H%M%S%f')
+    version_dir = os.path.join(panel_dir, version)
+    os.makedirs(version_dir)
+    files = {}
+    for i, (name, values) in enumerate(panel.fields.items()):
+        files[name] = f'f{i}.bin'
+        np.ascontiguousarray(values, dtype=np.float64).tofile(os.path.join(version_dir, files[name]))
+    np.ascontiguousarray(panel.mask).tofile(os.path.join(version_dir, 'mask.bin'))
+
+    index = {
+        'version': version,
+        'shape': list(panel.shape),
+        'dates': None if panel.dates is None else panel.dates.strftime('%Y-%m-%d').tolist(),
+        'codes': [str(c) for c in panel.codes],
+        'fields': files,
+    }
+    index_path = os.path.join(panel_dir, INDEX_NAME)
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+
+    # 清理旧版本（可能仍被其他进程映射，失败则留待下次）
+    for entry in os.listdir(panel_dir):
+        if entry.startswith('v') and entry != version:
+            shutil.rmtree(os.path.join(panel_dir, entry), ignore_errors=True)
+    return version_dir
+
+
+def open_panel(panel_dir):
+    """以只读内存映射打开磁盘上的面板（零拷贝）"""
+    with open(os.path.join(panel_dir, INDEX_NAME), 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    version_dir = os.path.join(panel_dir, index['version'])
+    shape = tuple(index['shape'])
+
+    def _map(file_name, dtype):
+        if 0 in shape:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(os.path.join(version_dir, file_name), dtype=dtype, mode='r', shape=shape)
+
+    fields = {name: _map(file_name, np.float64) for name, file_name in index['fields'].items()}
+    return Panel(index['dates'], index['codes'], fields, _map('mask.bin', np.bool_))
@@ -0,0 +1,103 @@
+# utils/parallel_selection.py
+# 多进程逐只选股：没有向量化版本（或自定义）的 is_selected 策略按股票分片交给进程池执行。
+# 历史 + 今日快照的面板写入临时目录，各工作进程以只读内存映射打开（utils/panel.py），
+# 不在进程间传递 DataFrame；每个分片只传列号，返回选中股票的解析结果，按原顺序合并。
+
+import os
+import sys
+import shutil
+import tempfile
+import traceback
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils import panel as panel_module
+
+# 工作进程内的状态：(面板, 策略函数)
+_WORKER = None
+
+
+def parse_result(result):
+    """
+    统一策略的不同返回格式。
+    :return: (是否选中, 当天成交量, 上一交易日成交量, 触发日期, 涨跌幅)
+    """
+    if isinstance(result, tuple):
+        # 新格式 (is_selected_flag, today_volume, yesterday_volume, trigger_date, change_percent)
+        if len(result) >= 3:
+            return (result[0], result[1], result[2],
+                    result[3] if len(result) > 3 else None,
+                    result[4] if len(result) > 4 else None)
+        return (result[0] if result else False), None, None, None, None
+    if isinstance(result, bool):
+        return result, None, None, None, None
+    return False, None, None, None, None
+
+
+def result_dict(stock_code, parsed, latest_close, code_name_map, today):
+    """选中股票的结果字典（与向量化引擎的输出格式一致）"""
+    _, today_volume, yesterday_volume, trigger_date, change_percent = parsed
+    return {
+        'ts_code': stock_code,
+        '名称': code_name_map.get(stock_code, ''),
+        '最后触发日期': trigger_date.strftime('%Y-%m-%d') if isinstance(trigger_date, (datetime, pd.Timestamp))
+        else today.strftime('%Y-%m-%d'),
+        '当前股价': round(latest_close, 2),
+        '涨跌幅%': round(change_percent, 2) if pd.notna(change_percent) else None,
+        '当天成交量': int(today_volume) if today_volume is not None else None,
+        '上一交易日成交量': int(yesterday_volume) if yesterday_volume is not None else None,
+    }
+
+
+def _init_worker(panel_dir, strategy_name):
+    global _WORKER
+    from strategies import STRATEGIES
+    _WORKER = (panel_module.open_panel(panel_dir), STRATEGIES[strategy_name])
+
+
+def _run_chunk(columns):
+    """
+    在工作进程中逐只执行策略。
+    :return: (选中列表 [(代码, 解析结果)], 错误列表 [(代码, 错误信息)])
+    """
+    panel, strategy_func = _WORKER
+    hits, errors = [], []
+    for col in columns:
+        stock_code = panel.codes[col]
+        try:
+            parsed = parse_result(strategy_func(stock_code, panel.column_frame(col)))
+            if parsed[0]:
+                hits.append((stock_code, parsed))
+        except Exception as e:
+            errors.append((stock_code, f"{e}\n{traceback.format_exc()}"))
+    return hits, errors
+
+
+def run_parallel(panel, strategy_name, workers, chunk_size=50, on_chunk=None):
+    """
+    用进程池对面板中的全部股票逐只执行 STRATEGIES[strategy_name]。
+    :param chunk_size: 每个分片的股票数（也是进度汇报的粒度）
+    :param on_chunk: 每完成一个分片调用 on_chunk(已完成股票数, 股票总数)
+    :return: [(代码, 解析结果)]，按面板中的股票顺序
+    """
+    total = len(panel.codes)
+    chunks = [range(start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+    panel_dir = tempfile.mkdtemp(prefix='selection_panel_')
+    selected, done = [], 0
+    try:
+        panel_module.save_panel(panel, panel_dir)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(panel_dir, strategy_name)) as executor:
+            # map 按提交顺序返回，结果天然保持原顺序
+            for chunk, (hits, errors) in zip(chunks, executor.map(_run_chunk, chunks)):
+                selected.extend(hits)
+                for stock_code, message in errors:
+                    print(f"Error processing {stock_code}: {message}", file=sys.stderr)
+                done += len(chunk)
+                if on_chunk is not None:
+                    on_chunk(done, total)
+    finally:
+        shutil.rmtree(panel_dir, ignore_errors=True)
+    return selected
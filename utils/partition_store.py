@@ -0,0 +1,302 @@
+# utils/partition_store.py
+# 按交易日分区的母版数据存储：每个交易日一个 Feather 分区文件 + 一个清单文件(_manifest.json)。
+# 日常更新只写入新的分区，写入成本只与新增数据量有关，与历史总量无关。
+
+import os
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+from datetime import datetime
+from utils.schema import compact_enabled, compact_frame
+
+MANIFEST_NAME = '_manifest.json'
+MANIFEST_VERSION = 1
+
+
+def _resolve_dir(store_dir=None):
+    from config import MASTER_STORE_DIR
+    return store_dir or MASTER_STORE_DIR
+
+
+def _date_key(trade_date):
+    """分区键：YYYYMMDD 字符串"""
+    return pd.Timestamp(trade_date).strftime('%Y%m%d')
+
+
+def _atomic_write_json(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def store_exists(store_dir=None):
+    """分区存储是否已初始化（以清单文件为准）"""
+    return os.path.exists(os.path.join(_resolve_dir(store_dir), MANIFEST_NAME))
+
+
+def load_manifest(store_dir=None):
+    """读取清单；不存在时返回空清单"""
+    path = os.path.join(_resolve_dir(store_dir), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'version': MANIFEST_VERSION, 'partitions': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, store_dir=None):
+    """原子地提交清单，读者只会看到清单中登记过的分区"""
+    store_dir = _resolve_dir(store_dir)
+    os.makedirs(store_dir, exist_ok=True)
+    manifest['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    _atomic_write_json(os.path.join(store_dir, MANIFEST_NAME), manifest)
+
+
+def list_partition_dates(store_dir=None, manifest=None):
+    """返回已提交分区的日期列表（升序）"""
+    manifest = manifest or load_manifest(store_dir)
+    return [pd.Timestamp(k) for k in sorted(manifest['partitions'])]
+
+
+def latest_date(store_dir=None):
+    """存储中最新的交易日；空存储返回 None"""
+    dates = list_partition_dates(store_dir)
+    return dates[-1] if dates else None
+
+
+def write_partition(trade_date, df, store_dir=None, manifest=None, commit=True, presorted=False):
+    """
+    写入（或整体替换）某个交易日的分区。
+    先写临时文件再 os.replace，保证分区文件要么是旧版本要么是新版本；
+    --force-date 覆盖某天即是对该分区的一次原子替换，不触及其他交易日。
+    :param commit: 是否立即提交清单；批量写入时可置 False，最后统一 save_manifest
+    :param presorted: df 已按 代码 排序时跳过排序
+    """
+    store_dir = _resolve_dir(store_dir)
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = manifest if manifest is not None else load_manifest(store_dir)
+
+    key = _date_key(trade_date)
+    file_name = f"{key}.feather"
+    part = df.copy()
+    part['日期'] = pd.to_datetime(part['日期'])
+    if not presorted:
+        part = part.sort_values('代码')
+    part = part.reset_index(drop=True)
+    if compact_enabled():
+        compact_frame(part)
+
+    final_path = os.path.join(store_dir, file_name)
+    tmp_path = f"{final_path}.tmp"
+    feather.write_feather(part, tmp_path)
+    os.replace(tmp_path, final_path)
+
+    manifest['partitions'][key] = {
+        'file': file_name,
+        'rows': int(len(part)),
+        'columns': list(part.columns),
+        'written_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    if commit:
+        save_manifest(manifest, store_dir)
+    return manifest
+
+
+def append_partitions(new_data_df, store_dir=None):
+    """
+    将新数据按日期拆分后写入对应分区，所有分区写完后一次性提交清单。
+    :return: 写入的交易日列表
+    """
+    manifest = load_manifest(store_dir)
+    df = new_data_df.copy()
+    df['日期'] = pd.to_datetime(df['日期'])
+    df = df.drop_duplicates(subset=['代码', '日期'], keep='last')
+
+    written = []
+    for trade_date, day_df in df.groupby('日期', sort=True):
+        write_partition(trade_date, day_df, store_dir, manifest=manifest, commit=False)
+        written.append(pd.Timestamp(trade_date))
+    if written:
+        save_manifest(manifest, store_dir)
+    return written
+
+
+def merge_sorted(existing, new_rows, key='代码'):
+    """
+    把新行有序归并进已按 key 排序的数据框：key 相同的行以新行为准，
+    新行按二分定位插入，代价为 O(旧行数 + 新行数·log 旧行数)，不对合并结果重新排序。
+    """
+    new_rows = new_rows.drop_duplicates(subset=[key], keep='last').sort_values(key, kind='stable')
+    old_keys = existing[key].astype(str).to_numpy()
+    new_keys = new_rows[key].astype(str).to_numpy()
+    pos = np.searchsorted(old_keys, new_keys)
+    replaced = pos[(pos < len(old_keys)) & (old_keys[np.minimum(pos, len(old_keys) - 1)] == new_keys)] \
+        if len(old_keys) else np.empty(0, dtype=np.int64)
+    kept = np.delete(np.arange(len(old_keys)), replaced)
+    positions = np.searchsorted(old_keys[kept], new_keys)
+    order = np.insert(kept, positions, np.arange(len(new_keys)) + len(old_keys))
+    combined = pd.concat([existing, new_rows], ignore_index=True)
+    return combined.iloc[order].reset_index(drop=True)
+
+
+def merge_partitions(rows_df, store_dir=None):
+    """
+    把零散的行（如个股补洞数据）并入已有分区：同一 (代码, 日期) 以新数据为准，
+    分区中其他股票的数据保持不变。不存在的分区直接新建。
+    每个分区只做一次有序归并（见 merge_sorted），不重新排序整个分区。
+    :return: 写入的交易日列表
+    """
+    store_dir = _resolve_dir(store_dir)
+    manifest = load_manifest(store_dir)
+    df = rows_df.copy()
+    df['日期'] = pd.to_datetime(df['日期'])
+
+    written = []
+    for trade_date, day_df in df.groupby('日期', sort=True):
+        entry = manifest['partitions'].get(_date_key(trade_date))
+        if entry is not None:
+            existing = pd.read_feather(os.path.join(store_dir, entry['file']))
+            if isinstance(existing['代码'].dtype, pd.CategoricalDtype):
+                existing['代码'] = existing['代码'].astype(str)
+            day_df = merge_sorted(existing, day_df)
+        else:
+            day_df = day_df.drop_duplicates(subset=['代码'], keep='last').sort_values('代码')
+        write_partition(trade_date, day_df, store_dir, manifest=manifest, commit=False, presorted=True)
+        written.append(pd.Timestamp(trade_date))
+    if written:
+        save_manifest(manifest, store_dir)
+    return written
+
+
+def _harmonize_code_column(table, compact):
+    """统一各分区 代码 列的物理类型（字典编码或普通字符串），以便拼接"""
+    if '代码' not in table.column_names:
+        return table
+    idx = table.schema.get_field_index('代码')
+    col = table.column(idx)
+    is_dict = pa.types.is_dictionary(col.type)
+    if compact and not is_dict:
+        col = pc.dictionary_encode(col.cast(pa.string()))
+    elif not compact and is_dict:
+        col = col.cast(pa.string())
+    else:
+        return table
+    return table.set_column(idx, '代码', col)
+
+
+def select_partition_keys(manifest, start=None, end=None, last_n_days=None):
+    """
+    按日期范围在清单层面裁剪分区（未选中的分区文件不会被打开）。
+    :param last_n_days: 只保留满足日期范围的最近 N 个交易日分区（全市场口径，不是每只股票 N 根）
+    """
+    keys = sorted(manifest['partitions'])
+    if start is not None:
+        start_key = _date_key(start)
+        keys = [k for k in keys if k >= start_key]
+    if end is not None:
+        end_key = _date_key(end)
+        keys = [k for k in keys if k <= end_key]
+    if last_n_days is not None:
+        keys = keys[-int(last_n_days):] if last_n_days > 0 else []
+    return keys
+
+
+def _finalize_frame(table, columns):
+    df = table.to_pandas()
+    if columns is not None:
+        for col in columns:
+            if col not in df.columns:
+                df[col] = None
+        df = df[columns]
+    if '代码' in df.columns and '日期' in df.columns:
+        df = df.sort_values(['代码', '日期'], kind='stable').reset_index(drop=True)
+    return df
+
+
+def _scan_keys(store_dir, manifest, keys, codes=None, columns=None, compact=False):
+    """逐个分区扫描并拼接；代码过滤与列投影交给 pyarrow.dataset 在读取时完成"""
+    if not keys:
+        return pd.DataFrame(columns=columns or ['代码', '日期'])
+    row_filter = ds.field('代码').isin(list(codes)) if codes is not None else None
+    tables = []
+    for key in keys:
+        entry = manifest['partitions'][key]
+        part_columns = entry.get('columns')
+        if columns is not None and part_columns is not None:
+            read_cols = [c for c in columns if c in part_columns]
+        else:
+            read_cols = columns
+        dataset = ds.dataset(os.path.join(store_dir, entry['file']), format='feather')
+        table = dataset.to_table(columns=read_cols, filter=row_filter)
+        tables.append(_harmonize_code_column(table, compact))
+    table = pa.concat_tables(tables, promote_options='permissive')
+    return _finalize_frame(table, columns)
+
+
+def scan_partitions(store_dir=None, codes=None, start=None, end=None, columns=None,
+                    last_n_days=None, compact=None):
+    """
+    带谓词/投影下推的分区扫描：
+      - 日期范围、last_n_days 在清单层面裁剪分区文件；
+      - 代码过滤与列投影在读取时完成，不需要的列不会被解码。
+    :param codes: 只读取这些代码（需与存储中的代码写法一致）
+    :param compact: 代码列是否保持字典编码；None 时取 config.COMPACT_SCHEMA
+    """
+    store_dir = _resolve_dir(store_dir)
+    compact = compact_enabled() if compact is None else compact
+    manifest = load_manifest(store_dir)
+    keys = select_partition_keys(manifest, start, end, last_n_days)
+    return _scan_keys(store_dir, manifest, keys, codes, columns, compact)
+
+
+def read_partitions(store_dir=None, dates=None, columns=None, compact=None):
+    """
+    读取分区并拼接为一个 DataFrame（按 代码、日期 排序，与旧母版文件顺序一致）。
+    :param dates: 只读取这些日期的分区；None 表示全部
+    :param columns: 只读取这些列；None 表示全部
+    :param compact: 代码列是否保持字典编码；None 时取 config.COMPACT_SCHEMA
+    """
+    store_dir = _resolve_dir(store_dir)
+    compact = compact_enabled() if compact is None else compact
+    manifest = load_manifest(store_dir)
+    keys = sorted(manifest['partitions'])
+    if dates is not None:
+        wanted = {_date_key(d) for d in dates}
+        keys = [k for k in keys if k in wanted]
+    return _scan_keys(store_dir, manifest, keys, columns=columns, compact=compact)
+
+
+def migrate_master_file(master_file=None, store_dir=None):
+    """
+    一次性把旧的单文件母版 (master_stock_data.feather) 拆分为日期分区。
+    :return: 写入的分区数量
+    """
+    from config import MASTER_DATA_FILE
+    master_file = master_file or MASTER_DATA_FILE
+    if not os.path.exists(master_file):
+        raise FileNotFoundError(f"找不到母版数据文件 {master_file}")
+
+    print(f"--- 正在将 '{master_file}' 迁移为日期分区存储... ---")
+    df = pd.read_feather(master_file)
+    written = append_partitions(df, store_dir)
+    print(f"--- 迁移完成，共写入 {len(written)} 个交易日分区 ---")
+    return len(written)
+
+
+def ensure_store(store_dir=None):
+    """
+    确保分区存储可用：已存在直接返回 True；否则尝试从旧母版文件迁移。
+    """
+    if store_exists(store_dir):
+        return True
+    from config import MASTER_DATA_FILE
+    if os.path.exists(MASTER_DATA_FILE):
+        migrate_master_file(MASTER_DATA_FILE, store_dir)
+        return True
+    return False
@@ -0,0 +1,136 @@
+# utils/schema.py
+# 母版数据的紧凑类型方案（可选，config.COMPACT_SCHEMA 开启）：
+#   - 代码：字典编码（内存中为 category，分区文件中为各分区自带的 Arrow dictionary）
+#   - 日期：分区文件与内存中仍为 datetime64
+#   - 开高低收：float32；成交量：int64；成交额、涨跌幅：float64
+# encode_frame() 另提供纯数值表示（int32 代码ID + 代码表、int32 交易日序号 + 交易日历），
+# 目前只有数组存储（utils/array_store.py）使用；日期分区不做这种编码。
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['开盘', '收盘', '最高', '最低']
+
+
+def compact_enabled():
+    try:
+        from config import COMPACT_SCHEMA
+    except ImportError:
+        return False
+    return bool(COMPACT_SCHEMA)
+
+
+def compact_frame(df):
+    """
+    将行情数据框转为紧凑的内存类型（原地修改并返回）。
+    代码列转为 category，对代码的规范化等操作只需在类别上执行一次。
+    """
+    if '代码' in df.columns and not isinstance(df['代码'].dtype, pd.CategoricalDtype):
+        df['代码'] = df['代码'].astype('category')
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(np.float32)
+    if '成交量' in df.columns:
+        volume = pd.to_numeric(df['成交量'], errors='coerce')
+        # 手 ×100 后常带浮点误差（如 123456.99999），取整而非截断；存在缺失值时无法使用 int64，退回 float64
+        df['成交量'] = np.rint(volume).astype(np.int64) if volume.notna().all() else volume.astype(np.float64)
+    for col in ('成交额', '涨跌幅'):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(np.float64)
+    return df
+
+
+def encode_frame(df, calendar=None):
+    """
+    将数据框编码为纯数值表示：
+      代码 -> 代码ID (int32)，日期 -> 日期序号 (int32，交易日历偏移)
+    :param calendar: 交易日历（升序 DatetimeIndex）；None 时使用数据中出现过的日期
+    :return: (encoded_df, code_table, calendar)
+    """
+    dates = pd.to_datetime(df['日期']).dt.normalize()
+    if calendar is None:
+        calendar = pd.DatetimeIndex(np.sort(dates.unique()))
+    else:
+        calendar = pd.DatetimeIndex(calendar).normalize()
+    date_idx = calendar.get_indexer(dates)
+    if (date_idx < 0).any():
+        missing = dates[date_idx < 0].unique()[:5]
+        raise ValueError(f"以下日期不在交易日历中: {list(missing)}")
+
+    code_ids, code_table = pd.factorize(df['代码'].astype(str), sort=True)
+    encoded = df.drop(columns=['代码', '日期']).copy()
+    encoded.insert(0, '代码ID', code_ids.astype(np.int32))
+    encoded.insert(1, '日期序号', date_idx.astype(np.int32))
+    compact_frame(encoded)
+    return encoded, np.asarray(code_table, dtype=object), calendar
+
+
+# akshare 全市场快照（stock_zh_a_spot_em）列名 -> Tushare daily 列名
+SNAPSHOT_TO_TUSHARE = {
+    '今开': 'open', '最高': 'high', '最低': 'low', '最新价': 'close', '昨收': 'pre_close',
+    '涨跌额': 'change', '涨跌幅': 'pct_chg', '成交量': 'vol', '成交额': 'amount',
+}
+TUSHARE_DAILY_COLUMNS = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'pre_close',
+                         'change', 'pct_chg', 'vol', 'amount']
+
+
+def snapshot_to_tushare_daily(snapshot_df, trade_date, codes=None):
+    """
+    把全市场快照转换为 Tushare daily 格式，之后可与 pro.daily 的结果走同一套列名和单位转换。
+    代码规范化后与证券列表做一次键连接，不逐只股票筛选。
+    单位：成交量仍为手（与 Tushare 一致），成交额由元转为千元。
+    :param trade_date: 快照所属交易日
+    :param codes: 只保留这些股票（任意写法），None 时保留证券主表中的全部股票
+    """
+    from utils import security_master
+    if codes is not None:
+        universe = pd.DataFrame({'ts_code': pd.unique(security_master.normalize_codes(pd.Series(list(codes))))})
+    else:
+        universe = security_master.load_master()[['ts_code']]
+
+    columns = {k: v for k, v in SNAPSHOT_TO_TUSHARE.items() if k in snapshot_df.columns}
+    daily = snapshot_df[['代码'] + list(columns)].rename(columns=columns)
+    daily.insert(0, 'ts_code', security_master.normalize_codes(daily.pop('代码')))
+    for col in columns.values():
+        daily[col] = pd.to_numeric(daily[col], errors='coerce')
+    # 停牌股票快照中没有最新价
+    daily = daily.dropna(subset=['close']).drop_duplicates('ts_code')
+    if not universe.empty:
+        daily = universe.merge(daily, on='ts_code', how='inner')
+    if 'amount' in daily.columns:
+        daily['amount'] = daily['amount'] / 1000
+    daily.insert(1, 'trade_date', pd.Timestamp(trade_date).strftime('%Y%m%d'))
+    return daily[[c for c in TUSHARE_DAILY_COLUMNS if c in daily.columns]].reset_index(drop=True)
+
+
+# Tushare daily 列名 -> 母版列名；单位：成交量 手 -> 股（×100），成交额 千元 -> 元（×1000）
+TUSHARE_TO_MASTER = {
+    'ts_code': '代码', 'trade_date': '日期', 'open': '开盘', 'close': '收盘', 'high': '最高',
+    'low': '最低', 'vol': '成交量', 'amount': '成交额', 'pct_chg': '涨跌幅',
+}
+MASTER_COLUMNS = ['代码', '日期', '开盘', '收盘', '最高', '最低', '成交量', '成交额', '涨跌幅']
+
+
+class SchemaError(ValueError):
+    """数据源返回的数据缺少母版需要的列"""
+
+
+def tushare_daily_to_master(daily):
+    """
+    把 Tushare daily 格式（pro.daily 或 snapshot_to_tushare_daily 的结果）转换为母版的列名和单位。
+    所有数据源都经过这里写入母版：缺少任何一列时抛出 SchemaError，个别字段缺失的行被丢弃，
+    保证母版中不会出现缺列或空值的行。
+    """
+    missing = [col for col in TUSHARE_TO_MASTER if col not in daily.columns]
+    if missing:
+        raise SchemaError(f"缺少列: {', '.join(missing)}")
+    df = daily[list(TUSHARE_TO_MASTER)].rename(columns=TUSHARE_TO_MASTER)
+    for col in MASTER_COLUMNS[2:]:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    incomplete = df.isna().any(axis=1)
+    if incomplete.any():
+        print(f"[WARNING] 丢弃 {int(incomplete.sum())} 行字段不完整的数据")
+        df = df[~incomplete]
+    df['成交量'] = df['成交量'] * 100
+    df['成交额'] = df['成交额'] * 1000
+    return df[MASTER_COLUMNS].reset_index(drop=True)
@@ -0,0 +1,156 @@
+# utils/security_master.py
+# 证券主表：由 stock_pool.csv 构建并缓存，每只股票一行：
+#   证券ID（int32）、规范 ts_code、6 位代码、名称、板块、涨跌幅限制比例。
+# 代码规范化、名称和涨停阈值的查找都是整列的数组运算，不逐行调用 Python 函数。
+
+import os
+import numpy as np
+import pandas as pd
+
+# 6 位代码前缀 -> (板块, 交易所后缀)；按顺序匹配，先匹配到的优先
+BOARD_RULES = [
+    (('688', '689'), '科创板', 'SH'),
+    (('60',), '沪市主板', 'SH'),
+    (('900',), '沪市B股', 'SH'),
+    (('30',), '创业板', 'SZ'),
+    (('000', '001', '002', '003'), '深市主板', 'SZ'),
+    (('200',), '深市B股', 'SZ'),
+    (('4', '8', '92'), '北交所', 'BJ'),
+]
+DEFAULT_BOARD = ('其他', 'SH')
+
+# 各板块涨跌幅限制比例；主板 ST 股为 5%
+LIMIT_RATIOS = {'科创板': 0.20, '创业板': 0.20, '北交所': 0.30}
+DEFAULT_LIMIT_RATIO = 0.10
+ST_LIMIT_RATIO = 0.05
+
+# 判定涨停时允许的舍入误差：涨跌幅 >= 限制比例 × 99%（10% -> 9.9，20% -> 19.8）
+LIMIT_UP_TOLERANCE = 0.99
+
+MASTER_COLUMNS = ['证券ID', 'ts_code', '代码', '名称', '板块', '涨跌幅限制']
+
+# 进程内缓存：(文件路径, 修改时间) -> 主表
+_MASTER = None
+
+
+def _resolve_file(pool_file=None):
+    from config import STOCK_POOL_FILE
+    return pool_file or STOCK_POOL_FILE
+
+
+def _digits(codes):
+    """提取 6 位数字代码（兼容 '000001'、'000001.SZ'、'sz000001'、整数 1 等写法）"""
+    return codes.str.extract(r'(\d{1,6})', expand=False).str.zfill(6)
+
+
+def classify(digits):
+    """按代码前缀判断板块和交易所后缀，返回 (板块数组, 后缀数组)"""
+    digits = pd.Series(digits, dtype=str)
+    conditions = [digits.str.startswith(prefixes).to_numpy() for prefixes, _, _ in BOARD_RULES]
+    boards = np.select(conditions, [board for _, board, _ in BOARD_RULES], default=DEFAULT_BOARD[0])
+    suffixes = np.select(conditions, [suffix for _, _, suffix in BOARD_RULES], default=DEFAULT_BOARD[1])
+    return boards, suffixes
+
+
+def limit_ratios(boards, names=None):
+    """涨跌幅限制比例；names 给出时主板 ST 股取 5%"""
+    boards = pd.Series(boards, dtype=str)
+    ratios = boards.map(LIMIT_RATIOS).fillna(DEFAULT_LIMIT_RATIO).to_numpy(dtype=np.float64)
+    if names is not None:
+        is_st = pd.Series(names, dtype=str).str.upper().str.contains('ST', regex=False).to_numpy()
+        main_board = (ratios == DEFAULT_LIMIT_RATIO)
+        ratios = np.where(is_st & main_board, ST_LIMIT_RATIO, ratios)
+    return ratios
+
+
+def _normalize_values(values):
+    """对去重后的代码值做规范化；已带后缀的保留原后缀"""
+    values = pd.Series(values, dtype=str).str.strip().str.upper()
+    digits = _digits(values)
+    _, suffixes = classify(digits.fillna(''))
+    given = values.str.extract(r'\.(SH|SZ|BJ)$', expand=False)
+    canonical = digits + '.' + given.fillna(pd.Series(suffixes, index=values.index))
+    # 无法识别的值原样保留
+    return canonical.where(digits.notna(), values).to_numpy(dtype=object)
+
+
+def normalize_codes(codes):
+    """
+    把任意写法的股票代码规范为 ts_code（如 '000001.SZ'、'430047.BJ'）。
+    先去重再规范化，最后按位置还原，代价与股票数而非行数成正比。
+    输入为 Series 时返回同索引的 Series；category 列只处理类别。
+    """
+    if isinstance(codes, pd.Series) and isinstance(codes.dtype, pd.CategoricalDtype):
+        cat = codes.cat
+        new_values, uniques = pd.factorize(_normalize_values(cat.categories))
+        mapped = np.where(cat.codes.to_numpy() >= 0, new_values[cat.codes.to_numpy()], -1)
+        return pd.Series(pd.Categorical.from_codes(mapped, categories=uniques),
+                         index=codes.index, name=codes.name)
+    inverse, uniques = pd.factorize(pd.Series(codes).astype(str))
+    normalized = _normalize_values(uniques)[inverse]
+    if isinstance(codes, pd.Series):
+        return pd.Series(normalized, index=codes.index, name=codes.name)
+    return normalized
+
+
+def build_master(pool_file=None):
+    """由股票池文件构建证券主表"""
+    pool = pd.read_csv(_resolve_file(pool_file), dtype=str, encoding='utf-8-sig')
+    ts_codes = normalize_codes(pool['ts_code'])
+    master = pd.DataFrame({'ts_code': ts_codes, '名称': pool['name'].fillna('').str.strip()})
+    master = master.drop_duplicates('ts_code').reset_index(drop=True)
+    master['代码'] = master['ts_code'].str[:6]
+    boards, _ = classify(master['代码'])
+    master['板块'] = boards
+    master['涨跌幅限制'] = limit_ratios(boards, master['名称'])
+    master.insert(0, '证券ID', np.arange(len(master), dtype=np.int32))
+    return master[MASTER_COLUMNS]
+
+
+def load_master(pool_file=None):
+    """读取证券主表（文件未变化时使用进程内缓存）；股票池文件不存在时返回空表"""
+    global _MASTER
+    path = _resolve_file(pool_file)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=MASTER_COLUMNS)
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if _MASTER is None or _MASTER[0] != key:
+        _MASTER = (key, build_master(path))
+    return _MASTER[1]
+
+
+def security_ids(codes, master=None):
+    """代码 -> 证券ID（int32），不在主表中的为 -1"""
+    master = load_master() if master is None else master
+    return pd.Index(master['ts_code']).get_indexer(normalize_codes(pd.Series(codes))).astype(np.int32)
+
+
+def lookup(codes, column, master=None, default=None):
+    """按代码批量查找主表中的某一列，找不到的取 default"""
+    master = load_master() if master is None else master
+    ids = security_ids(codes, master)
+    values = master[column].to_numpy(dtype=object)[np.maximum(ids, 0)] if len(master) else \
+        np.full(len(ids), default, dtype=object)
+    return np.where(ids >= 0, values, default)
+
+
+def name_map(master=None):
+    """ts_code -> 名称 的字典"""
+    master = load_master() if master is None else master
+    return dict(zip(master['ts_code'], master['名称']))
+
+
+def limit_up_threshold(codes, master=None):
+    """
+    涨停判定阈值（涨跌幅%）：主板 9.9、主板 ST 4.95、创业板/科创板 19.8、北交所 29.7。
+    不在主表中的股票按代码前缀判断板块（无法识别 ST）。
+    """
+    master = load_master() if master is None else master
+    codes = normalize_codes(pd.Series(codes))
+    ids = security_ids(codes, master)
+    boards, _ = classify(codes.str[:6])
+    ratios = limit_ratios(boards)
+    if len(master):
+        known = master['涨跌幅限制'].to_numpy(dtype=np.float64)[np.maximum(ids, 0)]
+        ratios = np.where(ids >= 0, known, ratios)
+    return ratios * 100 * LIMIT_UP_TOLERANCE
@@ -0,0 +1,103 @@
+# utils/selection_engine.py
+# 向量化选股引擎：把全市场的 历史 + 今日快照 一次性拼成一张按 (代码, 日期) 排序的长表，
+# 再转成 日期 × 股票 面板（utils/panel.py），策略的 select_all(panel) 用数组表达式对全部股票
+# 同时计算，返回每只股票一行的结果：
+#   选中（布尔选择向量）、触发日期、涨跌幅、当天成交量、上一交易日成交量。
+# 长表的截取、拼接和去重规则与 3_stock_selector.py 中逐只循环的做法一致，
+# 没有向量化版本的策略仍逐只调用 STRATEGIES 中的 is_selected。
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils import panel
+
+RESULT_COLUMNS = ['选中', '触发日期', '涨跌幅', '当天成交量', '上一交易日成交量']
+
+
+def index_snapshot(snapshot_df):
+    """按代码索引的快照（代码统一大写，重复时保留最后一条），按代码查找为 O(1)，不必每只股票扫描整张快照"""
+    snap = snapshot_df.assign(代码=snapshot_df['代码'].astype(str).str.upper())
+    return snap.drop_duplicates('代码', keep='last').set_index('代码')
+
+
+def prepare_universe(hist_df, snapshot_df, today, columns, tail_bars=None, start_date=None):
+    """
+    构造全市场的 历史 + 今日 长表。
+    :param columns: 策略用到的列（代码、日期之外），缺少的列补 NaN
+    :param tail_bars: 每只股票保留截至 today 的最近历史 K 线数；None 时保留 [start_date, today) 内的历史
+    :return: (combined, latest_close)。combined 按 (代码, 日期) 排序；latest_close 为各股票的快照收盘价，
+             没有快照或快照收盘价缺失的股票不参与选股
+    """
+    today = pd.Timestamp(today).normalize()
+    columns = ['代码', '日期'] + [c for c in columns if c not in ('代码', '日期')]
+
+    hist = hist_df.reindex(columns=columns)
+    hist['代码'] = hist['代码'].astype(str).str.upper()
+    hist['日期'] = pd.to_datetime(hist['日期'])
+
+    # 今日快照一次性按代码对齐到全部股票
+    snap = index_snapshot(snapshot_df).reindex(columns=columns[1:])
+    snap = snap[snap.index.isin(hist['代码'].unique())].assign(日期=today)
+    latest_close = snap['收盘'].astype(float).dropna()
+    snap = snap.loc[latest_close.index].reset_index()
+
+    # 不使用 today 之后的历史（回放过去的交易日时母版中已有之后的数据）
+    hist = hist[hist['代码'].isin(latest_close.index) & (hist['日期'] <= today)]
+    if tail_bars:
+        hist = hist.sort_values(['代码', '日期'], kind='stable').groupby('代码', sort=False).tail(tail_bars)
+    else:
+        start = pd.Timestamp(start_date if start_date is not None else datetime.min)
+        hist = hist[(hist['日期'] >= start) & (hist['日期'] < today)]
+
+    combined = pd.concat([hist, snap], ignore_index=True)
+    # 同一天既有历史又有快照时，优先保留有成交量的记录
+    combined['has_volume'] = combined['成交量'].notna()
+    combined = combined.sort_values(['代码', '日期', 'has_volume'], ascending=[True, True, False], kind='stable')
+    combined = combined.drop_duplicates(['代码', '日期'], keep='first').drop(columns='has_volume')
+    return combined.reset_index(drop=True), latest_close
+
+
+def build_panel(combined):
+    """由 prepare_universe() 的长表构建 日期 × 股票 面板（今日快照即最后一行），供全部策略共用"""
+    return panel.from_frame(combined)
+
+
+def result_frame(bars, selected, trigger_date=None, change=None, details=True):
+    """
+    组装策略结果（每只股票一行，按代码索引）。
+    :param bars: Panel.bars() 视图
+    :param selected: 与 bars.codes 对齐的布尔数组
+    :param trigger_date: 与 bars.codes 对齐的触发日期数组，None 表示今天
+    :param change: 与 bars.codes 对齐的涨跌幅数组，None 时 details 为 True 则取最后一根 K 线
+    :param details: 是否填写当天/上一交易日成交量与涨跌幅（对应逐只策略返回元组还是布尔值）
+    """
+    nan = np.full(len(bars.codes), np.nan)
+    result = pd.DataFrame({
+        '选中': np.asarray(selected, dtype=bool),
+        '触发日期': pd.NaT if trigger_date is None else pd.to_datetime(np.asarray(trigger_date)),
+        '涨跌幅': (bars.last('涨跌幅') if details else nan) if change is None else np.asarray(change, dtype=float),
+        '当天成交量': bars.last('成交量') if details else nan,
+        '上一交易日成交量': bars.last('成交量', 1) if details else nan,
+    }, index=pd.Index(bars.codes, name='代码'))
+    return result[RESULT_COLUMNS]
+
+
+def to_selected_stocks(result, latest_close, code_name_map, today):
+    """把选中的股票整理成与逐只循环相同的结果字典列表"""
+    today = pd.Timestamp(today)
+    hits = result[result['选中']]
+    selected_stocks = []
+    for code, row in hits.iterrows():
+        trigger_date = row['触发日期']
+        selected_stocks.append({
+            'ts_code': code,
+            '名称': code_name_map.get(code, ''),
+            '最后触发日期': (trigger_date if pd.notna(trigger_date) else today).strftime('%Y-%m-%d'),
+            '当前股价': round(latest_close[code], 2),
+            '涨跌幅%': round(row['涨跌幅'], 2) if pd.notna(row['涨跌幅']) else None,
+            '当天成交量': int(row['当天成交量']) if pd.notna(row['当天成交量']) else None,
+            '上一交易日成交量': int(row['上一交易日成交量']) if pd.notna(row['上一交易日成交量']) else None,
+        })
+    return selected_stocks
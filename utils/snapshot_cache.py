@@ -0,0 +1,180 @@
+# utils/snapshot_cache.py
+# 感知交易时段的快照缓存：
+#   - 盘中（9:30-11:30、13:00-15:05）使用短 TTL；
+#   - 午休缓存到 13:00，盘前缓存到 9:30；
+#   - 收盘后（以及周末、节假日）缓存到下一个交易日开盘。
+# 缓存为带元数据（获取时间、交易日、成交量单位）的 Feather 文件，读取时无需再猜测单位；
+# 通过锁文件保证多个进程同时刷新时只发起一次请求。
+
+import os
+import time
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from datetime import datetime, time as dtime
+from utils import trade_calendar
+
+SNAPSHOT_COLUMNS = ['代码', '日期', '开盘', '收盘', '最高', '最低', '成交量', '成交额', '涨跌幅']
+VOLUME_UNIT = '股'
+
+MORNING_OPEN = dtime(9, 30)
+MORNING_CLOSE = dtime(11, 30)
+AFTERNOON_OPEN = dtime(13, 0)
+# 收盘后留出几分钟等待收盘集合竞价结果落地
+SETTLE_CLOSE = dtime(15, 5)
+
+
+def _ttl_seconds():
+    from config import SNAPSHOT_TTL_SECONDS
+    return SNAPSHOT_TTL_SECONDS
+
+
+def _resolve_file(cache_file=None):
+    from config import SNAPSHOT_FILE
+    return cache_file or SNAPSHOT_FILE
+
+
+def _next_open(day):
+    """day 之后（不含 day）下一个交易日的开盘时间"""
+    nxt = trade_calendar.next_trading_day(day)
+    if nxt is None:
+        return None
+    return datetime.combine(nxt.date(), MORNING_OPEN)
+
+
+def snapshot_trade_date(now=None):
+    """快照所属的交易日：交易日开盘后为当天，否则为上一个交易日"""
+    now = now or datetime.now()
+    today = pd.Timestamp(now.date())
+    if trade_calendar.is_trading_day(today) and now.time() >= MORNING_OPEN:
+        return today
+    return trade_calendar.prev_trading_day(today)
+
+
+def snapshot_expiry(fetched_at):
+    """根据获取时间所处的交易时段，计算快照的过期时间"""
+    day = pd.Timestamp(fetched_at.date())
+    t = fetched_at.time()
+    if trade_calendar.is_trading_day(day):
+        if t < MORNING_OPEN:
+            return datetime.combine(fetched_at.date(), MORNING_OPEN)
+        if MORNING_OPEN <= t < MORNING_CLOSE or AFTERNOON_OPEN <= t < SETTLE_CLOSE:
+            return fetched_at + pd.Timedelta(seconds=_ttl_seconds())
+        if MORNING_CLOSE <= t < AFTERNOON_OPEN:
+            return datetime.combine(fetched_at.date(), AFTERNOON_OPEN)
+    # 收盘后、周末、节假日：缓存到下一个交易日开盘
+    return _next_open(day) or fetched_at + pd.Timedelta(seconds=_ttl_seconds())
+
+
+class CacheLock:
+    """
+    基于锁文件的跨进程互斥锁（O_CREAT|O_EXCL，Windows/Linux 通用）。
+    持有期间后台线程定期刷新锁文件的修改时间，持锁操作（含超时重试与退避）再久也不会被误判为失效；
+    持有者异常退出留下的锁文件不再被刷新，在 stale_seconds 后视为失效。
+    """
+
+    def __init__(self, path, timeout=60, stale_seconds=120, poll_interval=0.2):
+        self.path = f"{path}.lock"
+        self.timeout = timeout
+        self.stale_seconds = stale_seconds
+        self.poll_interval = poll_interval
+        self._fd = None
+        self._stop = None
+        self._heartbeat = None
+
+    def __enter__(self):
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                self._fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(self._fd, str(os.getpid()).encode())
+                self._start_heartbeat()
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.stale_seconds:
+                        os.remove(self.path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.time() > deadline:
+                    raise TimeoutError(f"等待锁超时: {self.path}")
+                time.sleep(self.poll_interval)
+
+    def _start_heartbeat(self):
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._touch, args=(self._stop,), daemon=True)
+        self._heartbeat.start()
+
+    def _touch(self, stop):
+        # 刷新间隔远小于失效时间，一两次调度延迟不会让锁过期
+        while not stop.wait(self.stale_seconds / 4):
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                return
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._heartbeat is not None:
+            self._stop.set()
+            self._heartbeat.join()
+            self._heartbeat = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def cache_lock(cache_file=None):
+    return CacheLock(_resolve_file(cache_file))
+
+
+def write_snapshot(df, cache_file=None, fetched_at=None):
+    """写入快照缓存（成交量须已换算为股），获取时间等信息写入 Arrow 元数据"""
+    cache_file = _resolve_file(cache_file)
+    fetched_at = fetched_at or datetime.now()
+    df = df[SNAPSHOT_COLUMNS].copy()
+    df['代码'] = df['代码'].astype(str)
+    df['日期'] = pd.to_datetime(df['日期'])
+    for col in SNAPSHOT_COLUMNS[2:]:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata.update({
+        b'fetched_at': fetched_at.isoformat().encode(),
+        b'expires_at': snapshot_expiry(fetched_at).isoformat().encode(),
+        b'volume_unit': VOLUME_UNIT.encode(),
+    })
+    table = table.replace_schema_metadata(metadata)
+    tmp_path = f"{cache_file}.tmp"
+    feather.write_feather(table, tmp_path)
+    os.replace(tmp_path, cache_file)
+
+
+def read_snapshot(cache_file=None, allow_stale=False, now=None):
+    """
+    读取快照缓存。
+    :param allow_stale: 为 True 时忽略过期时间（网络失败时的兜底）
+    :return: (DataFrame, fetched_at)；缓存不存在、已过期或格式不符时返回 (None, None)
+    """
+    cache_file = _resolve_file(cache_file)
+    if not os.path.exists(cache_file):
+        return None, None
+    try:
+        table = feather.read_table(cache_file)
+    except Exception as e:
+        print(f"[WARNING] 缓存读取失败: {e}")
+        return None, None
+    metadata = table.schema.metadata or {}
+    if b'fetched_at' not in metadata or metadata.get(b'volume_unit', b'').decode() != VOLUME_UNIT:
+        return None, None
+    fetched_at = datetime.fromisoformat(metadata[b'fetched_at'].decode())
+    expires_at = datetime.fromisoformat(metadata[b'expires_at'].decode())
+    if not allow_stale and (now or datetime.now()) >= expires_at:
+        return None, None
+    return table.to_pandas(), fetched_at
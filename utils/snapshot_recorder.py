@@ -0,0 +1,157 @@
+# utils/snapshot_recorder.py
+# 盘中快照录制与回放：
+#   - 录制：每次成功获取的全市场快照按交易日分目录、按获取时间分文件，压缩存为 Feather，
+#     以 (时间, 代码) 为键；
+#   - 回放：按可配置的速度把录制的快照重新喂给 get_clean_snapshot_data()，
+#     用于离线复现某一时刻（如 10:31）选股程序看到的数据。
+#
+# 回放可通过代码 start_replay(...) 开启，也可以通过环境变量开启：
+#   SNAPSHOT_REPLAY="2025-08-07 10:31"        冻结在 10:31
+#   SNAPSHOT_REPLAY="2025-08-07 10:31@60"     从 10:31 起按 60 倍速推进
+
+import os
+import time
+import pandas as pd
+import pyarrow.feather as feather
+from datetime import datetime
+
+from utils.snapshot_cache import SNAPSHOT_COLUMNS
+
+TIME_FORMAT = '%H%M%S%f'
+
+_ACTIVE_REPLAYER = None
+_ENV_CHECKED = False
+
+
+def _resolve_dir(record_dir=None):
+    from config import SNAPSHOT_RECORD_DIR
+    return record_dir or SNAPSHOT_RECORD_DIR
+
+
+def recording_enabled():
+    try:
+        from config import RECORD_SNAPSHOTS
+    except ImportError:
+        return False
+    return bool(RECORD_SNAPSHOTS)
+
+
+def record_snapshot(df, fetched_at=None, record_dir=None):
+    """把一次快照追加到当天的录制目录，返回写入的文件路径"""
+    fetched_at = fetched_at or datetime.now()
+    day_dir = os.path.join(_resolve_dir(record_dir), fetched_at.strftime('%Y%m%d'))
+    os.makedirs(day_dir, exist_ok=True)
+
+    part = df[SNAPSHOT_COLUMNS].copy()
+    part.insert(0, '时间', pd.Timestamp(fetched_at))
+    part = part.sort_values('代码').reset_index(drop=True)
+    path = os.path.join(day_dir, f"{fetched_at.strftime(TIME_FORMAT)}.feather")
+    tmp_path = f"{path}.tmp"
+    feather.write_feather(part, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+    return path
+
+
+def list_polls(session_date, record_dir=None):
+    """某个交易日录制的所有快照时间（升序）"""
+    day_dir = os.path.join(_resolve_dir(record_dir), pd.Timestamp(session_date).strftime('%Y%m%d'))
+    if not os.path.isdir(day_dir):
+        return []
+    day = pd.Timestamp(session_date).strftime('%Y%m%d')
+    polls = [datetime.strptime(day + name[:-len('.feather')], '%Y%m%d' + TIME_FORMAT)
+             for name in os.listdir(day_dir) if name.endswith('.feather')]
+    return sorted(polls)
+
+
+def load_poll(fetched_at, record_dir=None):
+    """读取某一次录制的快照"""
+    path = os.path.join(_resolve_dir(record_dir), fetched_at.strftime('%Y%m%d'),
+                        f"{fetched_at.strftime(TIME_FORMAT)}.feather")
+    return feather.read_feather(path)
+
+
+def load_session(session_date, record_dir=None):
+    """读取某个交易日的全部录制数据，按 (时间, 代码) 排序"""
+    polls = list_polls(session_date, record_dir)
+    if not polls:
+        return pd.DataFrame(columns=['时间'] + SNAPSHOT_COLUMNS)
+    df = pd.concat([load_poll(p, record_dir) for p in polls], ignore_index=True)
+    return df.sort_values(['时间', '代码']).reset_index(drop=True)
+
+
+class SnapshotReplayer:
+    """
+    按模拟时钟回放录制的快照。
+    模拟时间 = start + (实际经过时间 × speed)；speed=0 时冻结在 start。
+    """
+
+    def __init__(self, session_date, start=None, speed=1.0, record_dir=None):
+        self.record_dir = record_dir
+        self.polls = list_polls(session_date, record_dir)
+        if not self.polls:
+            raise FileNotFoundError(f"没有 {pd.Timestamp(session_date).date()} 的快照录制")
+        if start is None:
+            start = self.polls[0]
+        elif not isinstance(start, datetime) or start.date() != self.polls[0].date():
+            # 只给了时刻（如 '10:31'），拼上录制日期
+            start = datetime.combine(self.polls[0].date(), pd.Timestamp(str(start)).time())
+        if start < self.polls[0]:
+            # 第一次录制之前没有数据可回放，从第一次录制开始
+            print(f"[WARNING] 回放起点 {start} 早于第一次录制 {self.polls[0]}，改从第一次录制开始")
+            start = self.polls[0]
+        self.start = start
+        self.speed = float(speed)
+        self._wall_start = time.monotonic()
+        self._cache = {}
+
+    def now(self):
+        """当前模拟时间"""
+        elapsed = time.monotonic() - self._wall_start
+        return self.start + pd.Timedelta(seconds=elapsed * self.speed)
+
+    def at(self, when):
+        """返回 when 时刻（含）之前最近一次录制的快照；when 早于第一次录制时抛出 ValueError"""
+        idx = pd.DatetimeIndex(self.polls).searchsorted(pd.Timestamp(when), side='right') - 1
+        if idx < 0:
+            raise ValueError(f"{when} 早于第一次录制 {self.polls[0]}")
+        poll = self.polls[idx]
+        if poll not in self._cache:
+            self._cache = {poll: load_poll(poll, self.record_dir)}
+        return self._cache[poll][SNAPSHOT_COLUMNS].copy()
+
+    def current(self):
+        return self.at(self.now())
+
+
+def start_replay(session_date, start=None, speed=1.0, record_dir=None):
+    """开启回放：之后 get_clean_snapshot_data() 返回录制的快照而不联网"""
+    global _ACTIVE_REPLAYER
+    _ACTIVE_REPLAYER = SnapshotReplayer(session_date, start, speed, record_dir)
+    print(f"[REPLAY] 回放 {_ACTIVE_REPLAYER.start}，速度 {_ACTIVE_REPLAYER.speed}x")
+    return _ACTIVE_REPLAYER
+
+
+def stop_replay():
+    global _ACTIVE_REPLAYER
+    _ACTIVE_REPLAYER = None
+
+
+def active_replayer():
+    """当前生效的回放器；首次调用时检查 SNAPSHOT_REPLAY 环境变量"""
+    global _ENV_CHECKED
+    if _ACTIVE_REPLAYER is None and not _ENV_CHECKED:
+        _ENV_CHECKED = True
+        spec = os.getenv('SNAPSHOT_REPLAY')
+        if spec:
+            when, speed = parse_replay_spec(spec)
+            start_replay(when.date(), when, speed)
+    return _ACTIVE_REPLAYER
+
+
+def parse_replay_spec(spec):
+    """
+    解析 SNAPSHOT_REPLAY 的值，如 '2025-08-07 10:31' 或 '2025-08-07 10:31@60'。
+    :return: (回放起点, 速度)；未指定速度时为 0（冻结）
+    """
+    when, _, speed = spec.strip().partition('@')
+    return pd.Timestamp(when.strip()).to_pydatetime(), float(speed) if speed.strip() else 0.0
@@ -0,0 +1,176 @@
+# utils/source_router.py
+# 多数据源路由：同一份日线可以来自多个数据源（如 Tushare daily、akshare 收盘快照）。
+#   - 每个数据源保留最近若干次请求的耗时与成败（持久化到 SOURCE_STATS_FILE，跨运行累积）；
+#   - 按健康度排序：错误率高的排在后面，其余按耗时中位数（按错误率加罚）从快到慢；
+#   - 先请求排名第一的数据源，超过对冲等待时间仍未返回就同时请求下一个，先成功者胜出；
+#     失败（异常、空数据、缺列）时立即改用下一个；
+#   - 所有结果都经 schema.tushare_daily_to_master 规范为母版格式，缺列的结果视为失败。
+
+import os
+import json
+import time
+import asyncio
+from collections import deque
+
+import numpy as np
+
+from utils.schema import tushare_daily_to_master
+
+# 错误率达到该值（且样本足够）的数据源视为不健康，只作为最后的备选
+UNHEALTHY_ERROR_RATE = 0.5
+MIN_SAMPLES = 3
+
+
+class SourceUnavailable(RuntimeError):
+    """所有数据源都失败"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        detail = '；'.join(f"{name}: {error}" for name, error in errors.items())
+        super().__init__(f"所有数据源均失败（{detail}）")
+
+
+def _resolve_file(stats_file=None):
+    from config import SOURCE_STATS_FILE
+    return stats_file or SOURCE_STATS_FILE
+
+
+class SourceStats:
+    """单个数据源最近 window 次请求的耗时（秒）与成败"""
+
+    def __init__(self, window, samples=()):
+        self.samples = deque(samples, maxlen=window)
+
+    def record(self, latency, ok):
+        self.samples.append((round(float(latency), 3), bool(ok)))
+
+    @property
+    def error_rate(self):
+        if not self.samples:
+            return 0.0
+        return 1.0 - float(np.mean([ok for _, ok in self.samples]))
+
+    @property
+    def latency(self):
+        """成功请求耗时的中位数；没有成功样本时为 None"""
+        latencies = [latency for latency, ok in self.samples if ok]
+        return float(np.median(latencies)) if latencies else None
+
+    @property
+    def healthy(self):
+        return len(self.samples) < MIN_SAMPLES or self.error_rate < UNHEALTHY_ERROR_RATE
+
+    def score(self):
+        """越小越好；没有样本的数据源得 0，先试一次以积累统计"""
+        if not self.samples:
+            return 0.0
+        latency = self.latency if self.latency is not None else float('inf')
+        return latency * (1 + 4 * self.error_rate)
+
+
+class SourceRouter:
+    """
+    :param fetchers: {数据源名: async fetch(trade_date) -> Tushare daily 格式 DataFrame}，顺序即同分时的优先级
+    :param hedge_delay: 对冲等待时间（秒）；None 时取当前数据源耗时中位数的 2 倍，
+                        不低于 config.SOURCE_HEDGE_DELAY
+    """
+
+    def __init__(self, fetchers, stats_file=None, window=None, hedge_delay=None):
+        from config import SOURCE_STATS_WINDOW, SOURCE_HEDGE_DELAY
+        self.fetchers = dict(fetchers)
+        self.stats_file = _resolve_file(stats_file)
+        self.window = window or SOURCE_STATS_WINDOW
+        self.hedge_delay = hedge_delay
+        self.min_hedge_delay = SOURCE_HEDGE_DELAY
+        self.stats = self._load_stats()
+
+    def _load_stats(self):
+        saved = {}
+        if os.path.exists(self.stats_file):
+            try:
+                with open(self.stats_file, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[WARNING] 读取数据源统计失败，将重新统计: {e}")
+        return {name: SourceStats(self.window, [tuple(s) for s in saved.get(name, [])])
+                for name in self.fetchers}
+
+    def _save_stats(self):
+        saved = {}
+        if os.path.exists(self.stats_file):
+            try:
+                with open(self.stats_file, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                saved = {}
+        # 保留其他路由器记录的数据源
+        saved.update({name: list(stats.samples) for name, stats in self.stats.items()})
+        directory = os.path.dirname(self.stats_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.stats_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, ensure_ascii=False)
+        os.replace(tmp_path, self.stats_file)
+
+    def ranked(self):
+        """健康的数据源在前，各组内按得分升序；同分时保持传入顺序"""
+        order = list(self.fetchers)
+        return sorted(order, key=lambda name: (not self.stats[name].healthy,
+                                               self.stats[name].score(), order.index(name)))
+
+    def _hedge_delay(self, name):
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        latency = self.stats[name].latency
+        return max(self.min_hedge_delay, 2 * latency) if latency is not None else self.min_hedge_delay
+
+    async def _timed(self, name, trade_date):
+        started = time.monotonic()
+        try:
+            daily = await self.fetchers[name](trade_date)
+            if daily is None or daily.empty:
+                raise ValueError("空数据")
+            result = tushare_daily_to_master(daily)
+            if result.empty:
+                raise ValueError("规范化后没有完整的数据行")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.stats[name].record(time.monotonic() - started, False)
+            raise
+        self.stats[name].record(time.monotonic() - started, True)
+        return result
+
+    async def fetch(self, trade_date):
+        """
+        获取某个交易日的日线（母版格式）。
+        :return: (数据源名, DataFrame)
+        :raises SourceUnavailable: 所有数据源都失败
+        """
+        order = self.ranked()
+        running, errors = {}, {}
+        try:
+            while order or running:
+                if not running:
+                    name = order.pop(0)
+                    running[asyncio.ensure_future(self._timed(name, trade_date))] = name
+                leader = next(iter(running.values()))
+                timeout = self._hedge_delay(leader) if order else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    name = order.pop(0)
+                    print(f"--- {leader} 超过 {timeout:.1f} 秒未返回，同时请求 {name} ---")
+                    running[asyncio.ensure_future(self._timed(name, trade_date))] = name
+                    continue
+                for task in done:
+                    name = running.pop(task)
+                    if task.exception() is None:
+                        return name, task.result()
+                    errors[name] = task.exception()
+                    print(f"[WARNING] 数据源 {name} 获取 {trade_date} 失败: {task.exception()}")
+            raise SourceUnavailable(errors)
+        finally:
+            for task in running:
+                task.cancel()
+            self._save_stats()
@@ -0,0 +1,121 @@
+# utils/trade_calendar.py
+# 本地缓存的交易日历：每天最多联网刷新一次，离线或刷新失败时使用本地缓存。
+# 交易日在日历中的位置即整数交易日序号，回看区间等计算都按交易日而非自然日进行。
+
+import os
+import pandas as pd
+from datetime import datetime
+
+# 进程内缓存：(加载日期, DatetimeIndex)
+_CALENDAR = None
+
+
+def _resolve_file(cache_file=None):
+    from config import TRADE_CALENDAR_FILE
+    return cache_file or TRADE_CALENDAR_FILE
+
+
+def _fetch_remote():
+    from utils import data_sources
+    return data_sources.run(data_sources.akshare_source().trade_calendar())
+
+
+def _cache_is_fresh(cache_file):
+    """缓存文件是否在今天写入（每天最多刷新一次）"""
+    if not os.path.exists(cache_file):
+        return False
+    return datetime.fromtimestamp(os.path.getmtime(cache_file)).date() == datetime.now().date()
+
+
+def load_trade_dates(cache_file=None, refresh=False):
+    """
+    获取交易日历（升序 DatetimeIndex）。
+    优先使用进程内缓存和当天写入的本地文件；需要刷新时联网获取，失败则退回本地旧缓存。
+    """
+    global _CALENDAR
+    cache_file = _resolve_file(cache_file)
+    today = datetime.now().date()
+    if not refresh and _CALENDAR is not None and _CALENDAR[0] == today:
+        return _CALENDAR[1]
+
+    dates = None
+    if not refresh and _cache_is_fresh(cache_file):
+        dates = pd.DatetimeIndex(pd.read_feather(cache_file)['trade_date'])
+    else:
+        try:
+            dates = _fetch_remote()
+            tmp_path = f"{cache_file}.tmp"
+            pd.DataFrame({'trade_date': dates}).to_feather(tmp_path)
+            os.replace(tmp_path, cache_file)
+        except Exception as e:
+            print(f"[WARNING] 交易日历刷新失败，使用本地缓存: {e}")
+            if os.path.exists(cache_file):
+                dates = pd.DatetimeIndex(pd.read_feather(cache_file)['trade_date'])
+    if dates is None:
+        # 网络不可用且无本地缓存：退回工作日近似（不写入缓存）
+        print("[WARNING] 无可用交易日历，暂以工作日近似")
+        dates = pd.bdate_range('1990-12-19', pd.Timestamp(today) + pd.Timedelta(days=366))
+    _CALENDAR = (today, dates)
+    return dates
+
+
+def is_trading_day(day, calendar=None):
+    calendar = load_trade_dates() if calendar is None else calendar
+    return pd.Timestamp(day).normalize() in calendar
+
+
+def prev_trading_day(day, calendar=None):
+    """严格早于 day 的最近一个交易日"""
+    calendar = load_trade_dates() if calendar is None else calendar
+    pos = calendar.searchsorted(pd.Timestamp(day).normalize(), side='left')
+    return calendar[pos - 1] if pos > 0 else None
+
+
+def next_trading_day(day, calendar=None):
+    """严格晚于 day 的最近一个交易日"""
+    calendar = load_trade_dates() if calendar is None else calendar
+    pos = calendar.searchsorted(pd.Timestamp(day).normalize(), side='right')
+    return calendar[pos] if pos < len(calendar) else None
+
+
+def trading_day_index(day, calendar=None):
+    """
+    交易日序号：day 在日历中的位置。非交易日取其之前最近一个交易日的序号；
+    早于日历起点时返回 -1。
+    """
+    calendar = load_trade_dates() if calendar is None else calendar
+    return int(calendar.searchsorted(pd.Timestamp(day).normalize(), side='right')) - 1
+
+
+def n_trading_days_before(day, n, calendar=None):
+    """
+    day 之前第 n 个交易日（n=1 即 prev_trading_day）。
+    day 为非交易日时，从其之前最近的交易日起算（该交易日本身算第 1 个）。
+    """
+    calendar = load_trade_dates() if calendar is None else calendar
+    pos = calendar.searchsorted(pd.Timestamp(day).normalize(), side='left') - n
+    return calendar[pos] if pos >= 0 else None
+
+
+def lookback_start(day, n, calendar=None):
+    """
+    回看 n 个交易日的起点：n_trading_days_before(day, n)；
+    日历中 day 之前不足 n 个交易日时（新建或工作日近似的日历）取日历第一天，日历为空时返回 None。
+    """
+    calendar = load_trade_dates() if calendar is None else calendar
+    start = n_trading_days_before(day, n, calendar)
+    if start is None and len(calendar):
+        start = calendar[0]
+    return start
+
+
+def trading_days_between(start, end, inclusive='both', calendar=None):
+    """
+    start 与 end 之间的交易日（升序 DatetimeIndex）。
+    inclusive 与 pandas 一致：'both'、'neither'、'left'、'right'。
+    """
+    calendar = load_trade_dates() if calendar is None else calendar
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    left = calendar.searchsorted(start, side='left' if inclusive in ('both', 'left') else 'right')
+    right = calendar.searchsorted(end, side='right' if inclusive in ('both', 'right') else 'left')
+    return calendar[left:right]
@@ -0,0 +1,126 @@
+# utils/update_journal.py
+# 可断点续传的补数运行：
+#   - 每个交易日下载完成后立即原子写入暂存目录（<date>.feather）；
+#   - journal.json 记录本次运行请求的交易日和已暂存的交易日；
+#   - 中断（SIGINT/SIGTERM）或有日期失败时不写母版，重新运行时只下载尚未暂存的日期；
+#   - 全部到齐后把暂存数据一次性合并进母版，随后清空暂存目录。
+
+import os
+import json
+import shutil
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from utils import downloader
+
+JOURNAL_FILE = 'journal.json'
+
+
+def _resolve_dir(staging_dir=None):
+    from config import UPDATE_STAGING_DIR
+    return staging_dir or UPDATE_STAGING_DIR
+
+
+class UpdateJournal:
+    """一次补数运行的暂存区与运行日志"""
+
+    def __init__(self, staging_dir=None):
+        self.staging_dir = _resolve_dir(staging_dir)
+        self.path = os.path.join(self.staging_dir, JOURNAL_FILE)
+        self._lock = threading.Lock()
+        self.state = self._load()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'started_at': None, 'requested': [], 'staged': {}}
+
+    def _save(self):
+        os.makedirs(self.staging_dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _staged_file(self, trade_date):
+        return os.path.join(self.staging_dir, f"{trade_date}.feather")
+
+    def begin(self, trade_dates, refresh=()):
+        """
+        登记本次要补齐的交易日（YYYYMMDD），替换上次运行的请求：请求由母版当前缺失的日期算出，
+        上次未完成运行中本次不再请求的交易日（例如已由其他途径写入母版）连同其暂存文件一起丢弃，
+        仍在请求中的已暂存交易日直接复用。
+        :param refresh: 必须重新下载的交易日（如 --force-date 指定的日期），其暂存数据不复用
+        :return: 仍需下载的交易日
+        """
+        with self._lock:
+            requested = sorted(set(trade_dates))
+            refresh = set(refresh)
+            for trade_date in list(self.state['staged']):
+                if (trade_date not in requested or trade_date in refresh
+                        or not os.path.exists(self._staged_file(trade_date))):
+                    self.state['staged'].pop(trade_date)
+                    if os.path.exists(self._staged_file(trade_date)):
+                        os.remove(self._staged_file(trade_date))
+            self.state['started_at'] = self.state['started_at'] or datetime.now().isoformat(timespec='seconds')
+            self.state['requested'] = requested
+            self._save()
+            return self.pending()
+
+    def pending(self):
+        return [d for d in self.state['requested'] if d not in self.state['staged']]
+
+    def staged_dates(self):
+        return sorted(self.state['staged'])
+
+    def stage(self, trade_date, df):
+        """把一个交易日的下载结果持久化到暂存区，并记入运行日志"""
+        with self._lock:
+            os.makedirs(self.staging_dir, exist_ok=True)
+            path = self._staged_file(trade_date)
+            tmp_path = f"{path}.tmp"
+            df.reset_index(drop=True).to_feather(tmp_path)
+            os.replace(tmp_path, path)
+            self.state['staged'][trade_date] = {
+                'rows': int(len(df)),
+                'staged_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            self._save()
+
+    def load_staged(self):
+        """读取全部暂存的交易日数据（按日期顺序）"""
+        return [pd.read_feather(self._staged_file(d)) for d in self.staged_dates()]
+
+    def complete(self):
+        """暂存数据已合并进母版：清空暂存目录，下次运行从头开始"""
+        with self._lock:
+            if os.path.isdir(self.staging_dir):
+                shutil.rmtree(self.staging_dir)
+            self.state = {'started_at': None, 'requested': [], 'staged': {}}
+
+
+def fetch_with_journal(pro, trade_dates, shutdown_event=None, journal=None, refresh=()):
+    """
+    并发下载尚未暂存的交易日，每个交易日到达即暂存。
+    :param refresh: 即使已暂存也要重新下载的交易日
+    :return: 全部交易日都已暂存时返回暂存的数据列表（含此前运行下载的），
+             被中断或有日期失败时返回 None（暂存保留，下次运行续传）
+    """
+    journal = journal or UpdateJournal()
+    pending = journal.begin(trade_dates, refresh=refresh)
+    staged = journal.staged_dates()
+    if staged:
+        print(f"--- 从上次未完成的运行中恢复 {len(staged)} 个已下载的交易日: {', '.join(staged)} ---")
+    results, failed = downloader.download_daily(pro, pending, shutdown_event=shutdown_event,
+                                                on_result=journal.stage)
+    for trade_date, df in results:
+        if df.empty:
+            print(f"--- 警告: Tushare返回 {trade_date} 的数据为空，可能是非交易日或数据尚未更新 ---")
+    if failed or (shutdown_event is not None and shutdown_event.is_set()):
+        print(f"--- 已暂存 {len(journal.staged_dates())}/{len(journal.state['requested'])} 个交易日，"
+              f"未完成: {', '.join(journal.pending())}；重新运行将从断点继续 ---")
+        return None
+    return [df for df in journal.load_staged() if not df.empty]